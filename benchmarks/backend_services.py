@@ -0,0 +1,94 @@
+"""
+Compare the latency of SMART backend services token requests to a local
+token endpoint answering in 5 ms, the client assertion being signed for each request or taken
+from a pool of pre-signed ones
+
+    python -m benchmarks.backend_services
+"""
+import asyncio
+import statistics
+import time
+
+from aiohttp import ClientSession, web
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+from smart_on_fhir_client.backend_services import BackendServicesPartner
+
+PORT = 8767
+LATENCY = 0.005
+
+
+async def token(request):
+    await request.post()
+    # network and token server time, the client loop being idle meanwhile
+    await asyncio.sleep(LATENCY)
+    return web.json_response({"access_token": "token", "expires_in": 300})
+
+
+def pem(private_key) -> str:
+    return private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+async def bench(
+    partner: BackendServicesPartner, session: ClientSession, burst: int
+) -> float:
+    """median latency of the slowest token request of each burst"""
+    latencies = []
+
+    async def request_token():
+        start = time.perf_counter()
+        await partner.get_access_token_for_m2m(session)
+        return time.perf_counter() - start
+
+    for _ in range(100):
+        latencies.append(
+            max(await asyncio.gather(*(request_token() for _ in range(burst))))
+        )
+        # tokens are requested now and then, e.g. for new organizations
+        await asyncio.sleep(0.02)
+    await partner.assertions.close()
+    return statistics.median(latencies)
+
+
+async def main():
+    app = web.Application()
+    app.router.add_post("/token", token)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    keys = {
+        "RS384": rsa.generate_private_key(public_exponent=65537, key_size=2048),
+        "RS384 4096 bits": rsa.generate_private_key(
+            public_exponent=65537, key_size=4096
+        ),
+        "ES384": ec.generate_private_key(ec.SECP384R1()),
+    }
+    async with ClientSession() as session:
+        for name, private_key in keys.items():
+            for burst in (1, 4):
+                for pool_size in (0, 4):
+                    partner = BackendServicesPartner(
+                        name="bench",
+                        client_id="client",
+                        token_url=f"http://127.0.0.1:{PORT}/token",
+                        private_key=pem(private_key),
+                        algorithm=name.split()[0],
+                        assertion_pool_size=pool_size,
+                    )
+                    latency = await bench(partner, session, burst)
+                    mode = "pre-signed" if pool_size else "signed per request"
+                    print(
+                        f"{name:<16} {burst} concurrent {mode:<19} "
+                        f"{latency * 1000:6.2f} ms median"
+                    )
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Compare the download of a 20 MB search bundle, sent compressed or not, and
+decoded once buffered or while downloaded
+
+    python -m benchmarks.compression
+"""
+import asyncio
+import gc
+import gzip
+import time
+import tracemalloc
+
+from aiohttp import web
+
+from benchmarks.decode import bundle
+from smart_on_fhir_client.client import SmartOnFhirClient
+from smart_on_fhir_client.compression import CompressionOptions
+from smart_on_fhir_client.partner import Partner
+from smart_on_fhir_client.strategy import Strategy
+
+PORT = 8767
+BODY = bundle(20)
+GZIPPED = gzip.compress(BODY, compresslevel=6)
+
+
+async def search(request: web.Request) -> web.StreamResponse:
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        return web.Response(
+            body=GZIPPED,
+            headers={
+                "Content-Type": "application/fhir+json",
+                "Content-Encoding": "gzip",
+            },
+        )
+    return web.Response(body=BODY, content_type="application/fhir+json")
+
+
+class BenchPartner(Partner):
+    name: str = "bench"
+    supported_strategies: set = {Strategy.M2M}
+    fhir_url: str = f"http://127.0.0.1:{PORT}/fhir"
+
+    async def get_access_token_for_m2m(self, session):
+        return "token"
+
+    async def get_key_as_json(self, session):
+        ...
+
+
+async def bench(compression: CompressionOptions, repeat: int = 3):
+    partner = BenchPartner()
+    client = SmartOnFhirClient(
+        partner.fhir_url,
+        authorization="Bearer token",
+        partner=partner,
+        strategy=Strategy.M2M,
+        compression=compression,
+    )
+    timings = []
+    for i in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        await client._do_request("GET", "Observation", params={"_id": i})
+        timings.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    result = await client._do_request("GET", "Observation", params={"_id": "peak"})
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    await client.pool.close()
+    return min(timings), peak
+
+
+async def main():
+    app = web.Application(client_max_size=0)
+    app.router.add_get("/fhir/Observation", search)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    print(
+        f"--- bundle of {len(BODY) / 2**20:.1f} MB, "
+        f"{len(GZIPPED) / 2**20:.1f} MB gzipped"
+    )
+    results = {
+        "identity, buffered": CompressionOptions(
+            accept_encoding="identity", stream_threshold=None
+        ),
+        "identity, streamed": CompressionOptions(
+            accept_encoding="identity", stream_threshold=0
+        ),
+        "gzip, buffered": CompressionOptions(stream_threshold=None),
+        "gzip, streamed": CompressionOptions(stream_threshold=0),
+    }
+    for name, compression in results.items():
+        elapsed, peak = await bench(compression)
+        print(f"{name:<20} {elapsed * 1000:8.1f} ms {peak / 2**20:8.1f} MB peak")
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+"""
+Compare the conversions of a page of 10k resources, to fhir.resources models
+(return_as) and from fhir.resources models to CustomFHIRResource
+
+    python -m benchmarks.conversion
+"""
+import gc
+import json
+import time
+
+from fhir.resources.observation import Observation
+
+from benchmarks.decode import observation
+from smart_on_fhir_client.client import SmartOnFhirClient
+from smart_on_fhir_client.decoder import default_decoder
+from smart_on_fhir_client.requester.conversion import dump, to_models
+from smart_on_fhir_client.requester.fhir_resource import CustomFHIRResource
+
+
+def timed(func, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def page(size: int):
+    # resources as decoded from a response
+    decoder = default_decoder()
+    return [decoder.decode(json.dumps(observation(str(i)))) for i in range(size)]
+
+
+if __name__ == "__main__":
+    size = 10_000
+    resources = page(size)
+    client = SmartOnFhirClient("http://localhost")
+    models = to_models(Observation, resources)
+    manager = None
+
+    results = {
+        "return_as, validated": lambda: to_models(Observation, resources),
+        "return_as, not validated": lambda: to_models(
+            Observation, resources, validate=False
+        ),
+        "model to resource, dict()": lambda: [
+            CustomFHIRResource(manager, client, "Observation", **model.dict())
+            for model in models
+        ],
+        "model to resource, dump()": lambda: [
+            CustomFHIRResource(manager, client, "Observation", **dump(model))
+            for model in models
+        ],
+    }
+    print(f"--- page of {size} Observation")
+    for name, func in results.items():
+        print(f"{name:<28} {timed(func) * 1000:8.1f} ms")
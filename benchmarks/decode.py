@@ -0,0 +1,106 @@
+"""
+Compare the decoding of fhir bundles of 1 to 10 MB
+
+    python -m benchmarks.decode
+"""
+import gc
+import json
+import random
+import time
+import uuid
+
+from fhirpy.lib import AsyncFHIRSearchSet
+
+from smart_on_fhir_client.client import SmartOnFhirClient
+from smart_on_fhir_client.decoder import (
+    AttrDictJsonDecoder,
+    LazyJsonDecoder,
+    orjson,
+    ujson,
+)
+
+
+def observation(patient_id: str):
+    return {
+        "resourceType": "Observation",
+        "id": str(uuid.uuid4()),
+        "meta": {"versionId": "1", "lastUpdated": "2022-03-01T10:00:00Z"},
+        "status": "final",
+        "category": [
+            {
+                "coding": [
+                    {
+                        "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+                        "code": "vital-signs",
+                    }
+                ]
+            }
+        ],
+        "code": {
+            "coding": [
+                {
+                    "system": "http://loinc.org",
+                    "code": "8867-4",
+                    "display": "Heart rate",
+                }
+            ]
+        },
+        "subject": {"reference": f"Patient/{patient_id}"},
+        "encounter": {"reference": f"Encounter/{uuid.uuid4()}"},
+        "effectiveDateTime": "2022-03-01T09:30:00Z",
+        "valueQuantity": {
+            "value": random.randint(40, 180),
+            "unit": "beats/minute",
+            "system": "http://unitsofmeasure.org",
+            "code": "/min",
+        },
+    }
+
+
+def bundle(size_mb: float) -> bytes:
+    entries, size = [], 0
+    while size < size_mb * 1024 * 1024:
+        resource = observation(str(random.randint(1, 1000)))
+        entries.append(
+            {"fullUrl": f"Observation/{resource['id']}", "resource": resource}
+        )
+        size += len(json.dumps(resource))
+    return json.dumps(
+        {"resourceType": "Bundle", "type": "searchset", "entry": entries}
+    ).encode()
+
+
+def decoders():
+    yield "json + AttrDict (legacy)", AttrDictJsonDecoder()
+    yield "json lazy", LazyJsonDecoder(json.loads)
+    if ujson is not None:
+        yield "ujson lazy", LazyJsonDecoder(ujson.loads)
+    if orjson is not None:
+        yield "orjson lazy", LazyJsonDecoder(orjson.loads)
+
+
+def bench(decoder, data: bytes, repeat: int = 5):
+    """time of the decoding alone, and of the decoding followed by the
+    conversion of the entries to fhirpy resources"""
+    searchset = AsyncFHIRSearchSet(SmartOnFhirClient("http://localhost"), "Observation")
+    decode, convert = [], []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        bundle_data = decoder.decode(data)
+        decoded = time.perf_counter()
+        searchset._get_bundle_resources(bundle_data)
+        decode.append(decoded - start)
+        convert.append(time.perf_counter() - start)
+    return min(decode), min(convert)
+
+
+if __name__ == "__main__":
+    for size in (1, 5, 10):
+        data = bundle(size)
+        print(f"--- bundle of {len(data) / 1024 / 1024:.1f} MB")
+        for name, decoder in decoders():
+            decode, total = bench(decoder, data)
+            print(
+                f"{name:<26} decode {decode * 1000:8.1f} ms   decode + resources {total * 1000:8.1f} ms"
+            )
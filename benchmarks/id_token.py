@@ -0,0 +1,73 @@
+"""
+Compare the verifications of id tokens, with and without the caches
+
+    python -m benchmarks.id_token
+"""
+import asyncio
+import json
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+from smart_on_fhir_client.jwks import JwksManager, VerifiedTokenCache, verify_id_token
+from smart_on_fhir_client.utils import check_id_token
+
+ISSUER = "https://auth.example.org"
+AUDIENCE = "app"
+
+
+def bench(name: str, verify, tokens):
+    start = time.perf_counter()
+    for token in tokens:
+        verify(token)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {elapsed / len(tokens) * 1e6:8.1f} us/token")
+
+
+async def main():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk["kid"] = "key"
+    exp = int(time.time()) + 3600
+    # 100 users sending 10 requests each
+    tokens = [
+        jwt.encode(
+            {"iss": ISSUER, "aud": AUDIENCE, "sub": str(i % 100), "exp": exp},
+            private_key,
+            algorithm="RS256",
+            headers={"kid": "key"},
+        )
+        for i in range(1000)
+    ]
+
+    def uncached(token):
+        key = RSAAlgorithm.from_jwk(jwk)
+        return check_id_token(token, key=key, issuer=ISSUER, audience=AUDIENCE)
+
+    bench("jwk parsed for each token", uncached, tokens)
+    bench(
+        "check_id_token, jwk",
+        lambda token: check_id_token(token, key=jwk, issuer=ISSUER, audience=AUDIENCE),
+        tokens,
+    )
+
+    async def fetch(session):
+        return {"keys": [jwk]}
+
+    jwks = JwksManager().register(ISSUER, fetch=fetch)
+    for cache in (None, VerifiedTokenCache()):
+        start = time.perf_counter()
+        for token in tokens:
+            await verify_id_token(
+                token, jwks=jwks, issuer=ISSUER, audience=AUDIENCE, cache=cache
+            )
+        elapsed = time.perf_counter() - start
+        name = "verify_id_token" + (", token cache" if cache is not None else "")
+        print(f"{name:<32} {elapsed / len(tokens) * 1e6:8.1f} us/token")
+    await jwks.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
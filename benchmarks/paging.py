@@ -0,0 +1,102 @@
+"""
+Compare the streaming of a search of 100 pages following the next links and
+fetching the pages concurrently by offset, against a local server paging
+like HAPI (_getpagesoffset), each page taking 20 ms
+
+    python -m benchmarks.paging
+"""
+import asyncio
+import json
+import time
+
+from aiohttp import web
+
+from benchmarks.decode import observation
+from smart_on_fhir_client.client import SmartOnFhirClient
+from smart_on_fhir_client.connection import ConnectionPool
+from smart_on_fhir_client.partner import Partner
+from smart_on_fhir_client.requester.fhir_requester import (
+    FhirContextManager,
+    SearchSet,
+)
+from smart_on_fhir_client.strategy import Strategy
+
+PORT = 8769
+LATENCY = 0.02
+PAGES, PAGE_SIZE = 100, 50
+TOTAL = PAGES * PAGE_SIZE
+RESOURCE = observation("1")
+
+
+async def search(request: web.Request) -> web.Response:
+    await asyncio.sleep(LATENCY)
+    offset = int(request.query.get("_getpagesoffset", 0))
+    body = {
+        "resourceType": "Bundle",
+        "type": "searchset",
+        "total": TOTAL,
+        "entry": [
+            {"resource": {**RESOURCE, "id": str(i)}}
+            for i in range(offset, min(offset + PAGE_SIZE, TOTAL))
+        ],
+    }
+    if offset + PAGE_SIZE < TOTAL:
+        body["link"] = [
+            {
+                "relation": "next",
+                "url": f"http://127.0.0.1:{PORT}/fhir?_getpages=search"
+                f"&_getpagesoffset={offset + PAGE_SIZE}&_count={PAGE_SIZE}",
+            }
+        ]
+    return web.Response(body=json.dumps(body), content_type="application/fhir+json")
+
+
+class BenchPartner(Partner):
+    name: str = "bench"
+    supported_strategies: set = {Strategy.M2M}
+    fhir_url: str = f"http://127.0.0.1:{PORT}/fhir"
+
+    async def get_access_token_for_m2m(self, session):
+        return "token"
+
+    async def get_key_as_json(self, session):
+        ...
+
+
+async def main():
+    app = web.Application()
+    app.router.add_get("/fhir/Observation", search)
+    app.router.add_get("/fhir", search)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    partner = BenchPartner()
+    pool = ConnectionPool()
+    client = SmartOnFhirClient(
+        partner.fhir_url,
+        authorization="Bearer token",
+        partner=partner,
+        strategy=Strategy.M2M,
+        pool=pool,
+    )
+    searches = SearchSet(
+        client.resources("Observation").limit(PAGE_SIZE), FhirContextManager(), client
+    )
+    print(f"--- {PAGES} pages of {PAGE_SIZE} Observation")
+    for concurrency, ordered in ((1, True), (4, True), (8, True), (8, False)):
+        start = time.perf_counter()
+        count = 0
+        async for _ in searches.stream(concurrency=concurrency, ordered=ordered):
+            count += 1
+        elapsed = time.perf_counter() - start
+        assert count == TOTAL
+        mode = "next links" if concurrency == 1 else f"{concurrency} concurrent"
+        mode += "" if ordered else ", unordered"
+        print(f"{mode:<24} {elapsed:6.2f} s")
+    await pool.close()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Compare a search of 1000 Observations returning the whole resources, some
+elements only (_elements) and the count only (_summary=count), against a
+local server
+
+    python -m benchmarks.projection
+"""
+import asyncio
+import json
+import time
+
+from aiohttp import web
+from fhir.resources.observation import Observation
+
+from benchmarks.decode import observation
+from smart_on_fhir_client.client import SmartOnFhirClient
+from smart_on_fhir_client.connection import ConnectionPool
+from smart_on_fhir_client.partner import Partner
+from smart_on_fhir_client.requester.fhir_requester import (
+    FhirContextManager,
+    SearchSet,
+)
+from smart_on_fhir_client.strategy import Strategy
+
+PORT = 8768
+RESOURCES = [observation(str(i)) for i in range(1000)]
+# response sizes, by query
+sizes = {}
+
+
+async def search(request: web.Request) -> web.Response:
+    if request.query.get("_summary") == "count":
+        body = {"resourceType": "Bundle", "type": "searchset", "total": 1000}
+    else:
+        resources = RESOURCES
+        if "_elements" in request.query:
+            elements = set(request.query["_elements"].split(","))
+            resources = [
+                {k: v for k, v in resource.items() if k in elements}
+                for resource in resources
+            ]
+        body = {
+            "resourceType": "Bundle",
+            "type": "searchset",
+            "entry": [{"resource": resource} for resource in resources],
+        }
+    data = json.dumps(body).encode()
+    sizes[request.query_string] = len(data)
+    return web.Response(body=data, content_type="application/fhir+json")
+
+
+class BenchPartner(Partner):
+    name: str = "bench"
+    supported_strategies: set = {Strategy.M2M}
+    fhir_url: str = f"http://127.0.0.1:{PORT}/fhir"
+
+    async def get_access_token_for_m2m(self, session):
+        return "token"
+
+    async def get_key_as_json(self, session):
+        ...
+
+
+async def timed(coroutine_function, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await coroutine_function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+async def main():
+    app = web.Application()
+    app.router.add_get("/fhir/Observation", search)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    partner = BenchPartner()
+    pool = ConnectionPool()
+    client = SmartOnFhirClient(
+        partner.fhir_url,
+        authorization="Bearer token",
+        partner=partner,
+        strategy=Strategy.M2M,
+        pool=pool,
+    )
+    searches = SearchSet(
+        client.resources("Observation").limit(1000), FhirContextManager(), client
+    )
+    results = {
+        "whole resources": lambda: searches.fetch(return_as=Observation),
+        "_elements": lambda: searches.elements("subject", "effectiveDateTime").fetch(
+            return_as=Observation
+        ),
+        "_summary=count": searches.count,
+    }
+    print("--- search of 1000 Observation")
+    for name, func in results.items():
+        sizes.clear()
+        elapsed = await timed(func)
+        print(
+            f"{name:<18} {elapsed * 1000:8.1f} ms "
+            f"{next(iter(sizes.values())) / 1024:8.1f} KB"
+        )
+    await pool.close()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
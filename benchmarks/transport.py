@@ -0,0 +1,120 @@
+"""
+Compare the transports on concurrent searches against a local server
+speaking HTTP/1.1 and HTTP/2 (h2c), each response taking 20 ms
+
+    pip install hypercorn httpx[http2]
+    python -m benchmarks.transport
+"""
+import asyncio
+import json
+import time
+
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+from benchmarks.decode import observation
+from smart_on_fhir_client.client import SmartOnFhirClient
+from smart_on_fhir_client.connection import ConnectionPool
+from smart_on_fhir_client.partner import Partner
+from smart_on_fhir_client.strategy import Strategy
+from smart_on_fhir_client.transport import AiohttpTransport, HttpxTransport
+
+PORT = 8766
+LATENCY = 0.02
+BODY = json.dumps(
+    {
+        "resourceType": "Bundle",
+        "type": "searchset",
+        "entry": [{"resource": observation(str(i))} for i in range(20)],
+    }
+).encode()
+
+# client address of each connection seen by the server
+connections = set()
+
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    connections.add(tuple(scope["client"]))
+    await asyncio.sleep(LATENCY)
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/fhir+json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": BODY})
+
+
+class BenchPartner(Partner):
+    name: str = "bench"
+    supported_strategies: set = {Strategy.M2M}
+    fhir_url: str = f"http://127.0.0.1:{PORT}/fhir"
+
+    async def get_access_token_for_m2m(self, session):
+        return "token"
+
+    async def get_key_as_json(self, session):
+        ...
+
+
+async def bench(transport, concurrency: int, requests: int) -> float:
+    partner = BenchPartner()
+    client = SmartOnFhirClient(
+        partner.fhir_url,
+        authorization="Bearer token",
+        partner=partner,
+        strategy=Strategy.M2M,
+        transport=transport,
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def search(i: int):
+        async with semaphore:
+            await client._do_request("GET", "Observation", params={"_id": i})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(search(i) for i in range(requests)))
+    return time.perf_counter() - start
+
+
+async def main():
+    config = Config()
+    config.bind = [f"127.0.0.1:{PORT}"]
+    config.loglevel = "ERROR"
+    config.keep_alive_max_requests = 10**9
+    shutdown = asyncio.Event()
+    server = asyncio.create_task(serve(app, config, shutdown_trigger=shutdown.wait))
+    await asyncio.sleep(0.5)
+
+    requests = 2000
+    for concurrency in (10, 100, 500):
+        print(f"--- {requests} searches, {concurrency} concurrent")
+        transports = {
+            "aiohttp HTTP/1.1": lambda: AiohttpTransport(ConnectionPool()),
+            "httpx HTTP/1.1": lambda: HttpxTransport(http2=False, max_connections=100),
+            "httpx HTTP/2": lambda: HttpxTransport(
+                prior_knowledge=True, max_connections=2
+            ),
+        }
+        for name, create in transports.items():
+            connections.clear()
+            transport = create()
+            elapsed = await bench(transport, concurrency, requests)
+            if isinstance(transport, AiohttpTransport):
+                await transport.pool.close()
+            else:
+                await transport.close()
+            print(
+                f"{name:<18} {requests / elapsed:8.0f} req/s "
+                f"{len(connections):5d} connections"
+            )
+
+    shutdown.set()
+    await server
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
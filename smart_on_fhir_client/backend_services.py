@@ -0,0 +1,202 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Mapping, Tuple
+
+import jwt
+from aiohttp import ClientSession
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from jwt.algorithms import get_default_algorithms
+from loguru import logger
+from pydantic import PrivateAttr
+
+from smart_on_fhir_client.partner import Partner
+from smart_on_fhir_client.strategy import Strategy
+
+CLIENT_ASSERTION_TYPE = "urn:ietf:params:oauth:client-assertion-type:jwt-bearer"
+
+
+class ClientAssertionPool:
+    """
+    Client assertions (jwt signed with the client private key) of a SMART
+    backend services client, signed in advance in a thread so that token
+    requests do not wait for the signature.
+
+    Each assertion has its own `jti` and is used once. Assertions are
+    discarded once half of their lifetime elapsed, token endpoints rejecting
+    the expired ones. An assertion is signed in the loop only when the pool
+    is empty. Call `refill` once the token request completed, so that the
+    signatures do not compete with it for the cpu.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        token_url: str,
+        private_key: Any,
+        *,
+        algorithm: str = "RS384",
+        key_id: str | None = None,
+        lifetime: int = 300,
+        size: int = 4,
+    ):
+        """
+
+        Args:
+            client_id: `iss` and `sub` of the assertions
+            token_url: `aud` of the assertions
+            private_key: RSA or EC private key, PEM encoded or loaded
+            algorithm: RS384 or ES384
+            key_id: `kid` of the public key in the client JWK set
+            lifetime: seconds before the expiry of the assertions, at most
+                300 for SMART
+            size: number of assertions signed in advance
+        """
+        if isinstance(private_key, (str, bytes)):
+            if isinstance(private_key, str):
+                private_key = private_key.encode()
+            private_key = load_pem_private_key(private_key, password=None)
+        self.client_id = client_id
+        self.token_url = token_url
+        self.private_key = private_key
+        self.algorithm = algorithm
+        self.key_id = key_id
+        self.lifetime = lifetime
+        self.size = size
+        self._assertions: Deque[Tuple[str, float]] = deque()
+        self._refill: asyncio.Task | None = None
+
+    def sign(self) -> Tuple[str, float]:
+        """
+        Returns:
+            a new assertion and its expiry
+        """
+        now = int(time.time())
+        expires_at = now + self.lifetime
+        claims = {
+            "iss": self.client_id,
+            "sub": self.client_id,
+            "aud": self.token_url,
+            "jti": uuid.uuid4().hex,
+            "iat": now,
+            "exp": expires_at,
+        }
+        headers = {"kid": self.key_id} if self.key_id is not None else None
+        assertion = jwt.encode(
+            claims, self.private_key, algorithm=self.algorithm, headers=headers
+        )
+        return assertion, expires_at
+
+    async def get(self) -> str:
+        """
+        Returns:
+            an assertion never returned before
+        """
+        # not worth using once half of its lifetime elapsed
+        usable_until = time.time() + self.lifetime / 2
+        assertion = None
+        while self._assertions:
+            candidate, expires_at = self._assertions.popleft()
+            if expires_at > usable_until:
+                assertion = candidate
+                break
+        if assertion is None:
+            assertion, _ = self.sign()
+        return assertion
+
+    def refill(self):
+        """sign the missing assertions in the background"""
+        if len(self._assertions) < self.size and (
+            self._refill is None or self._refill.done()
+        ):
+            self._refill = asyncio.create_task(self._fill())
+
+    async def _fill(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while len(self._assertions) < self.size:
+                self._assertions.append(await loop.run_in_executor(None, self.sign))
+        except Exception as e:
+            logger.warning("Unable to sign client assertions: {!r}", e)
+
+    def public_jwk(self) -> Mapping[str, Any]:
+        """public key of the assertions, to be published in the client JWK set"""
+        algorithm = get_default_algorithms()[self.algorithm]
+        jwk = json.loads(algorithm.to_jwk(self.private_key.public_key()))
+        jwk.update(alg=self.algorithm, use="sig")
+        if self.key_id is not None:
+            jwk["kid"] = self.key_id
+        return jwk
+
+    async def close(self):
+        if self._refill is not None:
+            self._refill.cancel()
+            self._refill = None
+        self._assertions.clear()
+
+
+class BackendServicesPartner(Partner):
+    """
+    Partner authenticating with SMART backend services: client credentials
+    grant with an asymmetric client assertion (private_key_jwt). Assertions
+    are taken from a ClientAssertionPool.
+    """
+
+    supported_strategies: set = {Strategy.M2M}
+    # PEM encoded RSA (RS384) or EC P-384 (ES384) private key
+    private_key: str
+    key_id: str | None = None
+    algorithm: str = "RS384"
+    scope: str = "system/*.read"
+    # seconds before the expiry of the assertions, 300 at most
+    assertion_lifetime: int = 300
+    assertion_pool_size: int = 4
+
+    _assertions: ClientAssertionPool | None = PrivateAttr(None)
+
+    @property
+    def assertions(self) -> ClientAssertionPool:
+        if self._assertions is None:
+            self._assertions = ClientAssertionPool(
+                self.client_id,
+                self.token_url,
+                self.private_key,
+                algorithm=self.algorithm,
+                key_id=self.key_id,
+                lifetime=self.assertion_lifetime,
+                size=self.assertion_pool_size,
+            )
+        return self._assertions
+
+    async def get_access_token_for_m2m(
+        self, session: ClientSession, scope: str | None = None, **kwargs
+    ) -> Mapping[str, Any]:
+        """
+        Request a token with the next assertion of the pool
+
+        Args:
+            session: pooled session of the factory
+            scope: requested scopes, the partner ones by default (organizations
+                may give their own as parameter)
+
+        Returns:
+            the token endpoint response
+        """
+        data = {
+            "grant_type": "client_credentials",
+            "scope": scope or self.scope,
+            "client_assertion_type": CLIENT_ASSERTION_TYPE,
+            "client_assertion": await self.assertions.get(),
+        }
+        try:
+            async with session.post(self.token_url, data=data) as r:
+                r.raise_for_status()
+                return await r.json(content_type=None)
+        finally:
+            self.assertions.refill()
+
+    async def get_key_as_json(self, session) -> Mapping[str, Any]:
+        """JWK set of the public key, to be registered by the token server"""
+        return {"keys": [self.assertions.public_jwk()]}
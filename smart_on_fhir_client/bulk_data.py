@@ -0,0 +1,232 @@
+import asyncio
+import enum
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List
+
+from aiohttp import ClientResponse, StreamReader
+from fhirpy.base.exceptions import OperationOutcome
+from loguru import logger
+from pydantic import BaseModel
+
+from smart_on_fhir_client.retry import parse_retry_after
+
+NDJSON_FORMAT = "application/fhir+ndjson"
+
+
+class ExportLevel(enum.Enum):
+    SYSTEM = enum.auto()
+    GROUP = enum.auto()
+    PATIENT = enum.auto()
+
+
+class BulkDataError(Exception):
+    """The export failed or did not complete in time"""
+
+    ...
+
+
+class BulkExportFile(BaseModel):
+    type: str
+    url: str
+    count: int | None = None
+
+
+class BulkExportManifest(BaseModel):
+    """Body of the completed status request"""
+
+    transactionTime: str
+    request: str
+    requiresAccessToken: bool = False
+    output: List[BulkExportFile] = []
+    error: List[BulkExportFile] = []
+
+
+async def iter_lines(content: StreamReader, chunk_size: int = 2**16):
+    """split a stream on new lines, whatever the length of the lines"""
+    buffer = b""
+    async for chunk in content.iter_chunked(chunk_size):
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+class BulkExport:
+    """
+    A kicked-off bulk data export ($export) of a fhir server.
+
+    Usage:
+        export = await client.bulk_export(types=["Patient", "Observation"])
+        async for resource in export.stream():
+            ...
+    """
+
+    def __init__(self, client, status_url: str, poll_interval: float = 10.0):
+        self.client = client
+        self.status_url = status_url
+        self.poll_interval = poll_interval
+        self.manifest: BulkExportManifest | None = None
+
+    async def wait(self, timeout: float | None = None) -> BulkExportManifest:
+        """
+        Poll the status endpoint until the export completes, honouring the
+        Retry-After header of the server
+
+        Args:
+            timeout: max time to wait in seconds
+
+        Returns:
+            the export manifest
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self.manifest is None:
+            async with self.client.bulk_data_request(
+                "GET", self.status_url, headers={"Accept": "application/json"}
+            ) as r:
+                if r.status == 200:
+                    self.manifest = BulkExportManifest.parse_raw(await r.read())
+                    break
+                if r.status not in (202, 429):
+                    raise OperationOutcome(reason=await r.text())
+                delay = parse_retry_after(r.headers) or self.poll_interval
+                logger.debug(
+                    f"Bulk export in progress {r.headers.get('X-Progress', '')}, "
+                    f"next poll in {delay}s"
+                )
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise BulkDataError(f"Export {self.status_url} not completed in time")
+            await asyncio.sleep(delay)
+        return self.manifest
+
+    async def cancel(self):
+        """cancel the export, or delete its files once completed"""
+        async with self.client.bulk_data_request("DELETE", self.status_url) as r:
+            if r.status >= 400:
+                raise OperationOutcome(reason=await r.text())
+
+    async def _download(self, file: BulkExportFile, queue: asyncio.Queue, raw: bool):
+        decode = self.client.json_decoder.decode
+        async with self.client.bulk_data_request(
+            "GET",
+            file.url,
+            headers={"Accept": NDJSON_FORMAT},
+            authorized=self.manifest.requiresAccessToken,
+        ) as r:
+            if r.status != 200:
+                raise OperationOutcome(reason=await r.text())
+            async for line in iter_lines(r.content):
+                data = decode(line)
+                await queue.put(data if raw else self._to_resource(data))
+
+    def _to_resource(self, data: Dict[str, Any]):
+        resource = self.client.resource(data["resourceType"], **data)
+        fhir_manager = self.client.fhir_manager
+        if fhir_manager is None:
+            return resource
+        return fhir_manager.create_async_fhir_resource(self.client, resource)
+
+    async def _download_all(
+        self,
+        files: Iterable[BulkExportFile],
+        queue: asyncio.Queue,
+        raw: bool,
+        max_concurrent_downloads: int,
+    ):
+        semaphore = asyncio.Semaphore(max_concurrent_downloads)
+
+        async def download(file: BulkExportFile):
+            async with semaphore:
+                logger.debug(f"Downloading {file.type} export file {file.url}")
+                await self._download(file, queue, raw)
+
+        try:
+            await asyncio.gather(*(download(file) for file in files))
+        except Exception as e:
+            await queue.put(e)
+        else:
+            await queue.put(None)
+
+    async def stream(
+        self,
+        types: Iterable[str] | None = None,
+        *,
+        raw: bool = False,
+        max_concurrent_downloads: int = 4,
+        buffer_size: int = 1000,
+        timeout: float | None = None,
+    ) -> AsyncIterator[Any]:
+        """
+        Wait for the export then stream its resources, downloading the ndjson
+        files in parallel and decoding them line by line
+
+        Args:
+            types: resource types to download, all by default
+            raw: yield decoded dicts instead of CustomFHIRResource
+            max_concurrent_downloads: number of files downloaded simultaneously
+            buffer_size: number of resources buffered ahead of the consumer
+            timeout: max time to wait for the export completion
+
+        Returns:
+            an async iterator of resources, in no particular order
+        """
+        manifest = await self.wait(timeout=timeout)
+        types = set(types) if types is not None else None
+        files = [f for f in manifest.output if types is None or f.type in types]
+
+        queue = asyncio.Queue(maxsize=buffer_size)
+        producer = asyncio.create_task(
+            self._download_all(files, queue, raw, max_concurrent_downloads)
+        )
+        try:
+            while (item := await queue.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            producer.cancel()
+
+
+def export_path(level: ExportLevel, group_id: str | None = None) -> str:
+    match level:
+        case ExportLevel.SYSTEM:
+            return "$export"
+        case ExportLevel.PATIENT:
+            return "Patient/$export"
+        case ExportLevel.GROUP:
+            if not group_id:
+                raise ValueError("A group id is required for a group export")
+            return f"Group/{group_id}/$export"
+    raise ValueError("Invalid export level")
+
+
+def export_params(
+    types: Iterable[str] | None = None,
+    since: str | None = None,
+    type_filters: Iterable[str] | None = None,
+    output_format: str = NDJSON_FORMAT,
+) -> Dict[str, str]:
+    params = {"_outputFormat": output_format}
+    if types:
+        params["_type"] = ",".join(types)
+    if since:
+        params["_since"] = since
+    if type_filters:
+        params["_typeFilter"] = ",".join(type_filters)
+    return params
+
+
+def parse_kick_off(response: ClientResponse, body: bytes) -> str:
+    """status url of an accepted kick off request"""
+    if response.status != 202:
+        try:
+            raise OperationOutcome(resource=json.loads(body))
+        except ValueError:
+            raise OperationOutcome(reason=body.decode(errors="replace"))
+    status_url = response.headers.get("Content-Location")
+    if not status_url:
+        raise BulkDataError("No Content-Location returned by the export kick off")
+    return status_url
@@ -1,24 +1,63 @@
 import json
 import pickle
+import time
+from contextlib import asynccontextmanager
+from functools import partial
 from json import JSONDecodeError
-from typing import Type, Callable, NoReturn
+from typing import Type, Callable, NoReturn, Dict, Iterable, List
 
-import aiohttp
-from aiohttp import ClientSession
+from aiohttp import ClientResponse, ClientSession
 from fhirpy.base.exceptions import ResourceNotFound, OperationOutcome
-from fhirpy.base.utils import (
-    AttrDict,
-    unique_everseen,
-)
+from fhirpy.base.utils import unique_everseen
 from fhirpy.lib import AsyncFHIRClient, AsyncFHIRSearchSet
 from loguru import logger
 from seito.monad.async_opt import aopt
 from tenacity import retry, stop_after_attempt, retry_if_exception_type
 
+from smart_on_fhir_client.bulk_data import (
+    BulkExport,
+    ExportLevel,
+    export_params,
+    export_path,
+    parse_kick_off,
+)
+from smart_on_fhir_client.coalescing import RequestCoalescer
+from smart_on_fhir_client.compression import CompressionOptions
+from smart_on_fhir_client.connection import ConnectionPool, ConnectionPoolOptions
+from smart_on_fhir_client.decoder import (
+    JsonDecoder,
+    StreamingDecoder,
+    default_decoder,
+)
+from smart_on_fhir_client.http_cache import HttpCache
+from smart_on_fhir_client.instrumentation import (
+    DECODE_DURATION,
+    RATE_LIMITER_WAIT,
+    REQUEST_DURATION,
+    REQUEST_RETRIES,
+    RESPONSE_SIZE,
+    TOKEN_FETCH_DURATION,
+    Instrumentation,
+)
+from smart_on_fhir_client.offload import Offload
 from smart_on_fhir_client.partner import Partner, Organization
+from smart_on_fhir_client.rate_limit import RateLimiter, RateLimiterRegistry
+from smart_on_fhir_client.resource_cache import ResourceCache, split_reference
+from smart_on_fhir_client.retry import (
+    RetryPolicy,
+    RetryBudget,
+    RetryableOperationOutcome,
+    parse_retry_after,
+)
 from smart_on_fhir_client.requester.fhir_reference import CustomFHIRReference
 from smart_on_fhir_client.requester.fhir_resource import CustomFHIRResource
 from smart_on_fhir_client.strategy import Strategy
+from smart_on_fhir_client.token_store import AccessToken, TokenStore
+from smart_on_fhir_client.transport import (
+    AiohttpTransport,
+    Transport,
+    TransportResponse,
+)
 from smart_on_fhir_client.utils import mixin
 
 
@@ -26,6 +65,10 @@ class UnauthorizedError(Exception):
     ...
 
 
+# size of the chunks of the streamed responses
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
 @mixin
 class RefreshTokenHandlerMixin:
     async def trade_refresh_token_to_access_token(self):
@@ -92,6 +135,21 @@ class SmartOnFhirClient(RefreshTokenHandlerMixin, AsyncFHIRClient):
         fhir_manager=None,
         strategy=None,
         organization=None,
+        pool=None,
+        token_store=None,
+        access_token=None,
+        retry_policy=None,
+        rate_limiter=None,
+        json_decoder=None,
+        resource_cache=None,
+        http_cache=None,
+        request_coalescer=None,
+        instrumentation=None,
+        log_bodies=False,
+        validate_models=True,
+        offload=None,
+        transport=None,
+        compression=None,
     ):
         super(AsyncFHIRClient, self).__init__(url, authorization, extra_headers)
         self.refresh_token = refresh_token
@@ -99,6 +157,34 @@ class SmartOnFhirClient(RefreshTokenHandlerMixin, AsyncFHIRClient):
         self.fhir_manager = fhir_manager
         self.strategy = strategy
         self.organization = organization
+        self._pool: ConnectionPool | None = pool
+        self._token_store: TokenStore | None = token_store
+        self._access_token: AccessToken | None = access_token
+        self.retry_policy: RetryPolicy = retry_policy or RetryPolicy()
+        self.retry_budget = RetryBudget.for_policy(self.retry_policy)
+        self.rate_limiter: RateLimiter | None = rate_limiter
+        self.json_decoder: JsonDecoder = json_decoder or default_decoder()
+        # not `or`: an empty cache is falsy
+        self.resource_cache: ResourceCache = (
+            resource_cache if resource_cache is not None else ResourceCache()
+        )
+        self.http_cache: HttpCache | None = http_cache
+        # not `or`: an empty coalescer is falsy
+        self.request_coalescer: RequestCoalescer = (
+            request_coalescer
+            if request_coalescer is not None
+            else RequestCoalescer(enabled=False)
+        )
+        self.instrumentation: Instrumentation = instrumentation or Instrumentation()
+        # request bodies are only logged on demand, serializing them is costly
+        self.log_bodies = log_bodies
+        # validate the resources converted to pydantic models (return_as)
+        self.validate_models = validate_models
+        self.offload: Offload | None = offload
+        self._transport: Transport | None = transport
+        self.compression: CompressionOptions = compression or CompressionOptions()
+        # disabled once the server rejected a compressed body
+        self._compress_requests = True
 
     @property
     def client_name(self):
@@ -112,71 +198,419 @@ class SmartOnFhirClient(RefreshTokenHandlerMixin, AsyncFHIRClient):
     def partner_name(self):
         return self.partner.name
 
+    @property
+    def pool(self) -> ConnectionPool:
+        # not `or`: a pool without session yet is falsy
+        return self._pool if self._pool is not None else smart_client_factory.pool
+
+    @property
+    def token_store(self) -> TokenStore:
+        return self._token_store or smart_client_factory.token_store
+
+    @property
+    def token_key(self):
+        return TokenStore.key_for(self.partner, self.strategy, self.organization)
+
+    @property
+    def _http_cache_scope(self) -> str:
+        # responses depend on the credentials of the client
+        return "/".join(self.token_key)
+
+    def _access_token_expires_soon(self) -> bool:
+        return self._access_token is not None and self._access_token.expires_within(
+            self.token_store.refresh_margin
+        )
+
+    @property
+    def transport(self) -> Transport:
+        """transport of the requests, aiohttp with the pooled sessions by
+        default"""
+        if self._transport is None:
+            self._transport = AiohttpTransport(self.pool)
+        return self._transport
+
+    @property
+    def session(self) -> ClientSession:
+        """pooled session shared by all clients of this fhir server"""
+        return self.pool.session_for(self.url)
+
+    def _build_request_url(self, path, params):
+        if not path.strip("/") and not params:
+            # system interactions (batch / transaction) are sent to the base url
+            return self.url.rstrip("/")
+        return super()._build_request_url(path, params)
+
+    def _request_attributes(self, method: str, path: str) -> Dict[str, str]:
+        """attributes of the spans and metrics of a request"""
+        if path.startswith(self.url):
+            path = path[len(self.url) :]
+        resource_type = path.split("?", 1)[0].strip("/").split("/", 1)[0]
+        return {
+            "fhir.partner": self.partner_name if self.partner else "",
+            "fhir.client": self.client_name if self.partner else "",
+            "fhir.resource_type": resource_type,
+            "http.method": method.upper(),
+        }
+
+    @asynccontextmanager
+    async def _rate_limited(self, attributes: Dict[str, str]):
+        if self.rate_limiter is None:
+            yield
+            return
+        start = time.perf_counter()
+        async with self.rate_limiter.acquire():
+            self.instrumentation.record(
+                RATE_LIMITER_WAIT, time.perf_counter() - start, attributes
+            )
+            yield
+
+    async def _decode(self, content: bytes, attributes: Dict[str, str]):
+        start = time.perf_counter()
+        try:
+            if self.offload is not None and self.offload.decodes(len(content)):
+                return await self.offload.run(self.json_decoder.decode, content)
+            return self.json_decoder.decode(content)
+        finally:
+            self.instrumentation.record(
+                DECODE_DURATION, time.perf_counter() - start, attributes
+            )
+
+    def _streams(self, method: str, r: TransportResponse | ClientResponse) -> bool:
+        if self.http_cache is not None and method.upper() == "GET":
+            # the cache stores the raw body
+            return False
+        if self.offload is not None:
+            # large bodies are decoded in the executor
+            return False
+        return self.compression.streams(r.headers.get("Content-Length"))
+
+    async def _decode_stream(
+        self, r: TransportResponse | ClientResponse, attributes: Dict[str, str]
+    ):
+        """decode a response while it is downloaded, the body being
+        decompressed and parsed chunk by chunk"""
+        decoder = StreamingDecoder(self.json_decoder)
+        elapsed = 0.0
+        async for chunk in r.content.iter_chunked(STREAM_CHUNK_SIZE):
+            start = time.perf_counter()
+            decoder.feed(chunk)
+            elapsed += time.perf_counter() - start
+        start = time.perf_counter()
+        result = decoder.close()
+        elapsed += time.perf_counter() - start
+        self.instrumentation.record(RESPONSE_SIZE, decoder.size, attributes)
+        self.instrumentation.record(DECODE_DURATION, elapsed, attributes)
+        return result
+
+    def _compressed_body(self, data) -> bytes | None:
+        """gzipped json body, if it is large enough to be compressed"""
+        if self.compression.compress_threshold is None or not self._compress_requests:
+            return None
+        payload = json.dumps(data).encode()
+        if not self.compression.compresses(payload):
+            return None
+        return self.compression.compress(payload)
+
     @retry(stop=stop_after_attempt(3), retry=retry_if_exception_type(UnauthorizedError))
     async def _retry(self, method, path, data=None, params=None, form_encoded=False):
-        # if we do not have an authorization token
-        # try fetch one
-        if not self.authorization:
+        # if we do not have an authorization token or if it is about
+        # to expire, try fetch one
+        if not self.authorization or self._access_token_expires_soon():
             await self.fetch_access_token()
 
         headers = self._build_request_headers()
         url = self._build_request_url(path, params)
+        attributes = self._request_attributes(method, path)
         logger.debug("Fetching {}", url)
 
         body = dict(data=data) if form_encoded else dict(json=data)
-        logger.debug(body)
-        async with aiohttp.request(method, url, headers=headers, **body) as r:
-            if 200 <= r.status < 300:
-                data = await r.text()
-                return json.loads(data, object_hook=AttrDict)
-
-            if r.status == 404 or r.status == 410:
-                raise ResourceNotFound(await r.text())
-
-            if r.status == 403 or r.status == 401:
-                # retry with a refresh token
-                # fetch a brand-new access token ?
-                await self.fetch_access_token()
-                # self.trade_refresh_token_to_access_token()
-                # self.authorization = f"Bearer {access}"
-                # self.refresh_token = refresh
-                raise UnauthorizedError("Retrying because of unauthorized")
-
-            data = await r.text()
+        if self.log_bodies:
+            logger.debug(body)
+        headers = {**headers, "Accept-Encoding": self.compression.accept_encoding}
+        compressed = (
+            None if form_encoded or data is None else self._compressed_body(data)
+        )
+        if compressed is not None:
+            body = dict(data=compressed)
+            headers = {
+                **headers,
+                "Content-Type": "application/json",
+                "Content-Encoding": "gzip",
+            }
+        cached = None
+        if self.http_cache is not None and method.upper() == "GET":
+            cached = await self.http_cache.lookup(url, self._http_cache_scope)
+            if cached is not None:
+                headers = {**headers, **cached.conditional_headers()}
+
+        status = 0
+        start = time.perf_counter()
+        # on the span only: too many values for metrics. Search parameters
+        # are left out, they may identify patients
+        span_attributes = {**attributes, "http.url": url.split("?", 1)[0]}
+        with self.instrumentation.span(
+            f"FHIR {method.upper()}", span_attributes
+        ) as span:
             try:
-                parsed_data = json.loads(data)
-                if parsed_data["resourceType"] == "OperationOutcome":
-                    raise OperationOutcome(resource=parsed_data)
-                raise OperationOutcome(reason=data)
-            except (KeyError, JSONDecodeError):
-                raise OperationOutcome(reason=data)
+                async with self.transport.request(
+                    method, url, headers=headers, **body
+                ) as r:
+                    status = r.status
+                    if span is not None:
+                        span.set_attribute("http.status_code", r.status)
+                    if r.status == 304 and cached is not None:
+                        content = self.http_cache.not_modified(cached)
+                    elif 200 <= r.status < 300:
+                        if self._streams(method, r):
+                            return await self._decode_stream(r, attributes)
+                        content = await r.read()
+                        if self.http_cache is not None and method.upper() == "GET":
+                            await self.http_cache.store(
+                                url, r.headers, content, self._http_cache_scope
+                            )
+                    elif r.status == 415 and compressed is not None:
+                        content = None
+                    else:
+                        await self._raise_for_status(r, headers)
+            finally:
+                self.instrumentation.record(
+                    REQUEST_DURATION,
+                    time.perf_counter() - start,
+                    {**attributes, "http.status_code": status},
+                )
+        if content is None:
+            logger.warning(
+                "{} rejected a gzipped body, sending uncompressed bodies", self.url
+            )
+            self._compress_requests = False
+            return await self._retry(
+                method, path, data=data, params=params, form_encoded=form_encoded
+            )
+        self.instrumentation.record(RESPONSE_SIZE, len(content), attributes)
+        return await self._decode(content, attributes)
+
+    async def _raise_for_status(
+        self, r: TransportResponse | ClientResponse, headers: Dict[str, str]
+    ):
+        if r.status == 404 or r.status == 410:
+            raise ResourceNotFound(await r.text())
+
+        if r.status == 403 or r.status == 401:
+            # retry with a refresh token
+            # fetch a brand-new access token, unless a concurrent
+            # request already replaced the rejected one
+            await self.fetch_access_token(rejected=headers.get("Authorization"))
+            # self.trade_refresh_token_to_access_token()
+            # self.authorization = f"Bearer {access}"
+            # self.refresh_token = refresh
+            raise UnauthorizedError("Retrying because of unauthorized")
+
+        data = await r.text()
+        # throttling and server errors may be retried by the retry policy
+        outcome_cls = (
+            partial(
+                RetryableOperationOutcome,
+                status=r.status,
+                retry_after=parse_retry_after(r.headers),
+            )
+            if self.retry_policy.retries_status(r.status)
+            else OperationOutcome
+        )
+        try:
+            parsed_data = json.loads(data)
+            if parsed_data["resourceType"] == "OperationOutcome":
+                raise outcome_cls(resource=parsed_data)
+            raise outcome_cls(reason=data)
+        except (KeyError, JSONDecodeError):
+            raise outcome_cls(reason=data)
 
     async def _do_request(
         self, method, path, data=None, params=None, form_encoded=False
     ):
-        return await self._retry(
-            method, path, data=data, params=params, form_encoded=form_encoded
+        key = self.request_coalescer.key_for(
+            method, path, params=params, data=data, scope=self.token_key
+        )
+        return await self.request_coalescer.run(
+            key,
+            partial(
+                self._send_request,
+                method,
+                path,
+                data=data,
+                params=params,
+                form_encoded=form_encoded,
+            ),
         )
 
-    async def fetch_access_token(self):
+    async def _send_request(
+        self, method, path, data=None, params=None, form_encoded=False
+    ):
+        attributes = self._request_attributes(method, path)
+        async for attempt in self.retry_policy.retrying(
+            method, path, self.retry_budget
+        ):
+            if attempt.retry_state.attempt_number > 1:
+                self.instrumentation.count(REQUEST_RETRIES, attributes)
+            with attempt:
+                async with self._rate_limited(attributes):
+                    result = await self._retry(
+                        method,
+                        path,
+                        data=data,
+                        params=params,
+                        form_encoded=form_encoded,
+                    )
+        self._sync_resource_cache(method, path, result)
+        return result
+
+    def _sync_resource_cache(self, method: str, path: str, result):
+        """invalidate the cached resources written through this client, or
+        read with another versionId"""
+        if path.startswith(self.url):
+            path = path[len(self.url) :]
+        target = split_reference(path)
+        if isinstance(result, dict) and result.get("id"):
+            resource_type, id_ = result.get("resourceType"), result["id"]
+        elif target is not None:
+            resource_type, id_ = target[0], target[1]
+        else:
+            return
+        if method.upper() != "GET":
+            self.resource_cache.invalidate(resource_type, id_)
+        elif resource_type != "Bundle" and (target is None or target[2] is None):
+            # a version read from the history may not be the current one
+            self.resource_cache.invalidate_if_outdated(result)
+
+    async def _request_access_token(self):
+        attributes = {
+            "fhir.partner": self.partner_name,
+            "fhir.client": self.client_name,
+            "fhir.strategy": self.strategy.name if self.strategy else "",
+        }
+        start = time.perf_counter()
+        with self.instrumentation.span("FHIR access token", attributes):
+            try:
+                return await self.partner.get_access_token_for_strategy(
+                    self.strategy,
+                    smart_client_factory.session,
+                    **(
+                        self.organization.parameters
+                        if self.organization is not None
+                        else {}
+                    ),
+                )
+            finally:
+                self.instrumentation.record(
+                    TOKEN_FETCH_DURATION, time.perf_counter() - start, attributes
+                )
+
+    async def fetch_access_token(self, rejected: str | None = None):
+        """
+        Get an access token from the token store, requesting the partner
+        only when there is no valid token
+
+        Args:
+            rejected: authorization header refused by the server, the
+                token store will not hand it back
+        """
         logger.debug(f"Trying to fetch access token for {self.client_name=}")
-        session = smart_client_factory.session
+        stale = rejected.removeprefix("Bearer ") if rejected else None
         try:
-            access_token = await self.partner.get_access_token_for_strategy(
-                self.strategy,
-                session,
-                **(
-                    self.organization.parameters
-                    if self.organization is not None
-                    else {}
-                ),
+            access_token = await self.token_store.get(
+                self.token_key,
+                self._request_access_token,
+                stale=stale,
+                default_lifetime=self.partner.default_token_lifetime,
             )
         except Exception as e:
             logger.error(e)
             logger.warning(f"Unable to fetch access token for {self.client_name=}")
             raise UnauthorizedError("Can not get access token")
         else:
-            self.authorization = f"Bearer {access_token}"
+            self._access_token = access_token
+            self.authorization = f"Bearer {access_token.access_token}"
+
+    @asynccontextmanager
+    async def bulk_data_request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Dict[str, str] | None = None,
+        authorized: bool = True,
+    ):
+        """
+        Raw request of the bulk data api, whose responses are neither json nor
+        bundles (202 accepted, ndjson files). The access token is refreshed
+        once if rejected.
+
+        Args:
+            method: http method
+            url: absolute url
+            headers: headers overriding the default ones
+            authorized: send the access token
+
+        Returns:
+            a context manager of the aiohttp response
+        """
+        for attempt in range(2):
+            if authorized and (
+                not self.authorization or self._access_token_expires_soon()
+            ):
+                await self.fetch_access_token()
+            request_headers = {
+                **(self._build_request_headers() if authorized else {}),
+                **(headers or {}),
+            }
+            async with self._rate_limited(self._request_attributes(method, url)):
+                async with self.pool.session_for(url).request(
+                    method, url, headers=request_headers
+                ) as r:
+                    if authorized and attempt == 0 and r.status in (401, 403):
+                        await self.fetch_access_token(
+                            rejected=request_headers.get("Authorization")
+                        )
+                        continue
+                    yield r
+                    return
+
+    async def bulk_export(
+        self,
+        level: ExportLevel = ExportLevel.SYSTEM,
+        group_id: str | None = None,
+        *,
+        types: Iterable[str] | None = None,
+        since: str | None = None,
+        type_filters: Iterable[str] | None = None,
+        poll_interval: float = 10.0,
+    ) -> BulkExport:
+        """
+        Kick off a bulk data export ($export) at system, group or patient level
+
+        Args:
+            level: export level
+            group_id: id of the group for group level exports
+            types: resource types to export
+            since: only resources updated after this instant
+            type_filters: _typeFilter searches
+            poll_interval: delay between status polls when the server does not
+                send any Retry-After
+
+        Returns:
+            the export, to wait for and stream
+        """
+        url = self._build_request_url(
+            export_path(level, group_id),
+            export_params(types=types, since=since, type_filters=type_filters),
+        )
+        async with self.bulk_data_request(
+            "GET",
+            url,
+            headers={"Accept": "application/fhir+json", "Prefer": "respond-async"},
+        ) as r:
+            status_url = parse_kick_off(r, await r.read())
+        logger.info(f"Bulk export kicked off for {self.client_name=}: {status_url}")
+        return BulkExport(self, status_url, poll_interval=poll_interval)
 
     def reference(self, resource_type=None, id_=None, reference=None, **kwargs):
         if resource_type and id_:
@@ -193,6 +627,19 @@ class SmartOnFhirClient(RefreshTokenHandlerMixin, AsyncFHIRClient):
     def dumps(self):
         return pickle.dumps(self)
 
+    def __getstate__(self):
+        # pooled sessions and locks are bound to the event loop,
+        # they can not be pickled
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        state["_token_store"] = None
+        state["rate_limiter"] = None
+        state["instrumentation"] = Instrumentation()
+        state["offload"] = None
+        state["_transport"] = None
+        state["request_coalescer"] = RequestCoalescer(self.request_coalescer.enabled)
+        return state
+
     def __str__(self):
         return f"< SmartOnFhirClient url={self.url} >"
 
@@ -202,12 +649,39 @@ class InvalidAccessToken(Exception):
 
 
 class SmartOnFhirClientBuilder:
-    def __init__(self, session: ClientSession):
+    def __init__(
+        self,
+        session: ClientSession,
+        pool: ConnectionPool | None = None,
+        token_store: TokenStore | None = None,
+        rate_limiters: RateLimiterRegistry | None = None,
+        dedicated_pools: List[ConnectionPool] | None = None,
+    ):
         """
 
         Args:
             session:
+            pool: connection pool used by the built clients
+            token_store: access tokens cache shared by the built clients
+            rate_limiters: rate limiters shared by the built clients
+            dedicated_pools: pools created by `with_connection_pool`, closed
+                with the factory
         """
+        self._pool = pool
+        self._dedicated_pools = dedicated_pools if dedicated_pools is not None else []
+        self._token_store = token_store or TokenStore()
+        self._rate_limiters = rate_limiters or RateLimiterRegistry()
+        self._retry_policy = RetryPolicy()
+        self._json_decoder: JsonDecoder | None = None
+        self._resource_cache_options = {}
+        self._http_cache: HttpCache | None = None
+        self._request_coalescing = False
+        self._instrumentation: Instrumentation | None = None
+        self._log_bodies = False
+        self._validate_models = True
+        self._offload: Offload | None = None
+        self._transport: Transport | None = None
+        self._compression = CompressionOptions()
         self._partner: Partner | None = None
         self._strategy: Strategy | None = None
         self._organization: Organization | None = None
@@ -227,6 +701,12 @@ class SmartOnFhirClientBuilder:
     def organization(self):
         return self._organization
 
+    @property
+    def client_name(self) -> str:
+        """name of the built client: organization slug or partner name"""
+        self._check_partner()
+        return self._organization.slug if self._organization else self._partner.name
+
     @property
     def cls_by_resource(self):
         return self._cls_by_resource
@@ -235,6 +715,25 @@ class SmartOnFhirClientBuilder:
     def target_fhir_server_authorization(self):
         return self._target_fhir_server_authorization
 
+    @property
+    def pool(self) -> ConnectionPool | None:
+        return self._pool
+
+    @property
+    def token_store(self) -> TokenStore:
+        return self._token_store
+
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        return self._retry_policy
+
+    @property
+    def rate_limiter(self) -> RateLimiter | None:
+        """rate limiter of the client, depending on the partner and
+        organization rate limits"""
+        self._check_partner()
+        return self._rate_limiters.for_client(self._partner, self._organization)
+
     def _check_partner(self) -> NoReturn:
         """ """
         if not self._partner:
@@ -311,12 +810,208 @@ class SmartOnFhirClientBuilder:
         self._target_fhir_server_authorization = jwt_token
         return self
 
+    def with_connection_pool(
+        self, pool: ConnectionPool | ConnectionPoolOptions
+    ) -> "SmartOnFhirClientBuilder":
+        """
+        Use a dedicated connection pool instead of the factory one. A pool
+        created from options is closed with the factory, a given pool is left
+        to its owner.
+
+        Args:
+            pool: a pool or the options of a new pool
+
+        Returns:
+
+        """
+        if isinstance(pool, ConnectionPoolOptions):
+            pool = ConnectionPool(pool)
+            self._dedicated_pools.append(pool)
+        self._pool = pool
+        return self
+
+    def with_token_store(self, token_store: TokenStore) -> "SmartOnFhirClientBuilder":
+        """
+        Use a dedicated token store, e.g. backed by a cache shared
+        between processes
+
+        Args:
+            token_store:
+
+        Returns:
+
+        """
+        self._token_store = token_store
+        return self
+
+    def with_json_decoder(self, decoder: JsonDecoder) -> "SmartOnFhirClientBuilder":
+        """
+        Set the decoder of the fhir server responses, by default the fastest
+        json library installed (orjson, ujson, json) with lazy AttrDict wrapping
+
+        Args:
+            decoder:
+
+        Returns:
+
+        """
+        self._json_decoder = decoder
+        return self
+
+    def with_resource_cache(
+        self, max_size: int = 1024, ttl: float | None = 300
+    ) -> "SmartOnFhirClientBuilder":
+        """
+        Configure the cache of the resources resolved from references
+
+        Args:
+            max_size: max number of resources, 0 disables the cache
+            ttl: time to live of resources in seconds
+
+        Returns:
+
+        """
+        self._resource_cache_options = dict(max_size=max_size, ttl=ttl)
+        return self
+
+    def with_http_cache(
+        self, http_cache: HttpCache | None = None
+    ) -> "SmartOnFhirClientBuilder":
+        """
+        Revalidate GET requests with If-None-Match / If-Modified-Since,
+        serving 304 responses from the cache. Share the same cache between
+        builders of the same fhir server to share the entries.
+
+        Args:
+            http_cache: the cache, in memory by default
+
+        Returns:
+
+        """
+        self._http_cache = http_cache or HttpCache()
+        return self
+
+    def with_request_coalescing(
+        self, enabled: bool = True
+    ) -> "SmartOnFhirClientBuilder":
+        """
+        Share a single request between identical GET requests (and POST
+        searches) running concurrently, disabled by default
+
+        Args:
+            enabled:
+
+        Returns:
+
+        """
+        self._request_coalescing = enabled
+        return self
+
+    def with_instrumentation(
+        self, instrumentation: Instrumentation | None = None, log_bodies: bool = False
+    ) -> "SmartOnFhirClientBuilder":
+        """
+        Trace the requests and record their metrics, e.g. with
+        OpenTelemetryInstrumentation
+
+        Args:
+            instrumentation: hooks called by the client
+            log_bodies: log the request bodies at debug level
+
+        Returns:
+
+        """
+        self._instrumentation = instrumentation
+        self._log_bodies = log_bodies
+        return self
+
+    def with_model_validation(
+        self, validate: bool = True
+    ) -> "SmartOnFhirClientBuilder":
+        """
+        Validate the resources converted to pydantic models by the searches
+        (`return_as`). Without validation, models are built from the server
+        data as is (`construct`), several times faster: use it for trusted
+        servers, `conversion.validated` validating a model on demand.
+
+        Args:
+            validate:
+
+        Returns:
+
+        """
+        self._validate_models = validate
+        return self
+
+    def with_offload(self, offload: Offload) -> "SmartOnFhirClientBuilder":
+        """
+        Decode large responses and convert large pages to `return_as` in an
+        executor, e.g. `Offload.process_pool()`, keeping the event loop
+        responsive
+
+        Args:
+            offload:
+
+        Returns:
+
+        """
+        self._offload = offload
+        return self
+
+    def with_transport(self, transport: Transport) -> "SmartOnFhirClientBuilder":
+        """
+        Send the requests with another transport than the aiohttp pooled
+        sessions, e.g. HttpxTransport for HTTP/2. The transport is not closed
+        by the factory. Bulk data downloads always use aiohttp.
+
+        Args:
+            transport:
+
+        Returns:
+
+        """
+        self._transport = transport
+        return self
+
+    def with_compression(
+        self, compression: CompressionOptions | None = None, **options
+    ) -> "SmartOnFhirClientBuilder":
+        """
+        Set how requests and responses are compressed, and from which size
+        responses are decoded while downloaded
+
+        Args:
+            compression: the options, defaults to the current ones
+            **options: fields of CompressionOptions to override
+
+        Returns:
+
+        """
+        self._compression = (compression or self._compression).copy(update=options)
+        return self
+
+    def with_retry_policy(
+        self, retry_policy: RetryPolicy | None = None, **options
+    ) -> "SmartOnFhirClientBuilder":
+        """
+        Set the retry policy of throttled, failing or network errored requests
+
+        Args:
+            retry_policy: the policy, defaults to the current one
+            **options: fields of RetryPolicy to override
+
+        Returns:
+
+        """
+        self._retry_policy = (retry_policy or self._retry_policy).copy(update=options)
+        return self
+
     async def build(self, fhir_manager) -> SmartOnFhirClient:
         """
         build asynchronously a fhir client
         """
 
-        def build_client(access_token):
+        def build_client(access_token: AccessToken | None):
             if access_token:
                 organization = (
                     self._organization.slug if self._organization else "No organization"
@@ -330,16 +1025,32 @@ class SmartOnFhirClientBuilder:
                 )
             return SmartOnFhirClient(
                 self._partner.fhir_url,
-                authorization=f"Bearer {access_token}" if access_token else "",
+                authorization=f"Bearer {access_token.access_token}"
+                if access_token
+                else "",
                 partner=self._partner,
                 fhir_manager=fhir_manager,
                 strategy=self._strategy,
                 organization=self._organization,
+                pool=self._pool,
+                token_store=self._token_store,
+                access_token=access_token,
+                retry_policy=self._retry_policy,
+                rate_limiter=self.rate_limiter,
+                json_decoder=self._json_decoder,
+                resource_cache=ResourceCache(**self._resource_cache_options),
+                http_cache=self._http_cache,
+                request_coalescer=RequestCoalescer(enabled=self._request_coalescing),
+                instrumentation=self._instrumentation,
+                log_bodies=self._log_bodies,
+                validate_models=self._validate_models,
+                offload=self._offload,
+                transport=self._transport,
+                compression=self._compression,
             )
 
-        return await (
-            aopt(
-                self._partner.get_access_token_for_strategy,
+        async def request_access_token():
+            return await self._partner.get_access_token_for_strategy(
                 self._strategy,
                 session=self._session,
                 **(
@@ -348,14 +1059,31 @@ class SmartOnFhirClientBuilder:
                     else {}
                 ),
             )
+
+        return await (
+            aopt(
+                self._token_store.get,
+                TokenStore.key_for(self._partner, self._strategy, self._organization),
+                request_access_token,
+                default_lifetime=self._partner.default_token_lifetime,
+            )
             .map(build_client)
-            .or_else(lambda: build_client(""))
+            .or_else(lambda: build_client(None))
         )
 
 
 class SmartOnFhirBuilderFactory:
-    def __init__(self):
+    def __init__(
+        self,
+        pool_options: ConnectionPoolOptions | None = None,
+        token_store: TokenStore | None = None,
+    ):
         self._session = None
+        self._pool = ConnectionPool(pool_options)
+        # pools created by the builders for their clients
+        self._dedicated_pools: List[ConnectionPool] = []
+        self._token_store = token_store or TokenStore()
+        self._rate_limiters = RateLimiterRegistry()
 
     async def init(self):
         """ """
@@ -367,7 +1095,54 @@ class SmartOnFhirBuilderFactory:
         Returns:
 
         """
-        return SmartOnFhirClientBuilder(self._session)
+        return SmartOnFhirClientBuilder(
+            self._session,
+            self._pool,
+            self._token_store,
+            self._rate_limiters,
+            self._dedicated_pools,
+        )
+
+    def configure_pool(self, **options) -> "SmartOnFhirBuilderFactory":
+        """
+        Configure the connection pool shared by the fhir clients
+
+        Args:
+            **options: any field of ConnectionPoolOptions
+
+        Returns:
+
+        """
+        self._pool.configure(**options)
+        return self
+
+    @property
+    def pool(self) -> ConnectionPool:
+        """
+
+        Returns:
+
+        """
+        return self._pool
+
+    @property
+    def token_store(self) -> TokenStore:
+        """
+
+        Returns:
+
+        """
+        return self._token_store
+
+    @property
+    def rate_limiters(self) -> RateLimiterRegistry:
+        """
+        Rate limiters of the partners and organizations, exposing their metrics
+
+        Returns:
+
+        """
+        return self._rate_limiters
 
     @property
     def session(self):
@@ -378,9 +1153,16 @@ class SmartOnFhirBuilderFactory:
         """
         return self._session
 
+    async def _close_pools(self):
+        await self._pool.close()
+        pools, self._dedicated_pools[:] = list(self._dedicated_pools), []
+        for pool in pools:
+            await pool.close()
+
     async def close(self):
         """ """
         await self._session.close()
+        await self._close_pools()
 
     async def __aenter__(self):
         """
@@ -401,6 +1183,7 @@ class SmartOnFhirBuilderFactory:
             exc_tb:
         """
         await self._session.__aexit__(exc_type, exc_val, exc_tb)
+        await self._close_pools()
 
 
 smart_client_factory = SmartOnFhirBuilderFactory()
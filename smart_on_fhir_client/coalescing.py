@@ -0,0 +1,114 @@
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+from pydantic import BaseModel
+
+from smart_on_fhir_client.decoder import copy_decoded
+from smart_on_fhir_client.retry import is_idempotent
+
+
+class CoalescingMetrics(BaseModel):
+    # requests actually sent
+    sent: int = 0
+    # requests served by a identical request already in flight
+    coalesced: int = 0
+
+    @property
+    def coalesced_ratio(self) -> float:
+        total = self.sent + self.coalesced
+        return self.coalesced / total if total else 0.0
+
+
+class RequestCoalescer:
+    """
+    Identical idempotent requests running concurrently share a single
+    in-flight request: the first one is sent and gets its result as is, the
+    others wait for it and get their own copy of it.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.metrics = CoalescingMetrics()
+        # key -> futures of the requests waiting for the one in flight
+        self._in_flight: Dict[Hashable, List[asyncio.Future]] = {}
+
+    def key_for(
+        self, method: str, path: str, params=None, data=None, scope: Hashable = None
+    ) -> Hashable | None:
+        """
+        Key of a request, None if the request must not be coalesced
+
+        Args:
+            method: http method
+            path: path or url
+            params: query parameters
+            data: body of searches sent with POST
+            scope: authorization scope of the request, e.g. the token key
+        """
+        if not self.enabled or not is_idempotent(method, path):
+            return None
+        # writes (PUT, DELETE) are idempotent but their caller expects them
+        # to be sent
+        if method.upper() not in ("GET", "HEAD", "POST"):
+            return None
+        return (
+            method.upper(),
+            path,
+            json.dumps(params, sort_keys=True, default=str),
+            json.dumps(data, sort_keys=True, default=str),
+            scope,
+        )
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    async def run(
+        self, key: Hashable | None, request: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Send the request unless an identical one is in flight
+
+        Args:
+            key: key of the request, not coalesced if None
+            request: coroutine function sending the request
+
+        Returns:
+            the result of the request
+        """
+        if key is None:
+            return await request()
+        while (waiting := self._in_flight.get(key)) is not None:
+            future = asyncio.get_running_loop().create_future()
+            waiting.append(future)
+            self.metrics.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # the request sent was cancelled, send it again unless
+                # this request is the one cancelled
+                if not future.cancelled():
+                    if future in waiting:
+                        waiting.remove(future)
+                    raise
+                self.metrics.coalesced -= 1
+
+        waiting = self._in_flight[key] = []
+        self.metrics.sent += 1
+        try:
+            result = await request()
+        except asyncio.CancelledError:
+            for future in waiting:
+                future.cancel()
+            raise
+        except BaseException as e:
+            for future in waiting:
+                future.set_exception(e)
+            raise
+        else:
+            # copied before the result is returned, and possibly mutated
+            for future in waiting:
+                future.set_result(copy_decoded(result))
+            return result
+        finally:
+            self._in_flight.pop(key, None)
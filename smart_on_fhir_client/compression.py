@@ -0,0 +1,49 @@
+import gzip
+
+from pydantic import BaseModel
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# decoded by aiohttp and httpx, brotli when one of its packages is installed
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+
+class CompressionOptions(BaseModel):
+    """Compression of the requests and responses of a fhir client"""
+
+    # encodings accepted for the responses, decompressed while downloaded
+    accept_encoding: str = ACCEPT_ENCODING
+    # responses of at least this size in bytes on the wire (compressed) are
+    # decoded while downloaded instead of buffered. None to always buffer
+    stream_threshold: int | None = 2**20
+    # also decode while downloaded the responses of unknown size (chunked),
+    # for servers sending large searches without Content-Length
+    stream_chunked: bool = False
+    # gzip the json bodies of at least this size in bytes, None to never
+    # compress. Only for servers accepting `Content-Encoding: gzip`, a 415
+    # response disabling the compression for the client
+    compress_threshold: int | None = None
+    compress_level: int = 6
+
+    def streams(self, content_length: str | None) -> bool:
+        """whether a response of the given Content-Length is streamed"""
+        if self.stream_threshold is None:
+            return False
+        if content_length is None:
+            return self.stream_chunked
+        return int(content_length) >= self.stream_threshold
+
+    def compresses(self, body: bytes) -> bool:
+        """whether a request body is compressed"""
+        return (
+            self.compress_threshold is not None and len(body) >= self.compress_threshold
+        )
+
+    def compress(self, body: bytes) -> bytes:
+        return gzip.compress(body, compresslevel=self.compress_level)
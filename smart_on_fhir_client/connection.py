@@ -0,0 +1,95 @@
+from typing import Dict
+
+from aiohttp import ClientSession, TCPConnector
+from loguru import logger
+from pydantic import BaseModel
+from yarl import URL
+
+
+class ConnectionPoolOptions(BaseModel):
+    """Options of the connectors shared by all clients hitting the same
+    fhir server"""
+
+    # total number of simultaneous connections for one fhir server
+    limit: int = 100
+    # number of simultaneous connections to the same endpoint
+    limit_per_host: int = 20
+    # seconds an idle connection is kept alive for reuse
+    keepalive_timeout: float = 30.0
+    # seconds a resolved host is kept in the dns cache, None for ever
+    ttl_dns_cache: int | None = 300
+    use_dns_cache: bool = True
+    enable_cleanup_closed: bool = True
+
+
+class ConnectionPool:
+    """
+    Long-lived aiohttp sessions, one per fhir server origin, reused by every
+    client (and tenant) targeting this server. Connections are kept alive
+    between requests, avoiding a tcp connection and a tls handshake per call.
+    """
+
+    def __init__(self, options: ConnectionPoolOptions | None = None):
+        self._options = options or ConnectionPoolOptions()
+        self._sessions: Dict[str, ClientSession] = {}
+
+    @property
+    def options(self) -> ConnectionPoolOptions:
+        return self._options
+
+    def configure(self, **options) -> "ConnectionPool":
+        """
+        Update the pool options. Only sessions created afterwards are impacted.
+
+        Args:
+            **options: any field of ConnectionPoolOptions
+
+        Returns:
+            the pool itself
+        """
+        self._options = self._options.copy(update=options)
+        return self
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        """pool key of a fhir base url i.e. its origin"""
+        return str(URL(url).origin())
+
+    def _create_session(self) -> ClientSession:
+        connector = TCPConnector(
+            limit=self._options.limit,
+            limit_per_host=self._options.limit_per_host,
+            keepalive_timeout=self._options.keepalive_timeout,
+            ttl_dns_cache=self._options.ttl_dns_cache,
+            use_dns_cache=self._options.use_dns_cache,
+            enable_cleanup_closed=self._options.enable_cleanup_closed,
+        )
+        return ClientSession(connector=connector)
+
+    def session_for(self, url: str) -> ClientSession:
+        """
+        Get (or lazily create) the session serving the given fhir url.
+        Must be called from a running event loop.
+
+        Args:
+            url: fhir base url or any url on the same origin
+
+        Returns:
+            the pooled session
+        """
+        key = self.key_for(url)
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            logger.debug("Creating pooled session for {}", key)
+            session = self._sessions[key] = self._create_session()
+        return session
+
+    async def close(self):
+        """close all pooled sessions"""
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            if not session.closed:
+                await session.close()
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,305 @@
+import abc
+import json
+import re
+from typing import Any, Callable, List
+
+from fhirpy.base.utils import AttrDict
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+
+def _wrap(value):
+    if type(value) is dict:
+        return LazyAttrDict(value)
+    if type(value) is list:
+        return [LazyAttrDict(item) if type(item) is dict else item for item in value]
+    return value
+
+
+class LazyAttrDict(AttrDict):
+    """
+    AttrDict converting its nested dicts (and dicts of nested lists) into
+    LazyAttrDict only when they are accessed. Converted values are stored
+    back, so that mutations of nested values are kept.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # do not alias __dict__ as AttrDict does, attribute access must go
+        # through __getattr__ to wrap the values
+        dict.__init__(self, *args, **kwargs)
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        wrapped = _wrap(value)
+        if wrapped is not value:
+            dict.__setitem__(self, key, wrapped)
+        return wrapped
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def pop(self, key, *default):
+        return _wrap(dict.pop(self, key, *default))
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def __delattr__(self, key):
+        try:
+            del self[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __reduce__(self):
+        return self.__class__, (dict(self),)
+
+
+class JsonDecoder(abc.ABC):
+    """Decode fhir server responses, given as bytes"""
+
+    @abc.abstractmethod
+    def decode(self, data: bytes) -> Any:
+        ...
+
+    def decode_array(self, data: bytes) -> List[Any]:
+        """decode a json array whose items are nested values of a document,
+        see StreamingDecoder"""
+        return self.decode(data)
+
+
+class AttrDictJsonDecoder(JsonDecoder):
+    """stdlib json, wrapping eagerly every object into an AttrDict"""
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data, object_hook=AttrDict)
+
+
+class LazyJsonDecoder(JsonDecoder):
+    """Decode with the given loads function into plain python objects, only
+    the top level object being wrapped, nested ones being wrapped on access"""
+
+    def __init__(self, loads: Callable[[bytes], Any]):
+        self._loads = loads
+
+    def decode(self, data: bytes) -> Any:
+        return _wrap(self._loads(data))
+
+    def decode_array(self, data: bytes) -> List[Any]:
+        # nested values are wrapped on access
+        return self._loads(data)
+
+
+def default_decoder() -> JsonDecoder:
+    """lazy decoder using the fastest json library available, orjson then
+    ujson then the stdlib one"""
+    if orjson is not None:
+        return LazyJsonDecoder(orjson.loads)
+    if ujson is not None:
+        return LazyJsonDecoder(ujson.loads)
+    return LazyJsonDecoder(json.loads)
+
+
+def copy_decoded(value: Any) -> Any:
+    """deep copy of a decoded json document, keeping the dict classes"""
+    if isinstance(value, dict):
+        return type(value)({k: copy_decoded(v) for k, v in dict.items(value)})
+    if isinstance(value, list):
+        return [copy_decoded(item) for item in value]
+    return value
+
+
+# runs of json text without brackets, strings being skipped as a whole
+_SKIP = re.compile(rb'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+_SEPARATORS = re.compile(rb"[ \t\n\r,]*")
+_SCALAR = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[^" \t\n\r,\]{}\[]*')
+# key of an entry array, to be checked to be the top level one
+_ENTRY_ARRAY = re.compile(rb'[{,]\s*"entry"\s*:\s*\[')
+_QUOTE, _CLOSING = ord('"'), b"}]"
+
+
+def _depth(data: bytearray, start: int, end: int) -> int:
+    """depth of the brackets at `end` relative to `start`, counting the
+    brackets of the strings too"""
+    return (
+        data.count(b"{", start, end)
+        + data.count(b"[", start, end)
+        - data.count(b"}", start, end)
+        - data.count(b"]", start, end)
+    )
+
+
+def _exact_depth(data: bytearray, end: int) -> int | None:
+    """depth of the brackets at `end`, None if in a string"""
+    pos = depth = 0
+    while True:
+        pos = _SKIP.match(data, pos, end).end()
+        if pos == end:
+            return depth
+        if data[pos] == _QUOTE:
+            return None
+        depth += -1 if data[pos] in _CLOSING else 1
+        pos += 1
+
+
+def _exact_end(data: bytearray) -> int:
+    """end of the last complete item, `data` starting between two items
+    of an array"""
+    pos = depth = end = 0
+    while True:
+        pos = _SKIP.match(data, pos).end()
+        if pos == len(data) or data[pos] == _QUOTE:
+            return end
+        depth += -1 if data[pos] in _CLOSING else 1
+        pos += 1
+        if depth == 0:
+            end = pos
+        elif depth < 0:
+            # end of the array
+            return end
+
+
+def _estimated_end(data: bytearray) -> int:
+    """end of the last complete item according to the brackets count,
+    `data` starting between two items of an array"""
+    end = closing = len(data)
+    depth = _depth(data, 0, end)
+    while True:
+        closing = data.rfind(b"}", 0, closing)
+        if closing < 0:
+            return 0
+        depth -= _depth(data, closing + 1, end)
+        end = closing + 1
+        if depth == 0:
+            return end
+
+
+class StreamingDecoder:
+    """
+    Incremental decoding of a json document received in chunks, e.g. a
+    search Bundle. The items of the `entry` array of the top level object
+    are decoded as they are received, the rest of the document when it is
+    closed: the whole response body is never held in memory.
+
+    The complete entries of the received text are split where the brackets
+    are balanced and decoded at once by the json decoder.
+    """
+
+    def __init__(self, decoder: JsonDecoder):
+        self._decoder = decoder
+        # document without the items of the entry array
+        self._head = bytearray()
+        # text of the entry array not decoded yet
+        self._buffer = bytearray()
+        # head position and depth up to which the entry array was looked for
+        self._searched = self._counted = self._head_depth = 0
+        self._entries: List[Any] | None = None
+        self._in_entries = False
+        # do not split again an incomplete entry before the buffer doubled
+        self._needed = 0
+        self.size = 0
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """
+        Parse the next chunk of the document
+
+        Args:
+            chunk: raw bytes
+
+        Returns:
+            the entries decoded from the text received so far
+        """
+        self.size += len(chunk)
+        if self._in_entries:
+            self._buffer += chunk
+        else:
+            self._head += chunk
+            if self._entries is not None or not self._find_entries():
+                return []
+        if len(self._buffer) < self._needed:
+            return []
+        return self._split()
+
+    def close(self) -> Any:
+        """
+        Returns:
+            the decoded document, as `decode` of the json decoder would
+        """
+        if self._entries is None:
+            return self._decoder.decode(bytes(self._head))
+        if self._in_entries:
+            self._split(exact=True)
+        if self._in_entries:
+            raise json.JSONDecodeError(
+                "Unterminated entry array", self._buffer.decode(errors="replace"), 0
+            )
+        document = self._decoder.decode(bytes(self._head))
+        document["entry"] = self._entries
+        return document
+
+    def _find_entries(self) -> bool:
+        """look for the entry array of the top level object, its text being
+        moved to the buffer"""
+        head = self._head
+        while True:
+            match = _ENTRY_ARRAY.search(head, self._searched)
+            if match is None:
+                # a key may be cut at the end of the chunk
+                self._searched = max(self._searched, len(head) - 64)
+                return False
+            end = self._searched = match.end()
+            self._head_depth += _depth(head, self._counted, end)
+            self._counted = end
+            if self._head_depth == 2 and _exact_depth(head, end) == 2:
+                self._buffer = head[end:]
+                del head[end:]
+                self._entries, self._in_entries = [], True
+                return True
+
+    def _split(self, exact: bool = False) -> List[Any]:
+        """decode the complete entries of the buffer"""
+        buffer = self._buffer
+        start = _SEPARATORS.match(buffer).end()
+        end = _exact_end(buffer) if exact else _estimated_end(buffer)
+        if end <= start:
+            # no complete object nor array, maybe a scalar
+            end = _SCALAR.match(buffer, start).end()
+            if end == len(buffer) or buffer[end] not in b" \t\n\r,]":
+                end = 0
+        entries = []
+        if end > start:
+            try:
+                entries = self._decoder.decode_array(b"[" + buffer[start:end] + b"]")
+            except ValueError:
+                if exact:
+                    raise
+                # brackets in strings, or the end of the array
+                return self._split(exact=True)
+            self._entries.extend(entries)
+            del buffer[:end]
+        start = _SEPARATORS.match(buffer).end()
+        if start < len(buffer) and buffer[start] == _CLOSING[1]:
+            # end of the entry array, the rest belongs to the head
+            self._head += buffer[start:]
+            self._buffer = bytearray()
+            self._in_entries = False
+        elif entries and start < len(buffer) and buffer[start] not in b"{[":
+            # scalar entries
+            return entries + self._split()
+        self._needed = 0 if entries else 2 * len(buffer)
+        return entries
@@ -0,0 +1,265 @@
+import abc
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Mapping
+
+from loguru import logger
+from pydantic import BaseModel
+
+
+class CachedResponse(BaseModel):
+    """Body of a GET response and its validators"""
+
+    body: bytes
+    etag: str | None = None
+    last_modified: str | None = None
+    stored_at: float = 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCacheBackend(abc.ABC):
+    """Storage of the cached responses, keyed by url and scope, see
+    HttpCache.key_for"""
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> CachedResponse | None:
+        ...
+
+    @abc.abstractmethod
+    async def set(self, key: str, response: CachedResponse) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def clear(self) -> None:
+        ...
+
+
+class InMemoryHttpCacheBackend(HttpCacheBackend):
+    """
+    LRU of responses, bounded by a number of entries and a total body size
+    in bytes. Entries expire after `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        max_bytes: int | None = 64 * 2**20,
+        ttl: float | None = 3600,
+    ):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._bytes = 0
+
+    def _expired(self, response: CachedResponse) -> bool:
+        return self.ttl is not None and response.stored_at + self.ttl <= time.time()
+
+    def _pop(self, key: str):
+        response = self._entries.pop(key, None)
+        if response is not None:
+            self._bytes -= response.size
+
+    async def get(self, key: str) -> CachedResponse | None:
+        response = self._entries.get(key)
+        if response is None:
+            return None
+        if self._expired(response):
+            self._pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    async def set(self, key: str, response: CachedResponse) -> None:
+        if self.max_bytes is not None and response.size > self.max_bytes:
+            return
+        self._pop(key)
+        self._entries[key] = response
+        self._bytes += response.size
+        while len(self._entries) > self.max_size or (
+            self.max_bytes is not None and self._bytes > self.max_bytes
+        ):
+            self._pop(next(iter(self._entries)))
+
+    async def delete(self, key: str) -> None:
+        self._pop(key)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskHttpCacheBackend(HttpCacheBackend):
+    """
+    Responses stored in a directory, one file per url, allowing
+    successive jobs to share the cache. Expired files are removed when read,
+    the oldest ones when there are more than `max_size` files.
+    """
+
+    def __init__(
+        self, directory: str | Path, max_size: int = 10_000, ttl: float | None = None
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.ttl = ttl
+        self._writes = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / hashlib.sha256(key.encode()).hexdigest()
+
+    def _read(self, key: str) -> CachedResponse | None:
+        path = self._path(key)
+        try:
+            meta, body = path.read_bytes().split(b"\n", 1)
+            response = CachedResponse(body=body, **json.loads(meta))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Dropping unreadable http cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        if self.ttl is not None and response.stored_at + self.ttl <= time.time():
+            path.unlink(missing_ok=True)
+            return None
+        return response
+
+    def _write(self, key: str, response: CachedResponse):
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        meta = json.dumps(response.dict(exclude={"body"})).encode()
+        tmp.write_bytes(meta + b"\n" + response.body)
+        tmp.replace(path)
+
+    def _prune(self):
+        files = sorted(
+            (p for p in self.directory.iterdir() if not p.suffix),
+            key=lambda p: p.stat().st_mtime,
+        )
+        for path in files[: max(len(files) - self.max_size, 0)]:
+            path.unlink(missing_ok=True)
+
+    async def get(self, key: str) -> CachedResponse | None:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, response: CachedResponse) -> None:
+        await asyncio.to_thread(self._write, key, response)
+        # listing the directory is costly, prune from time to time only
+        self._writes += 1
+        if self._writes % 100 == 0:
+            await asyncio.to_thread(self._prune)
+
+    def _clear(self):
+        for path in self.directory.iterdir():
+            path.unlink(missing_ok=True)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._path(key).unlink, missing_ok=True)
+
+    async def clear(self) -> None:
+        await asyncio.to_thread(self._clear)
+
+
+class HttpCacheMetrics(BaseModel):
+    # responses served from the cache after a 304
+    hits: int = 0
+    # conditional or plain requests answered with a full body
+    misses: int = 0
+    stored: int = 0
+    bytes_saved: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class HttpCache:
+    """
+    Cache of GET responses revalidated with conditional requests: the
+    ETag / Last-Modified of a cached response are sent as If-None-Match /
+    If-Modified-Since, and a 304 Not Modified is answered with the cached body.
+    Responses are never served without revalidation.
+
+    Responses depend on the access rights of the client: entries are scoped,
+    clients giving the key of their credentials (partner, strategy and
+    organization) as scope, so that a cache shared by several tenants never
+    serves the responses of one to another.
+    """
+
+    def __init__(self, backend: HttpCacheBackend | None = None):
+        self.backend = backend or InMemoryHttpCacheBackend()
+        self.metrics = HttpCacheMetrics()
+
+    @staticmethod
+    def key_for(url: str, scope: str | None = None) -> str:
+        return url if scope is None else f"{scope} {url}"
+
+    async def lookup(self, url: str, scope: str | None = None) -> CachedResponse | None:
+        return await self.backend.get(self.key_for(url, scope))
+
+    def not_modified(self, cached: CachedResponse) -> bytes:
+        """body of a cached response confirmed by a 304"""
+        self.metrics.hits += 1
+        self.metrics.bytes_saved += cached.size
+        return cached.body
+
+    async def store(
+        self,
+        url: str,
+        headers: Mapping[str, str],
+        body: bytes,
+        scope: str | None = None,
+    ):
+        """
+        Cache a 200 response if it carries a validator
+
+        Args:
+            url: requested url
+            headers: response headers
+            body: response body
+            scope: credentials of the request
+        """
+        key = self.key_for(url, scope)
+        self.metrics.misses += 1
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        if "no-store" in headers.get("Cache-Control", ""):
+            await self.backend.delete(key)
+            return
+        await self.backend.set(
+            key,
+            CachedResponse(
+                body=body, etag=etag, last_modified=last_modified, stored_at=time.time()
+            ),
+        )
+        self.metrics.stored += 1
+
+    async def invalidate(self, url: str, scope: str | None = None):
+        await self.backend.delete(self.key_for(url, scope))
+
+    async def clear(self):
+        await self.backend.clear()
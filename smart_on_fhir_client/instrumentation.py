@@ -0,0 +1,101 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Mapping
+
+try:
+    from opentelemetry import metrics as otel_metrics, trace as otel_trace
+except ImportError:  # pragma: no cover
+    otel_metrics = otel_trace = None
+
+Attributes = Mapping[str, str | int | float | bool]
+
+# histograms
+REQUEST_DURATION = "fhir.client.request.duration"
+RESPONSE_SIZE = "fhir.client.response.size"
+DECODE_DURATION = "fhir.client.decode.duration"
+TOKEN_FETCH_DURATION = "fhir.client.token.fetch.duration"
+RATE_LIMITER_WAIT = "fhir.client.rate_limiter.wait"
+# counters
+REQUEST_RETRIES = "fhir.client.request.retries"
+
+UNITS = {
+    REQUEST_DURATION: "s",
+    RESPONSE_SIZE: "By",
+    DECODE_DURATION: "s",
+    TOKEN_FETCH_DURATION: "s",
+    RATE_LIMITER_WAIT: "s",
+    REQUEST_RETRIES: "1",
+}
+
+
+class Instrumentation:
+    """
+    Hooks called by the fhir clients to trace requests and record metrics.
+    Does nothing by default, subclass it to plug any monitoring system.
+    """
+
+    @contextmanager
+    def span(self, name: str, attributes: Attributes) -> Iterator[Any]:
+        """
+        Trace an operation
+
+        Args:
+            name: name of the operation
+            attributes: partner, client, method, resource type...
+
+        Returns:
+            a context manager of the span, whose set_attribute method is
+            called if not None
+        """
+        yield None
+
+    def record(self, name: str, value: float, attributes: Attributes) -> None:
+        """record a value of a histogram"""
+        ...
+
+    def count(self, name: str, attributes: Attributes, value: int = 1) -> None:
+        """increment a counter"""
+        ...
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """
+    Spans and metrics sent to OpenTelemetry, requires the opentelemetry-api
+    package (`otel` extra). The global tracer and meter providers are used
+    unless given.
+    """
+
+    def __init__(self, tracer_provider=None, meter_provider=None):
+        if otel_trace is None:
+            raise ImportError(
+                "opentelemetry-api is required, install smart-on-fhir-client[otel]"
+            )
+        self._tracer = otel_trace.get_tracer(__name__, tracer_provider=tracer_provider)
+        self._meter = otel_metrics.get_meter(__name__, meter_provider=meter_provider)
+        self._instruments: Dict[str, Any] = {}
+
+    def _histogram(self, name: str):
+        if name not in self._instruments:
+            self._instruments[name] = self._meter.create_histogram(
+                name, unit=UNITS.get(name, "")
+            )
+        return self._instruments[name]
+
+    def _counter(self, name: str):
+        if name not in self._instruments:
+            self._instruments[name] = self._meter.create_counter(
+                name, unit=UNITS.get(name, "")
+            )
+        return self._instruments[name]
+
+    @contextmanager
+    def span(self, name: str, attributes: Attributes) -> Iterator[Any]:
+        with self._tracer.start_as_current_span(
+            name, kind=otel_trace.SpanKind.CLIENT, attributes=attributes
+        ) as span:
+            yield span
+
+    def record(self, name: str, value: float, attributes: Attributes) -> None:
+        self._histogram(name).record(value, attributes=attributes)
+
+    def count(self, name: str, attributes: Attributes, value: int = 1) -> None:
+        self._counter(name).add(value, attributes=attributes)
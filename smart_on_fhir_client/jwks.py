@@ -0,0 +1,292 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Mapping, Tuple
+
+from aiohttp import ClientSession
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
+from jwt import DecodeError
+from jwt.algorithms import RSAAlgorithm
+from jwt.utils import base64url_decode
+from loguru import logger
+
+from smart_on_fhir_client.utils import check_id_token
+
+JwksFetch = Callable[[ClientSession], Awaitable[Mapping[str, Any] | str]]
+
+_MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)")
+
+
+def parse_max_age(headers: Mapping[str, str]) -> float | None:
+    """lifetime in seconds given by the Cache-Control header, 0 if the
+    response must not be reused"""
+    value = headers.get("Cache-Control", "")
+    if "no-store" in value or "no-cache" in value:
+        return 0.0
+    match = _MAX_AGE.search(value)
+    return float(match.group(1)) if match else None
+
+
+def parse_jwks(jwks: Mapping[str, Any] | str) -> Dict[str | None, RSAPublicKey]:
+    """RSA signing keys of a JWK set, or of a single JWK, by kid"""
+    if isinstance(jwks, str):
+        jwks = json.loads(jwks)
+    keys = {}
+    for jwk in jwks.get("keys", [jwks]):
+        if jwk.get("kty") != "RSA" or jwk.get("use", "sig") != "sig":
+            continue
+        keys[jwk.get("kid")] = RSAAlgorithm.from_jwk(jwk)
+    return keys
+
+
+class _IssuerKeys:
+    def __init__(self, keys: Dict[str | None, RSAPublicKey], max_age: float):
+        self.keys = keys
+        self.fetched_at = time.monotonic()
+        self.expires_at = self.fetched_at + max_age
+
+    def find(self, kid: str | None) -> RSAPublicKey | None:
+        key = self.keys.get(kid)
+        if key is None and kid is None and len(self.keys) == 1:
+            # tokens without kid of issuers with a single key
+            key = next(iter(self.keys.values()))
+        return key
+
+
+class JwksManager:
+    """
+    Public keys of the id token issuers, parsed once and cached by kid.
+
+    Keys are kept for the max-age of the JWK set response (`default_max_age`
+    without Cache-Control, `min_refresh_interval` at least), then refetched. A token signed with an unknown
+    kid triggers a refetch, at most every `min_refresh_interval` seconds so
+    that tokens with forged kids do not hammer the issuer. Concurrent
+    fetches of the same issuer collapse into a single request, and expired
+    keys keep being used when a refetch fails.
+    """
+
+    def __init__(
+        self,
+        session: ClientSession | None = None,
+        default_max_age: float = 3600.0,
+        min_refresh_interval: float = 30.0,
+    ):
+        """
+
+        Args:
+            session: session fetching the JWK sets, a dedicated one is
+                created (and closed by `close`) if not given
+            default_max_age: lifetime in seconds of the keys when the
+                response has no Cache-Control max-age
+            min_refresh_interval: minimum seconds between two fetches of an
+                issuer keys because of an unknown kid
+        """
+        self._session = session
+        self._own_session: ClientSession | None = None
+        self.default_max_age = default_max_age
+        self.min_refresh_interval = min_refresh_interval
+        self._sources: Dict[str, str | JwksFetch] = {}
+        self._keys: Dict[str, _IssuerKeys] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    @property
+    def session(self) -> ClientSession:
+        if self._session is not None:
+            return self._session
+        if self._own_session is None or self._own_session.closed:
+            self._own_session = ClientSession()
+        return self._own_session
+
+    def register(
+        self,
+        issuer: str,
+        jwks_uri: str | None = None,
+        fetch: JwksFetch | None = None,
+    ) -> "JwksManager":
+        """
+        Tell where the keys of an issuer are. Unregistered issuers publish
+        their `jwks_uri` in their openid configuration.
+
+        Args:
+            issuer: `iss` of the tokens
+            jwks_uri: url of the JWK set
+            fetch: coroutine function given the session and returning the
+                JWK set, e.g. `partner.get_key_as_json`
+
+        Returns:
+            the manager itself
+        """
+        self._sources[issuer] = fetch or jwks_uri
+        self._keys.pop(issuer, None)
+        return self
+
+    async def get_key(self, issuer: str, kid: str | None) -> RSAPublicKey:
+        """
+        Get the key of an issuer, fetching the keys if needed
+
+        Args:
+            issuer: `iss` of the token
+            kid: `kid` of the token header
+
+        Returns:
+            the public key
+        """
+        keys = self._keys.get(issuer)
+        now = time.monotonic()
+        if keys is not None and now < keys.expires_at:
+            key = keys.find(kid)
+            if key is not None:
+                return key
+            if now - keys.fetched_at < self.min_refresh_interval:
+                raise DecodeError(f"Unknown signing key {kid=} of {issuer=}")
+        keys = await self._refresh(issuer, keys)
+        key = keys.find(kid)
+        if key is None:
+            raise DecodeError(f"Unknown signing key {kid=} of {issuer=}")
+        return key
+
+    async def _refresh(self, issuer: str, known: _IssuerKeys | None) -> _IssuerKeys:
+        async with self._locks[issuer]:
+            current = self._keys.get(issuer)
+            if current is not None and current is not known:
+                # refreshed by another coroutine while we were waiting
+                return current
+            try:
+                keys, max_age = await self._fetch(issuer)
+            except Exception as e:
+                if current is None:
+                    raise
+                logger.warning("Unable to refresh the keys of {}: {!r}", issuer, e)
+                # retried after min_refresh_interval
+                current.fetched_at = time.monotonic()
+                return current
+            logger.debug("Fetched {} keys of {}", len(keys), issuer)
+            if max_age is None:
+                max_age = self.default_max_age
+            # no-cache or short lived responses are not refetched more often
+            # than the unknown kids
+            self._keys[issuer] = _IssuerKeys(
+                keys, max(max_age, self.min_refresh_interval)
+            )
+            return self._keys[issuer]
+
+    async def _fetch(
+        self, issuer: str
+    ) -> Tuple[Dict[str | None, RSAPublicKey], float | None]:
+        source = self._sources.get(issuer)
+        if callable(source):
+            return parse_jwks(await source(self.session)), None
+        if source is None:
+            source = self._sources[issuer] = await self._discover(issuer)
+        async with self.session.get(source) as r:
+            r.raise_for_status()
+            return parse_jwks(await r.json(content_type=None)), parse_max_age(r.headers)
+
+    async def _discover(self, issuer: str) -> str:
+        url = f"{issuer.rstrip('/')}/.well-known/openid-configuration"
+        async with self.session.get(url) as r:
+            r.raise_for_status()
+            return (await r.json(content_type=None))["jwks_uri"]
+
+    def invalidate(self, issuer: str | None = None):
+        """forget the keys of an issuer, or of all issuers"""
+        if issuer is None:
+            self._keys.clear()
+        else:
+            self._keys.pop(issuer, None)
+
+    async def close(self):
+        if self._own_session is not None:
+            await self._own_session.close()
+            self._own_session = None
+
+
+class VerifiedTokenCache:
+    """
+    Payloads of the verified tokens, keyed by a hash of the token, the
+    issuer and the audience. A payload is kept `ttl` seconds at most, and
+    never after the expiry of its token.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_size: int = 10_000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._payloads: OrderedDict[bytes, Tuple[Dict[str, Any], float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(token: str, issuer: str, audience: str) -> bytes:
+        return hashlib.sha256(f"{issuer}\n{audience}\n{token}".encode()).digest()
+
+    def get(self, key: bytes) -> Dict[str, Any] | None:
+        entry = self._payloads.get(key)
+        if entry is not None and time.time() < entry[1]:
+            self._payloads.move_to_end(key)
+            self.hits += 1
+            return dict(entry[0])
+        if entry is not None:
+            del self._payloads[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: bytes, payload: Dict[str, Any]):
+        expires_at = time.time() + self.ttl
+        if payload.get("exp") is not None:
+            expires_at = min(expires_at, float(payload["exp"]))
+        self._payloads[key] = (dict(payload), expires_at)
+        self._payloads.move_to_end(key)
+        while len(self._payloads) > self.max_size:
+            self._payloads.popitem(last=False)
+
+    def clear(self):
+        self._payloads.clear()
+
+    def __len__(self):
+        return len(self._payloads)
+
+
+def _unverified_kid(id_token: str) -> str | None:
+    # only the header segment, jwt.get_unverified_header loads the whole token
+    try:
+        header = json.loads(base64url_decode(id_token.split(".", 1)[0]))
+        return header.get("kid")
+    except (ValueError, TypeError, AttributeError):
+        raise DecodeError("Error decoding jwt token")
+
+
+async def verify_id_token(
+    id_token: str,
+    *,
+    jwks: JwksManager,
+    issuer: str,
+    audience: str,
+    cache: VerifiedTokenCache | None = None,
+) -> Dict[str, Any]:
+    """
+    check_id_token with the key of the issuer given by the JWKS manager
+
+    Args:
+        id_token: the jwt
+        jwks: keys of the issuers
+        issuer: expected issuer, whose keys verify the token
+        audience: expected audience
+        cache: payloads of the tokens already verified
+
+    Returns:
+        the token payload
+    """
+    if cache is not None:
+        cache_key = cache.key_for(id_token, issuer, audience)
+        payload = cache.get(cache_key)
+        if payload is not None:
+            return payload
+    kid = _unverified_kid(id_token)
+    key = await jwks.get_key(issuer, kid)
+    payload = check_id_token(id_token, key=key, issuer=issuer, audience=audience)
+    if cache is not None:
+        cache.set(cache_key, payload)
+    return payload
@@ -0,0 +1,95 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Type, TypeVar
+
+from pydantic import BaseModel
+
+from smart_on_fhir_client.requester.conversion import to_models, validate_to_data
+
+M = TypeVar("M")
+
+
+class Offload:
+    """
+    Run the cpu bound work of large responses, json decoding and model
+    conversion, in an executor instead of the event loop thread.
+
+    A process pool uses all the cores, the data being pickled back and forth:
+    decoders and `return_as` classes must be picklable (default decoders and
+    fhir.resources models are). Pydantic models are validated in the worker
+    processes and rebuilt without validation in a thread of the default
+    executor of the loop, pickling models being as costly as validating
+    them; models converted without validation are only built in that
+    thread. A thread pool only keeps the loop responsive, the conversion
+    holding the GIL.
+
+    The executor is not shut down by the clients.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        decode_threshold: int = 4 * 2**20,
+        convert_threshold: int = 500,
+    ):
+        """
+
+        Args:
+            executor: thread or process pool executor
+            decode_threshold: responses of at least this size in bytes are
+                decoded in the executor
+            convert_threshold: pages of at least this number of resources are
+                converted to `return_as` in the executor
+        """
+        self.executor = executor
+        self.decode_threshold = decode_threshold
+        self.convert_threshold = convert_threshold
+
+    @classmethod
+    def process_pool(cls, max_workers: int | None = None, **options) -> "Offload":
+        return cls(ProcessPoolExecutor(max_workers=max_workers), **options)
+
+    @classmethod
+    def thread_pool(cls, max_workers: int | None = None, **options) -> "Offload":
+        return cls(ThreadPoolExecutor(max_workers=max_workers), **options)
+
+    def decodes(self, size: int) -> bool:
+        return size >= self.decode_threshold
+
+    def converts(self, count: int) -> bool:
+        return count >= self.convert_threshold
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, partial(func, *args, **kwargs)
+        )
+
+    @property
+    def in_process(self) -> bool:
+        return isinstance(self.executor, ProcessPoolExecutor)
+
+    async def to_models(
+        self, return_as: Type[M], resources: List[Dict[str, Any]], validate: bool = True
+    ) -> List[M]:
+        """
+        Convert raw resources to `return_as` in the executor
+
+        Args:
+            return_as: class to convert to
+            resources: raw resources, without fhirpy resources nor references
+            validate: validate the data
+
+        Returns:
+            the converted resources
+        """
+        if self.in_process and issubclass(return_as, BaseModel):
+            if validate:
+                resources = await self.run(validate_to_data, return_as, resources)
+            return await asyncio.get_running_loop().run_in_executor(
+                None, partial(to_models, return_as, resources, validate=False)
+            )
+        return await self.run(to_models, return_as, resources, validate=validate)
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
@@ -1,11 +1,12 @@
 import abc
 import enum
-from typing import Set
+from typing import Set, Mapping, Any
 
 from aiohttp import ClientSession
 from loguru import logger
 from pydantic import BaseModel
 
+from smart_on_fhir_client.rate_limit import RateLimit
 from smart_on_fhir_client.strategy import Strategy, StrategyNotFound
 
 
@@ -19,10 +20,20 @@ class Partner(BaseModel, abc.ABC):
     token_url: str | None
     authorize_url: str | None
     fhir_url: str | None
+    # lifetime (seconds) of the tokens when the token endpoint does not
+    # return any expires_in and the token is not a jwt
+    default_token_lifetime: int | None = None
+    # request quota shared by all the organizations of the partner
+    rate_limit: RateLimit | None = None
 
     async def get_access_token_for_strategy(
         self, strategy: Strategy, session: ClientSession, **kwargs
-    ):
+    ) -> str | Mapping[str, Any] | None:
+        """
+        Fetch an access token. Partners may return the raw token or the json
+        response of the token endpoint, including `expires_in`, allowing the
+        token store to refresh it before its expiry
+        """
         if not strategy in self.supported_strategies:
             logger.info(f"{strategy=} is not supported for partner {self.name=}")
             return
@@ -36,7 +47,9 @@ class Partner(BaseModel, abc.ABC):
         return dict([(name, getattr(self, name)) for name in attr_name])
 
     @abc.abstractmethod
-    async def get_access_token_for_m2m(self, session: ClientSession) -> str:
+    async def get_access_token_for_m2m(
+        self, session: ClientSession
+    ) -> str | Mapping[str, Any]:
         ...
 
     async def trade_refresh_for_access_token(self, refresh_token: str):
@@ -59,10 +72,13 @@ class Organization:
         self,
         name: str,
         target_url_strategy: TargetUrlStrategy = TargetUrlStrategy.PARTNER,
+        rate_limit: RateLimit | None = None,
         **kwargs,
     ):
         self.name = name
         self.target_url_strategy = target_url_strategy
+        # overrides the partner rate limit
+        self.rate_limit = rate_limit
         self.parameters = kwargs
 
     @property
@@ -0,0 +1,162 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from loguru import logger
+from pydantic import BaseModel
+
+
+class RateLimit(BaseModel):
+    """Quota of a partner (or of an organization of a partner)"""
+
+    # sustained rate, None for no rate limit
+    requests_per_second: float | None = None
+    # requests allowed in a burst, defaults to one second of requests
+    burst: int | None = None
+    # simultaneous requests, None for no limit
+    max_in_flight: int | None = None
+
+
+class RateLimiterMetrics(BaseModel):
+    # requests waiting for a slot or a token
+    queue_depth: int
+    in_flight: int
+    tokens_available: float | None
+    requests: int
+    # cumulated and max time spent waiting, in seconds
+    total_wait: float
+    max_wait: float
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.requests if self.requests else 0.0
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter combined with a max in flight semaphore.
+
+    Usage:
+        async with limiter.acquire():
+            ... perform the request
+    """
+
+    def __init__(self, rate_limit: RateLimit):
+        self.rate_limit = rate_limit
+        self._rate = rate_limit.requests_per_second
+        self._capacity = (
+            float(rate_limit.burst or max(self._rate, 1.0))
+            if self._rate is not None
+            else None
+        )
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._bucket_lock = asyncio.Lock()
+        self._semaphore = (
+            asyncio.Semaphore(rate_limit.max_in_flight)
+            if rate_limit.max_in_flight is not None
+            else None
+        )
+        self._waiting = 0
+        self._in_flight = 0
+        self._requests = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self._capacity, self._tokens + (now - self._updated_at) * self._rate
+        )
+        self._updated_at = now
+
+    async def _take_token(self):
+        # the lock makes waiters take tokens in arrival order
+        async with self._bucket_lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+                self._refill()
+            self._tokens -= 1
+
+    @asynccontextmanager
+    async def acquire(self):
+        start = time.monotonic()
+        self._waiting += 1
+        acquired_slot = False
+        try:
+            if self._semaphore is not None:
+                await self._semaphore.acquire()
+                acquired_slot = True
+            if self._rate is not None:
+                await self._take_token()
+        except BaseException:
+            if acquired_slot:
+                self._semaphore.release()
+            raise
+        finally:
+            self._waiting -= 1
+
+        wait = time.monotonic() - start
+        self._requests += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+        if wait > 1:
+            logger.debug(f"Waited {wait:.2f}s for rate limiter {self.rate_limit}")
+
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    @property
+    def tokens_available(self) -> float | None:
+        if self._rate is None:
+            return None
+        self._refill()
+        return self._tokens
+
+    @property
+    def metrics(self) -> RateLimiterMetrics:
+        return RateLimiterMetrics(
+            queue_depth=self._waiting,
+            in_flight=self._in_flight,
+            tokens_available=self.tokens_available,
+            requests=self._requests,
+            total_wait=self._total_wait,
+            max_wait=self._max_wait,
+        )
+
+
+class RateLimiterRegistry:
+    """
+    Rate limiters shared by the clients: one per partner, all the
+    organizations of the partner sharing its quota, unless the organization
+    defines its own rate limit.
+    """
+
+    def __init__(self):
+        self._limiters: Dict[str, RateLimiter] = {}
+
+    def for_client(self, partner, organization=None) -> RateLimiter | None:
+        if organization is not None and organization.rate_limit is not None:
+            key, rate_limit = (
+                f"{partner.name}/{organization.slug}",
+                organization.rate_limit,
+            )
+        elif partner.rate_limit is not None:
+            key, rate_limit = partner.name, partner.rate_limit
+        else:
+            return None
+        limiter = self._limiters.get(key)
+        if limiter is None or limiter.rate_limit != rate_limit:
+            limiter = self._limiters[key] = RateLimiter(rate_limit)
+        return limiter
+
+    @property
+    def metrics(self) -> Dict[str, RateLimiterMetrics]:
+        return {key: limiter.metrics for key, limiter in self._limiters.items()}
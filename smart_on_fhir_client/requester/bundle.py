@@ -0,0 +1,155 @@
+import enum
+from typing import Any, Dict, Iterable, Iterator, List
+from urllib.parse import urlencode
+
+from fhirpy.base.exceptions import OperationOutcome
+from loguru import logger
+from pydantic import BaseModel
+
+
+class BundleType(str, enum.Enum):
+    # entries are processed independently
+    BATCH = "batch"
+    # all or nothing
+    TRANSACTION = "transaction"
+
+
+class ConditionalMode(enum.Enum):
+    # PUT Resource?identifier=system|value: create or update the resource
+    UPDATE = enum.auto()
+    # POST with ifNoneExist: create the resource only if it does not exist
+    CREATE = enum.auto()
+
+
+class BundleEntryOutcome(BaseModel):
+    """Result of one entry of a batch / transaction bundle"""
+
+    resource_type: str
+    source_id: str | None
+    status: str
+    location: str | None = None
+    resource: Dict[str, Any] | None = None
+    outcome: Dict[str, Any] | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status[:1] == "2"
+
+
+def chunked(items: List, size: int) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def identifier_search(resource, target_identifier_url: str | None) -> str | None:
+    """conditional search matching the resource on the target server"""
+    if target_identifier_url is None:
+        return None
+    value = resource.get_by_path(
+        ["identifier", {"system": target_identifier_url}, "value"]
+    )
+    if value is None:
+        return None
+    return urlencode({"identifier": f"{target_identifier_url}|{value}"})
+
+
+def build_entry(
+    resource,
+    target_identifier_url: str | None = None,
+    mode: ConditionalMode = ConditionalMode.UPDATE,
+) -> Dict[str, Any]:
+    """
+    Build a bundle entry writing the resource to the target server. Resources
+    are matched on their target identifier through a conditional operation,
+    replacing the search performed by pipe_to_target_fhir_server.
+
+    Args:
+        resource: fhir resource to write
+        target_identifier_url: system of the identifier used for matching
+        mode: conditional update or conditional create
+
+    Returns:
+        the bundle entry
+    """
+    data = resource.serialize()
+    # ids are the source server ones, the target server allocates its own
+    data.pop("id", None)
+    resource_type = resource.resource_type
+    search = identifier_search(resource, target_identifier_url)
+
+    if search is None:
+        request = {"method": "POST", "url": resource_type}
+    elif mode is ConditionalMode.UPDATE:
+        request = {"method": "PUT", "url": f"{resource_type}?{search}"}
+    else:
+        request = {"method": "POST", "url": resource_type, "ifNoneExist": search}
+    return {"resource": data, "request": request}
+
+
+def build_bundle(entries: Iterable[Dict[str, Any]], bundle_type: BundleType):
+    return {
+        "resourceType": "Bundle",
+        "type": bundle_type.value,
+        "entry": list(entries),
+    }
+
+
+def _error_outcome(diagnostics: str) -> Dict[str, Any]:
+    return {
+        "resourceType": "OperationOutcome",
+        "issue": [
+            {"severity": "error", "code": "exception", "diagnostics": diagnostics}
+        ],
+    }
+
+
+def parse_response(resources: List, response) -> List[BundleEntryOutcome]:
+    """match the entries of a batch-response / transaction-response with the
+    sent resources (entries are returned in the same order). Resources without
+    a response entry get a failed outcome"""
+    entries = response.get("entry") or []
+    if len(entries) != len(resources):
+        logger.warning(
+            "{} response entries for {} sent resources", len(entries), len(resources)
+        )
+    outcomes = []
+    for resource, entry in zip(resources, entries):
+        entry_response = entry.get("response", {})
+        outcomes.append(
+            BundleEntryOutcome(
+                resource_type=resource.resource_type,
+                source_id=resource.id,
+                status=str(entry_response.get("status", "")),
+                location=entry_response.get("location"),
+                resource=entry.get("resource"),
+                outcome=entry_response.get("outcome"),
+            )
+        )
+    for resource in resources[len(entries) :]:
+        outcomes.append(
+            BundleEntryOutcome(
+                resource_type=resource.resource_type,
+                source_id=resource.id,
+                status="500",
+                outcome=_error_outcome("No entry in the bundle response"),
+            )
+        )
+    return outcomes
+
+
+def failed_outcomes(resources: List, error: Exception) -> List[BundleEntryOutcome]:
+    """outcomes of a bundle rejected as a whole, or not sent because of a
+    network error"""
+    if isinstance(error, OperationOutcome):
+        status, outcome = getattr(error, "status", 400), error.resource
+    else:
+        status, outcome = 500, _error_outcome(repr(error))
+    return [
+        BundleEntryOutcome(
+            resource_type=resource.resource_type,
+            source_id=resource.id,
+            status=str(status),
+            outcome=outcome,
+        )
+        for resource in resources
+    ]
@@ -0,0 +1,218 @@
+import copy
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Tuple, Type, TypeVar
+
+from fhir.resources import get_fhir_model_class
+from fhir.resources.fhirtypes import AbstractBaseType, AbstractType
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_SINGLETON
+
+M = TypeVar("M")
+
+# abstract fhir types whose concrete class is given by the resourceType
+_POLYMORPHIC_TYPES = frozenset({"Resource", "DomainResource"})
+
+# alias -> (field name, model of the field if any, is a list)
+FieldSpecs = Dict[str, Tuple[str, Type[BaseModel] | str | None, bool]]
+
+
+@lru_cache(maxsize=None)
+def _fhir_model_class(type_name: str) -> Type[BaseModel]:
+    return get_fhir_model_class(type_name)
+
+
+@lru_cache(maxsize=None)
+def _field_specs(cls: Type[BaseModel]) -> FieldSpecs:
+    specs = {}
+    for name, field in cls.__fields__.items():
+        type_ = field.type_
+        model = None
+        if isinstance(type_, type):
+            if issubclass(type_, (AbstractType, AbstractBaseType)):
+                # fhir.resources types are resolved by name, lazily
+                model = type_.__resource_type__
+            elif issubclass(type_, BaseModel):
+                model = type_
+        specs[field.alias] = (name, model, field.shape != SHAPE_SINGLETON)
+    return specs
+
+
+@lru_cache(maxsize=None)
+def _defaults(cls: Type[BaseModel]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """immutable and mutable defaults of the fields"""
+    defaults = {
+        name: field.default
+        for name, field in cls.__fields__.items()
+        if not field.required
+    }
+    mutable = {k: v for k, v in defaults.items() if isinstance(v, (list, dict))}
+    immutable = {k: v for k, v in defaults.items() if k not in mutable}
+    return immutable, mutable
+
+
+def _new(cls: Type[M], values: Dict[str, Any]) -> M:
+    # what BaseModel.construct does, without copying the default of each
+    # of the many unset fields of fhir models
+    model = cls.__new__(cls)
+    immutable, mutable = _defaults(cls)
+    fields_values = immutable.copy()
+    for name, default in mutable.items():
+        fields_values[name] = copy.copy(default)
+    fields_values.update(values)
+    object.__setattr__(model, "__dict__", fields_values)
+    object.__setattr__(model, "__fields_set__", set(values))
+    model._init_private_attributes()
+    return model
+
+
+def _construct_value(model: Type[BaseModel] | str, value: Any) -> Any:
+    if not isinstance(value, dict):
+        return value
+    if isinstance(model, str):
+        if model in _POLYMORPHIC_TYPES:
+            model = value.get("resourceType", model)
+        model = _fhir_model_class(model)
+    return construct(model, value)
+
+
+def construct(cls: Type[M], data: Mapping[str, Any]) -> M:
+    """
+    Build a pydantic model and its nested models from trusted data, without
+    validation. Values are kept as sent: dates and instants stay strings.
+
+    Args:
+        cls: pydantic model class, e.g. a fhir.resources class
+        data: decoded json
+
+    Returns:
+        the model instance
+    """
+    specs = _field_specs(cls)
+    values = {}
+    for key, value in data.items():
+        spec = specs.get(key)
+        if spec is None:
+            # resourceType, or unknown elements
+            continue
+        name, model, many = spec
+        if model is not None and value is not None:
+            if many and isinstance(value, list):
+                value = [_construct_value(model, item) for item in value]
+            else:
+                value = _construct_value(model, value)
+        values[name] = value
+    return _new(cls, values)
+
+
+def to_model(return_as: Type[M], data: Mapping[str, Any], validate: bool = True) -> M:
+    """
+    Convert a decoded resource to `return_as`
+
+    Args:
+        return_as: class to convert to
+        data: decoded resource
+        validate: validate the data, if False pydantic models are built with
+            `construct`
+
+    Returns:
+        the converted resource
+    """
+    if not validate and issubclass(return_as, BaseModel):
+        return construct(return_as, data)
+    return return_as(**data)
+
+
+def to_models(
+    return_as: Type[M], resources: Iterable[Mapping[str, Any]], validate: bool = True
+) -> List[M]:
+    """convert a whole page of decoded resources, see to_model"""
+    if not validate and issubclass(return_as, BaseModel):
+        return [construct(return_as, data) for data in resources]
+    return [return_as(**data) for data in resources]
+
+
+@lru_cache(maxsize=None)
+def _dump_specs(cls: Type[BaseModel]) -> Tuple[bool, List[Tuple[str, str]]]:
+    """whether the model is a resource, and (field name, alias) of its
+    elements in the fhir order"""
+    if hasattr(cls, "elements_sequence"):
+        alias_mapping = cls.get_alias_mapping()
+        names = []
+        for alias in cls.elements_sequence():
+            name = alias_mapping[alias]
+            # extensions of primitive values follow the value
+            names += [name, f"{name}__ext"]
+        names.append("fhir_comments")
+        return cls.has_resource_base(), [
+            (name, cls.__fields__[name].alias)
+            for name in names
+            if name in cls.__fields__
+        ]
+    return False, [(name, field.alias) for name, field in cls.__fields__.items()]
+
+
+def _dump_value(value: Any, by_alias: bool) -> Any:
+    if isinstance(value, BaseModel):
+        value = dump(value, by_alias=by_alias)
+        if "__root__" in value:
+            return value["__root__"]
+    elif isinstance(value, list):
+        value = [_dump_value(item, by_alias) for item in value]
+    elif isinstance(value, dict):
+        value = {k: _dump_value(v, by_alias) for k, v in value.items()}
+    elif isinstance(value, tuple):
+        value = tuple(_dump_value(item, by_alias) for item in value)
+    return value
+
+
+def dump(model: BaseModel, by_alias: bool = True) -> Dict[str, Any]:
+    """
+    Same output as the `dict()` of fhir.resources models (None and empty
+    values excluded), walking the models without pydantic machinery
+
+    Args:
+        model: pydantic model, e.g. a fhir.resources instance
+        by_alias: use the fhir names (`class`, `_birthDate`) as keys
+
+    Returns:
+        the model as a dict
+    """
+    is_resource, specs = _dump_specs(type(model))
+    data = {"resourceType": model.resource_type} if is_resource else {}
+    values = model.__dict__
+    for name, alias in specs:
+        value = values.get(name)
+        if value is None:
+            continue
+        value = _dump_value(value, by_alias)
+        if value is None or (isinstance(value, (list, dict, tuple)) and not value):
+            continue
+        data[alias if by_alias else name] = value
+    return data
+
+
+def bundle_resources(bundle: Mapping[str, Any], resource_type: str) -> List[Dict]:
+    """raw resources of the given type of a search bundle"""
+    return [
+        entry["resource"]
+        for entry in bundle.get("entry") or []
+        if (entry.get("resource") or {}).get("resourceType") == resource_type
+    ]
+
+
+def validate_to_data(
+    return_as: Type[BaseModel], resources: Iterable[Mapping[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Validate resources, returning the validated models as plain data. Used in
+    worker processes: models are costly to pickle, the caller rebuilds them
+    from the data with construct.
+    """
+    return [dump(return_as(**data)) for data in resources]
+
+
+def validated(model: M) -> M:
+    """validate a model built without validation, raising a ValidationError
+    if its data is invalid"""
+    cls = type(model)
+    return cls.parse_obj(model.dict(by_alias=True))
@@ -17,9 +17,16 @@ class CustomFHIRReference(SerializeMixin, AsyncFHIRReference):
         """
         if not self.is_local:
             raise ResourceNotFound("Can not resolve not local resource")
-        resource = (
-            await self.client.resources(self.resource_type).search(_id=self.id).get()
-        )
+        cached = self.client.resource_cache.get(self.resource_type, self.id)
+        if cached is not None:
+            resource = self.client.resource(self.resource_type, **cached)
+        else:
+            resource = (
+                await self.client.resources(self.resource_type)
+                .search(_id=self.id)
+                .get()
+            )
+            self.client.resource_cache.put(resource.serialize())
         return self.fhir_client_manager.create_async_fhir_resource(
             self.client, resource
         )
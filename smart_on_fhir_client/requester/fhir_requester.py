@@ -1,15 +1,37 @@
+import asyncio
 import os
+import time
 import warnings
-from collections import defaultdict
-from typing import Type, Union, NoReturn, Any, TypeVar
+from collections import defaultdict, deque
+from contextlib import aclosing
+from functools import lru_cache
+from itertools import islice
+from typing import (
+    Type,
+    Union,
+    NoReturn,
+    Any,
+    TypeVar,
+    AsyncIterator,
+    List,
+    Iterable,
+    Dict,
+    Tuple,
+    AsyncIterable,
+    Set,
+)
 
 # noinspection PyProtectedMember
 from aflowey.single_executor import _exec
+from fhir.resources import get_fhir_model_class
 from fhir.resources.identifier import Identifier
 from fhir.resources.reference import Reference
 from fhir.resources.resource import Resource
 from fhirpy.base import AsyncResource
+from fhirpy.base.exceptions import OperationOutcome, ResourceNotFound
+from fhirpy.base.utils import get_by_path, parse_pagination_url
 from fhirpy.lib import AsyncFHIRResource
+from loguru import logger
 from seito.monad.try_ import try_
 
 from smart_on_fhir_client.client import (
@@ -18,7 +40,59 @@ from smart_on_fhir_client.client import (
     CustomFHIRSearchSet,
 )
 from smart_on_fhir_client.partner import Partner, TargetUrlStrategy, Organization
+from smart_on_fhir_client.requester.bundle import (
+    BundleEntryOutcome,
+    BundleType,
+    ConditionalMode,
+    build_bundle,
+    build_entry,
+    chunked,
+    failed_outcomes,
+    parse_response,
+)
+from smart_on_fhir_client.requester.conversion import (
+    bundle_resources,
+    dump,
+    to_model,
+    to_models,
+)
 from smart_on_fhir_client.requester.fhir_resource import CustomFHIRResource
+from smart_on_fhir_client.requester.paging import offset_links, offset_paging
+from smart_on_fhir_client.requester.graph import (
+    ResourceGraph,
+    skipped_outcomes,
+    target_reference,
+)
+from smart_on_fhir_client.requester.pipeline import (
+    Checkpoint,
+    PipelineStats,
+    run_pipeline,
+)
+from smart_on_fhir_client.requester.registration import (
+    RegistrationStatus,
+    TenantRegistration,
+)
+from smart_on_fhir_client.requester.sync import WatermarkStore, latest_update
+from smart_on_fhir_client.resource_cache import split_reference
+
+
+def _data(resource: AsyncResource | Dict[str, Any]) -> Dict[str, Any]:
+    """data of a fhirpy resource, without its client nor the ones of its
+    references"""
+    return resource.serialize() if isinstance(resource, AsyncResource) else resource
+
+
+_SUMMARY_VALUES = frozenset({"true", "text", "data", "false"})
+
+
+def _in_graph(entry: Dict[str, Any]) -> bool:
+    """whether a searchset entry is a matched or included resource, and not
+    an OperationOutcome about the search (mode `outcome`)"""
+    mode = (entry.get("search") or {}).get("mode")
+    if mode is None:
+        # servers not giving the search mode
+        return entry["resource"].get("resourceType") != "OperationOutcome"
+    return mode in ("match", "include")
 
 
 class SearchSet:
@@ -37,36 +111,119 @@ class SearchSet:
         self._fhir_manager = fhir_manager
         self._client = client
 
+    def _clone(self, search: CustomFHIRSearchSet):
+        return SearchSet(search, self._fhir_manager, self._client)
+
+    @property
+    def _partial(self) -> bool:
+        # projected searches (_elements, _summary) return incomplete resources
+        params = self._search.params
+        summaries = params.get("_summary") or ["false"]
+        return bool(params.get("_elements")) or summaries[-1] != "false"
+
+    @property
+    def _validate(self) -> bool:
+        # required elements may be missing from partial resources
+        return self._client.validate_models and not self._partial
+
     def _process_result(self, result, return_as: Type):
         if result is None or not result:
             return result
         result_is_list = isinstance(result, list)
+        validate = self._validate
         if return_as is not None:
             if result_is_list:
-                return [return_as(**res) for res in result]
-            return return_as(**result)
+                return to_models(return_as, map(_data, result), validate=validate)
+            return to_model(return_as, _data(result), validate=validate)
         if result_is_list:
-            return [
-                self._fhir_manager.create_async_fhir_resource(self._client, res)
-                for res in result
-            ]
+            return self._fhir_manager.create_async_fhir_resources(self._client, result)
         return self._fhir_manager.create_async_fhir_resource(self._client, result)
 
+    def _offloads(self, return_as: Type) -> bool:
+        return return_as is not None and self._client.offload is not None
+
+    async def _process_bundle(self, bundle, return_as: Type) -> List:
+        """resources of a search bundle, converted in the client executor if
+        the page is large enough"""
+        offload = self._client.offload
+        if self._offloads(return_as) and offload.converts(
+            len(bundle.get("entry") or [])
+        ):
+            # raw data of the bundle, fhirpy resources hold their client
+            return await offload.to_models(
+                return_as,
+                bundle_resources(bundle, self._search.resource_type),
+                validate=self._validate,
+            )
+        resources = self._search._get_bundle_resources(bundle)
+        return self._process_result(resources, return_as=return_as) or []
+
     def limit(self, value):
-        return SearchSet(self._search.limit(value), self._fhir_manager, self._client)
+        return self._clone(self._search.limit(value))
 
     def sort(self, value):
-        return SearchSet(self._search.sort(value), self._fhir_manager, self._client)
+        return self._clone(self._search.sort(value))
 
-    def revinclude(self, value):
-        return SearchSet(
-            self._search.revinclude(value), self._fhir_manager, self._client
-        )
+    def revinclude(self, *args, **kwargs):
+        return self._clone(self._search.revinclude(*args, **kwargs))
 
     def include(self, *args, **kwargs):
-        return SearchSet(
-            self._search.include(*args, **kwargs), self._fhir_manager, self._client
-        )
+        return self._clone(self._search.include(*args, **kwargs))
+
+    def elements(self, *names: str, exclude: bool = False):
+        """
+        Ask the server for some elements of the resources only (`_elements`),
+        `id` and `resourceType` being always returned. Resources converted to
+        pydantic models (`return_as`) are built without validation, their
+        required elements may be missing.
+
+        Usage:
+            await proxy.search().elements("identifier", "birthDate").fetch(
+                return_as=Patient
+            )
+
+        Args:
+            names: elements to return
+            exclude: return all the elements but these ones
+
+        Returns:
+            the projected search
+        """
+        return self._clone(self._search.elements(*names, exclude=exclude))
+
+    def summary(self, value: str = "true"):
+        """
+        Ask the server for a summary of the resources (`_summary`), see
+        `elements`. Use `count` to only count the resources.
+
+        Args:
+            value: true, text, data or false
+
+        Returns:
+            the projected search
+        """
+        if value not in _SUMMARY_VALUES:
+            raise ValueError(f"Invalid _summary {value=}")
+        return self._clone(self._search.clone(_summary=value, override=True))
+
+    async def count(self) -> int | None:
+        """
+        Number of resources matching the search, fetched with
+        `_summary=count`: the server returns the total without any entry
+
+        Returns:
+            the total, None if the server does not tell it
+        """
+        params = {
+            key: value
+            for key, value in self._search.params.items()
+            if key not in ("_elements", "_count", "_sort")
+            and not key.startswith(("_include", "_revinclude"))
+        }
+        params["_summary"] = ["count"]
+        bundle = await self._client._fetch_resource(self._search.resource_type, params)
+        total = bundle.get("total")
+        return int(total) if total is not None else None
 
     async def fetch_raw(self, return_as=None):
         result = await self._search.fetch_raw()
@@ -74,6 +231,11 @@ class SearchSet:
 
     async def fetch(self, return_as=None):
         # maybe wrap in attempt
+        if self._offloads(return_as):
+            bundle = await self._client._fetch_resource(
+                self._search.resource_type, self._search.params
+            )
+            return await self._process_bundle(bundle, return_as=return_as)
         result = await self._search.fetch()
         return self._process_result(result, return_as=return_as)
 
@@ -90,8 +252,209 @@ class SearchSet:
         result = await self._search.post_first(enable_modifier=enable_modifier)
         return self._process_result(result, return_as=return_as)
 
+    async def fetch_graph(self, prefetch: int = 1) -> ResourceGraph:
+        """
+        Fetch all the resources of the search with their `_include` /
+        `_revinclude` resources, following the next links
+
+        Usage:
+            graph = await proxy.search(_id="123").revinclude(
+                "Encounter", "patient"
+            ).revinclude("Condition", "patient").fetch_graph()
+
+        Args:
+            prefetch: number of pages fetched in advance
+
+        Returns:
+            the graph of the matched and included resources
+        """
+        graph = ResourceGraph()
+        async for bundle in self._stream_bundles(prefetch=prefetch):
+            entries = [
+                entry
+                for entry in bundle.get("entry") or []
+                if entry.get("resource") and _in_graph(entry)
+            ]
+            resources = self._fhir_manager.create_async_fhir_resources(
+                self._client,
+                (
+                    self._client.resource(
+                        entry["resource"]["resourceType"], **entry["resource"]
+                    )
+                    for entry in entries
+                ),
+            )
+            for entry, resource in zip(entries, resources):
+                graph.add(resource, entry.get("fullUrl"))
+        return graph
+
+    async def _fetch_bundles(
+        self,
+        queue: asyncio.Queue,
+        slots: asyncio.Semaphore,
+        first: Dict | None = None,
+    ):
+        """put each page of the search in the queue, then None. A page is
+        fetched only once a slot is released by the consumer"""
+        next_link = None
+        try:
+            while True:
+                await slots.acquire()
+                if first is not None:
+                    bundle, first = first, None
+                elif next_link:
+                    bundle = await self._client._fetch_resource(
+                        *parse_pagination_url(next_link)
+                    )
+                else:
+                    bundle = await self._client._fetch_resource(
+                        self._search.resource_type, self._search.params
+                    )
+                next_link = get_by_path(bundle, ["link", {"relation": "next"}, "url"])
+                await queue.put(bundle)
+                if not next_link:
+                    break
+        except Exception as e:
+            await queue.put(e)
+        else:
+            await queue.put(None)
+
+    async def _stream_bundles(
+        self, prefetch: int = 1, first: Dict | None = None
+    ) -> AsyncIterator[Dict]:
+        queue = asyncio.Queue()
+        # pages fetched but not consumed yet
+        slots = asyncio.Semaphore(max(prefetch, 1))
+        producer = asyncio.create_task(self._fetch_bundles(queue, slots, first))
+        try:
+            while (bundle := await queue.get()) is not None:
+                if isinstance(bundle, Exception):
+                    raise bundle
+                slots.release()
+                yield bundle
+        finally:
+            producer.cancel()
+
+    async def _stream_bundles_by_offset(
+        self, concurrency: int, ordered: bool
+    ) -> AsyncIterator[Dict]:
+        """pages fetched concurrently by offset, or following the next links
+        if the server does not page by offset"""
+        first = await self._client._fetch_resource(
+            self._search.resource_type, self._search.params
+        )
+        paging = offset_paging(
+            get_by_path(first, ["link", {"relation": "next"}, "url"])
+        )
+        total = first.get("total")
+        if paging is not None and total is None:
+            total = await self.count()
+        if paging is None or total is None:
+            logger.debug("No offset paging, following the next links")
+            async for bundle in self._stream_bundles(prefetch=concurrency, first=first):
+                yield bundle
+            return
+
+        yield first
+        links = offset_links(paging, total)
+
+        def fetch(link: str) -> asyncio.Task:
+            return asyncio.create_task(
+                self._client._fetch_resource(*parse_pagination_url(link))
+            )
+
+        pending = deque(fetch(link) for link in islice(links, concurrency))
+        try:
+            while pending:
+                if ordered:
+                    done = [await pending.popleft()]
+                else:
+                    completed, _ = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    pending = deque(task for task in pending if task not in completed)
+                    done = [task.result() for task in completed]
+                # keep fetching while the pages are consumed
+                pending.extend(fetch(link) for link in islice(links, len(done)))
+                for bundle in done:
+                    if bundle.get("entry"):
+                        yield bundle
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream_pages(
+        self,
+        return_as=None,
+        prefetch: int = 1,
+        concurrency: int = 1,
+        ordered: bool = True,
+    ) -> AsyncIterator[List]:
+        """
+        Iterate lazily over the pages of the search, following the next links.
+        The next pages are fetched while the current one is consumed.
+
+        With a concurrency above 1, servers paging by offset (HAPI
+        `_getpagesoffset`, `_offset`) have their pages fetched concurrently,
+        given the total of the first page or `_summary=count`. Other servers
+        fall back to following the next links.
+
+        Args:
+            return_as: class to convert the resources to
+            prefetch: number of pages fetched in advance
+            concurrency: number of pages fetched simultaneously by offset
+            ordered: yield the pages fetched by offset in order, or as they
+                are received
+
+        Returns:
+            an async iterator of list of resources
+        """
+        if concurrency > 1:
+            bundles = self._stream_bundles_by_offset(concurrency, ordered)
+        else:
+            bundles = self._stream_bundles(prefetch=prefetch)
+        # stops fetching as soon as the consumer closes this iterator
+        async with aclosing(bundles):
+            async for bundle in bundles:
+                yield await self._process_bundle(bundle, return_as=return_as)
+
+    async def stream(
+        self,
+        return_as=None,
+        prefetch: int = 1,
+        concurrency: int = 1,
+        ordered: bool = True,
+    ) -> AsyncIterator[Any]:
+        """
+        Iterate lazily over all the resources of the search, holding in memory
+        at most `prefetch` + 1 pages (`concurrency` + 1 fetching by offset),
+        see stream_pages
+
+        Usage:
+            async for patient in proxy.search(name="doe").limit(100).stream():
+                ...
+
+            # breaking early: aclosing cancels the fetch of the next pages
+            async with aclosing(proxy.search(name="doe").stream()) as patients:
+                async for patient in patients:
+                    break
+        """
+        pages = self.stream_pages(
+            return_as=return_as,
+            prefetch=prefetch,
+            concurrency=concurrency,
+            ordered=ordered,
+        )
+        async with aclosing(pages):
+            async for page in pages:
+                for resource in page:
+                    yield resource
+
 
 class ClientProxy:
+    # proxies are created for each tenant and resource type
+    __slots__ = ("_id", "client", "_fhir_manager")
+
     def __init__(
         self, _id: str, client: SmartOnFhirClient, fhir_manager: "FhirContextManager"
     ) -> None:
@@ -101,8 +464,11 @@ class ClientProxy:
         self.client = client
         # add a manager
         self._fhir_manager = fhir_manager
+
+    @property
+    def _target(self) -> CustomFHIRSearchSet:
         # allow research stuff
-        self._target = self.client.resources(_id)
+        return self.client.resources(self._id)
 
     def search(self, **kwargs) -> SearchSet:
         return SearchSet(self._target.search(**kwargs), self._fhir_manager, self.client)
@@ -142,6 +508,58 @@ class ClientProxy:
     def upsert(self, resource):
         ...
 
+    async def sync(
+        self,
+        store: WatermarkStore,
+        *,
+        return_as=None,
+        page_size: int = 100,
+        prefetch: int = 1,
+        **kwargs,
+    ) -> AsyncIterator[List]:
+        """
+        Iterate over the pages of the resources updated since the last sync,
+        sorted by _lastUpdated. The watermark (greatest meta.lastUpdated) of
+        a page is saved when the next page is requested, once the page has
+        been processed: an interrupted sync resumes from the last processed
+        page.
+
+        Resources are searched with `_lastUpdated=ge<watermark>`, those updated
+        at the watermark instant being sent again, to not miss resources
+        updated at the same instant and split over two pages.
+
+        Usage:
+            async for page in fhir_client_manager.lifen.Patient.sync(store):
+                await target.save_all(page)
+
+        Args:
+            store: where the watermarks are kept
+            return_as: class to convert the resources to
+            page_size: number of resources by page
+            prefetch: number of pages fetched in advance
+            **kwargs: additional search parameters
+
+        Returns:
+            an async iterator of list of resources
+        """
+        client_name = self.client.client_name
+        watermark = await store.get(client_name, self._id)
+        search = self._target.search(**kwargs)
+        if watermark is not None:
+            search = search.search(_lastUpdated=f"ge{watermark}")
+        search_set = SearchSet(
+            search.sort("_lastUpdated").limit(page_size),
+            self._fhir_manager,
+            self.client,
+        )
+        logger.info(f"Syncing {client_name} {self._id} since {watermark}")
+        async for bundle in search_set._stream_bundles(prefetch=prefetch):
+            yield await search_set._process_bundle(bundle, return_as=return_as)
+            latest = latest_update(bundle_resources(bundle, self._id), since=watermark)
+            if latest != watermark:
+                await store.set(client_name, self._id, latest)
+                watermark = latest
+
     async def delete(
         self, resource: Resource | AsyncResource | CustomFHIRResource, **kwargs
     ):
@@ -154,12 +572,23 @@ class ClientProxy:
 T = TypeVar("T", bound=Resource)
 
 
+@lru_cache(maxsize=None)
+def _is_resource_type(name: str) -> bool:
+    """whether the name is a fhir resource type e.g. Patient"""
+    if not name[:1].isupper():
+        return False
+    try:
+        return issubclass(get_fhir_model_class(name), Resource)
+    except KeyError:
+        return False
+
+
 class FhirContextRequester:
     """
     Fhir requester attached to one tenant
     """
 
-    # to be extended
+    # most used resources, any other fhir resource is also available
     RESOURCES = frozenset(
         {
             "Patient",
@@ -187,16 +616,32 @@ class FhirContextRequester:
         self._client = client
         self._fhir_manager = client.fhir_manager
 
-        for resource_name in FhirContextRequester.RESOURCES:
-            self.__setattr__(
-                resource_name, ClientProxy(resource_name, client, self._fhir_manager)
+    def __getattr__(self, name: str) -> ClientProxy:
+        # proxies are created at first access, then cached as attributes
+        if not _is_resource_type(name):
+            raise AttributeError(
+                f"{type(self).__name__!r} object has no attribute {name!r}"
             )
+        proxy = ClientProxy(name, self._client, self._fhir_manager)
+        self.__dict__[name] = proxy
+        return proxy
+
+    def __dir__(self):
+        return sorted({*super().__dir__(), *FhirContextRequester.RESOURCES})
 
     def _get_result_as_or_raw(
-        self, resource: AsyncResource, *, return_as: Type[T] = None
-    ) -> CustomFHIRResource | T:
+        self, resource: AsyncResource | Dict[str, Any], *, return_as: Type[T] = None
+    ) -> CustomFHIRResource | T | None:
+        if resource is None:
+            return None
         if return_as:
-            return return_as(**resource)
+            # converted from the plain data: references of fhirpy resources
+            # carry their client
+            return to_model(
+                return_as, _data(resource), validate=self._client.validate_models
+            )
+        if not isinstance(resource, AsyncResource):
+            resource = self._client.resource(resource["resourceType"], **resource)
         return self._fhir_manager.create_async_fhir_resource(self._client, resource)
 
     async def resolve_ref(
@@ -237,6 +682,111 @@ class FhirContextRequester:
         ).to_resource()
         return self._get_result_as_or_raw(fhirpy_resource_dict, return_as=return_as)
 
+    @staticmethod
+    def _local_reference(reference) -> Tuple[str, str, str | None] | None:
+        match reference:
+            case Reference(reference=str() as ref):
+                return split_reference(ref)
+            case str():
+                return split_reference(reference)
+            case {"reference": str() as ref}:
+                return split_reference(ref)
+        return None
+
+    async def _fetch_by_ids(
+        self, resource_type: str, ids: List[str]
+    ) -> Dict[Tuple[str, str, None], Any]:
+        bundle = await self._client._fetch_resource(
+            resource_type, {"_id": ",".join(ids), "_count": len(ids)}
+        )
+        found = {}
+        for entry in bundle.get("entry", []):
+            data = entry["resource"]
+            if data.get("resourceType") == resource_type:
+                self._client.resource_cache.put(data)
+                found[(resource_type, data["id"], None)] = data
+        return found
+
+    async def _fetch_version(
+        self, resource_type: str, id_: str, version_id: str
+    ) -> Dict[Tuple[str, str, str], Any]:
+        try:
+            data = await self._client._fetch_resource(
+                f"{resource_type}/{id_}/_history/{version_id}"
+            )
+        except ResourceNotFound:
+            return {}
+        self._client.resource_cache.put(data, versioned=True)
+        return {(resource_type, id_, version_id): data}
+
+    async def resolve_refs(
+        self,
+        references: Iterable[Reference | str | None],
+        *,
+        return_as: Type[T] = None,
+        chunk_size: int = 50,
+    ) -> List[CustomFHIRResource | T | None]:
+        """
+        Resolve many references with as few requests as possible: references
+        are deduplicated, looked up in the resource cache of the client, then
+        fetched by resource type with `_id=a,b,c` searches. Versioned
+        references (`Patient/1/_history/2`) and references by identifier are
+        resolved one by one.
+
+        Args:
+            references: fhir references, or references as string
+            return_as: class to convert the resources to
+            chunk_size: max number of ids per search
+
+        Returns:
+            the resources in the same order as the references, None for
+            unresolved ones
+        """
+        references = list(references)
+        targets = [self._local_reference(reference) for reference in references]
+        cache = self._client.resource_cache
+
+        resolved: Dict[Tuple[str, str, str | None], Any] = {}
+        missing = defaultdict(set)
+        versions = []
+        for target in filter(None, set(targets)):
+            data = cache.get(*target)
+            if data is not None:
+                resolved[target] = data
+            elif target[2] is None:
+                missing[target[0]].add(target[1])
+            else:
+                versions.append(target)
+
+        by_identifier = {
+            index: reference
+            for index, (reference, target) in enumerate(zip(references, targets))
+            if target is None and isinstance(reference, Reference)
+        }
+        identifier_results, *fetched = await asyncio.gather(
+            asyncio.gather(
+                *(
+                    self.resolve_ref(reference, return_as=return_as)
+                    for reference in by_identifier.values()
+                )
+            ),
+            *(
+                self._fetch_by_ids(resource_type, chunk)
+                for resource_type, ids in missing.items()
+                for chunk in chunked(sorted(ids), chunk_size)
+            ),
+            *(self._fetch_version(*target) for target in versions),
+        )
+        for found in fetched:
+            resolved.update(found)
+
+        results = dict(zip(by_identifier, identifier_results))
+        for index, target in enumerate(targets):
+            data = resolved.get(target) if target is not None else None
+            if data is not None:
+                results[index] = self._get_result_as_or_raw(data, return_as=return_as)
+        return [results.get(index) for index in range(len(references))]
+
     @property
     def patient(self) -> ClientProxy:
         return getattr(self, "Patient")
@@ -321,6 +871,8 @@ class FhirContextManager:
     def __init__(self, own_fhir_url: str | None = None):
         self.OWN_FHIR_URL = own_fhir_url or self.OWN_FHIR_URL
         self.cls_by_partner_id = defaultdict(dict)
+        # builders which could not be registered, by client name
+        self.failed_registrations: Dict[str, SmartOnFhirClientBuilder] = {}
 
     def set_own_fhir_url(self, url: str):
         self.OWN_FHIR_URL = url
@@ -343,7 +895,7 @@ class FhirContextManager:
                     self,
                     client,
                     resource.resource_type,
-                    **resource.dict(by_alias=kwargs.get("by_alias", False)),
+                    **dump(resource, by_alias=kwargs.get("by_alias", False)),
                 )
             case AsyncResource():
                 return cls(self, client, resource.resourceType, **resource)
@@ -352,6 +904,30 @@ class FhirContextManager:
             case _:
                 raise ValueError("Could not create async fhir resource")
 
+    def create_async_fhir_resources(
+        self, client: SmartOnFhirClient, resources: Iterable[AsyncResource]
+    ) -> List[CustomFHIRResource]:
+        """
+        Convert a page of resources fetched by the client, looking up the
+        registered classes once
+
+        Args:
+            client: client which fetched the resources
+            resources: raw resources
+
+        Returns:
+            the list of CustomFHIRResource
+        """
+        cls_by_resource = self.cls_by_partner_id[client.client_name]
+        return [
+            (cls_by_resource.get(resource.resourceType) or CustomFHIRResource)(
+                self, client, resource.resourceType, **resource
+            )
+            if isinstance(resource, AsyncResource)
+            else self.create_async_fhir_resource(client, resource)
+            for resource in resources
+        ]
+
     @staticmethod
     def _get_tenant_id(
         target_url_strategy: TargetUrlStrategy,
@@ -402,6 +978,7 @@ class FhirContextManager:
                     authorization=f"Bearer {target_server_authorization}",
                     partner=partner,
                     fhir_manager=self,
+                    pool=client.pool,
                 )
             ),
         )
@@ -409,7 +986,7 @@ class FhirContextManager:
     async def register_partner_async(
         self,
         builder: SmartOnFhirClientBuilder,
-    ):
+    ) -> SmartOnFhirClient:
         fhir_client = await builder.build(self)
 
         # unpacking partner information
@@ -439,6 +1016,302 @@ class FhirContextManager:
             organization,
             target_server_authorization,
         )
+        return fhir_client
+
+    async def _register_tenant(
+        self, builder: SmartOnFhirClientBuilder, semaphore: asyncio.Semaphore
+    ) -> TenantRegistration:
+        async with semaphore:
+            start = time.perf_counter()
+            client_name = None
+            try:
+                # raises for builders without partner
+                client_name = builder.client_name
+                fhir_client = await self.register_partner_async(builder)
+            except Exception as e:
+                logger.exception(e)
+                if client_name is not None:
+                    self.failed_registrations[client_name] = builder
+                status, error = RegistrationStatus.FAILED, str(e)
+            else:
+                self.failed_registrations.pop(client_name, None)
+                status = (
+                    RegistrationStatus.REGISTERED
+                    if fhir_client.authorization
+                    else RegistrationStatus.LAZY
+                )
+                error = None
+            duration = time.perf_counter() - start
+        logger.info(f"{client_name=} {status.value} in {duration:.2f}s")
+        return TenantRegistration(
+            client_name=client_name or "",
+            status=status,
+            duration=duration,
+            error=error,
+        )
+
+    async def register_partners_async(
+        self,
+        builders: Iterable[SmartOnFhirClientBuilder],
+        *,
+        max_concurrency: int = 20,
+    ) -> List[TenantRegistration]:
+        """
+        Register many tenants concurrently. Tenants whose access token could
+        not be fetched are registered anyway, the token being fetched at
+        first request; tenants failing to register are kept in
+        `failed_registrations`.
+
+        Args:
+            builders: one builder per tenant
+            max_concurrency: number of tenants registered simultaneously
+
+        Returns:
+            the registration report of each tenant
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        return list(
+            await asyncio.gather(
+                *(self._register_tenant(builder, semaphore) for builder in builders)
+            )
+        )
+
+    async def retry_failed_registrations(
+        self, *, max_concurrency: int = 20
+    ) -> List[TenantRegistration]:
+        """register again the tenants which failed to register"""
+        return await self.register_partners_async(
+            list(self.failed_registrations.values()),
+            max_concurrency=max_concurrency,
+        )
+
+    async def pipe_many_to_target_fhir_server(
+        self,
+        resources: Iterable[CustomFHIRResource],
+        *,
+        target_identifier_url: str | None = None,
+        bundle_type: BundleType = BundleType.BATCH,
+        bundle_size: int = 100,
+        mode: ConditionalMode = ConditionalMode.UPDATE,
+        max_concurrent_bundles: int = 1,
+    ) -> List[BundleEntryOutcome]:
+        """
+        Bulk version of CustomFHIRResource.pipe_to_target_fhir_server: resources
+        are sent to their target server in batch / transaction bundles, the
+        identifier lookup being replaced by conditional operations.
+
+        Args:
+            resources: resources fetched from partners
+            target_identifier_url: system of the identifier matching resources
+                on the target server
+            bundle_type: batch or transaction
+            bundle_size: number of entries per bundle
+            mode: conditional update or conditional create
+            max_concurrent_bundles: number of bundles sent simultaneously
+
+        Returns:
+            the outcome of each resource, in the same order
+        """
+        resources = list(resources)
+        outcomes: List[BundleEntryOutcome | None] = [None] * len(resources)
+
+        by_partition = defaultdict(list)
+        for index, resource in enumerate(resources):
+            by_partition[resource.partition_id].append((index, resource))
+
+        semaphore = asyncio.Semaphore(max_concurrent_bundles)
+
+        async def send(client: SmartOnFhirClient, chunk):
+            chunk_resources = [resource for _, resource in chunk]
+            bundle = build_bundle(
+                (
+                    build_entry(resource, target_identifier_url, mode)
+                    for resource in chunk_resources
+                ),
+                bundle_type,
+            )
+            async with semaphore:
+                try:
+                    response = await client._do_request("POST", "", data=bundle)
+                except Exception as e:
+                    # the outcomes of the other bundles are kept
+                    logger.warning("Bundle of {} failed: {!r}", len(chunk), e)
+                    results = failed_outcomes(chunk_resources, e)
+                else:
+                    results = parse_response(chunk_resources, response)
+            for (index, _), outcome in zip(chunk, results):
+                outcomes[index] = outcome
+
+        await asyncio.gather(
+            *(
+                send(getattr(self, f"TARGET_{partition_id}")._client, chunk)
+                for partition_id, items in by_partition.items()
+                for chunk in chunked(items, bundle_size)
+            )
+        )
+        return outcomes
+
+    async def pipe_graph_to_target_fhir_server(
+        self,
+        graph: ResourceGraph | Iterable[CustomFHIRResource],
+        *,
+        target_identifier_url: str | None = None,
+        bundle_size: int = 200,
+        mode: ConditionalMode = ConditionalMode.UPDATE,
+    ) -> List[BundleEntryOutcome]:
+        """
+        Write a graph of resources, e.g. from SearchSet.fetch_graph, to the
+        target server in as few transactions as possible. Resources are sorted
+        so that referenced resources are written first, and their references
+        rewritten to the target ids: `urn:uuid` within a transaction, target
+        references returned by the previous ones across transactions. When a
+        transaction fails, the resources referencing one of its resources,
+        directly or not, are not sent (status 424).
+
+        Args:
+            graph: resources fetched from a partner
+            target_identifier_url: system of the identifier matching resources
+                on the target server
+            bundle_size: number of entries per transaction
+            mode: conditional update or conditional create
+
+        Returns:
+            the outcome of each resource, referenced resources first
+        """
+        if not isinstance(graph, ResourceGraph):
+            graph = ResourceGraph(graph)
+        by_partition = defaultdict(list)
+        for resource in graph.ordered():
+            by_partition[resource.partition_id].append(resource)
+
+        outcomes = []
+        # keys of the resources not written, whose dependents are skipped
+        failed: Set[str] = set()
+        for partition_id, resources in by_partition.items():
+            client = getattr(self, f"TARGET_{partition_id}")._client
+            # target reference of the resources written, by source key
+            written: Dict[str, str] = {}
+            for chunk in chunked(resources, bundle_size):
+                keys = [f"{r.resource_type}/{r.id}" for r in chunk]
+                sent, skipped = [], []
+                for key, resource in zip(keys, chunk):
+                    if graph.dependencies(key) & failed:
+                        failed.add(key)
+                        skipped.append(resource)
+                    else:
+                        sent.append(resource)
+                by_key = dict(
+                    zip(
+                        [f"{r.resource_type}/{r.id}" for r in skipped],
+                        skipped_outcomes(skipped),
+                    )
+                )
+                results = await self._send_graph_transaction(
+                    client, graph, sent, written, target_identifier_url, mode
+                )
+                for resource, outcome in zip(sent, results):
+                    key = f"{resource.resource_type}/{resource.id}"
+                    by_key[key] = outcome
+                    if not outcome.ok:
+                        failed.add(key)
+                outcomes.extend(by_key[key] for key in keys)
+        return outcomes
+
+    @staticmethod
+    async def _send_graph_transaction(
+        client: SmartOnFhirClient,
+        graph: ResourceGraph,
+        resources: List[CustomFHIRResource],
+        written: Dict[str, str],
+        target_identifier_url: str | None,
+        mode: ConditionalMode,
+    ) -> List[BundleEntryOutcome]:
+        """Write resources of a graph in one transaction, filling `written`"""
+        if not resources:
+            return []
+        bundle = build_bundle(
+            graph.build_transaction_entries(
+                resources, written, target_identifier_url, mode
+            ),
+            BundleType.TRANSACTION,
+        )
+        try:
+            response = await client._do_request("POST", "", data=bundle)
+        except Exception as e:
+            logger.warning("Transaction of {} failed: {!r}", len(resources), e)
+            return failed_outcomes(resources, e)
+        results = parse_response(resources, response)
+        for resource, outcome in zip(resources, results):
+            reference = target_reference(resource.resource_type, outcome.location) or (
+                f"{resource.resource_type}/{outcome.resource['id']}"
+                if outcome.resource and outcome.resource.get("id")
+                else None
+            )
+            if reference is not None:
+                written[f"{resource.resource_type}/{resource.id}"] = reference
+        return results
+
+    async def pipe_stream_to_target_fhir_server(
+        self,
+        resources: AsyncIterable[CustomFHIRResource],
+        *,
+        target_identifier_url: str | None = None,
+        bundle_type: BundleType = BundleType.BATCH,
+        bundle_size: int = 50,
+        mode: ConditionalMode = ConditionalMode.UPDATE,
+        concurrency: int = 4,
+        checkpoint: Checkpoint | None = None,
+        name: str = "default",
+        stats: PipelineStats | None = None,
+    ) -> PipelineStats:
+        """
+        Streaming version of pipe_many_to_target_fhir_server, e.g. for
+        SearchSet.stream() or BulkExport.stream(): bundles are written by a
+        pool of workers, the stream being consumed as fast as they write.
+        Progress is saved in the checkpoint under `name`, a new run with the
+        same stream resuming where the previous one stopped.
+
+        Args:
+            resources: stream of resources fetched from partners
+            target_identifier_url: system of the identifier matching resources
+                on the target server
+            bundle_type: batch or transaction
+            bundle_size: number of entries per bundle
+            mode: conditional update or conditional create
+            concurrency: number of bundles written simultaneously
+            checkpoint: where to store the progress
+            name: name of the pipeline in the checkpoint
+            stats: statistics updated while running
+
+        Returns:
+            throughput and error statistics
+        """
+        stats = stats or PipelineStats()
+
+        async def write_batch(batch: List[CustomFHIRResource]) -> List[bool]:
+            outcomes = await self.pipe_many_to_target_fhir_server(
+                batch,
+                target_identifier_url=target_identifier_url,
+                bundle_type=bundle_type,
+                bundle_size=len(batch),
+                mode=mode,
+            )
+            for outcome in outcomes:
+                if not outcome.ok:
+                    stats.last_errors.append(
+                        f"{outcome.resource_type}/{outcome.source_id}: {outcome.status}"
+                    )
+            return [outcome.ok for outcome in outcomes]
+
+        return await run_pipeline(
+            resources,
+            write_batch,
+            name=name,
+            concurrency=concurrency,
+            batch_size=bundle_size,
+            checkpoint=checkpoint,
+            stats=stats,
+        )
 
     def req(self, client_name) -> FhirContextRequester | None:
         partner_requester = getattr(self, client_name)
@@ -0,0 +1,182 @@
+import uuid
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Set
+
+from smart_on_fhir_client.requester.bundle import (
+    BundleEntryOutcome,
+    ConditionalMode,
+    build_entry,
+)
+from smart_on_fhir_client.resource_cache import split_reference
+
+
+def iter_references(value: Any) -> Iterator[Dict[str, Any]]:
+    """every Reference (dict with a `reference` string) nested in a value"""
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            if isinstance(value.get("reference"), str):
+                yield value
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+
+
+def target_reference(resource_type: str, location: str | None) -> str | None:
+    """
+    Reference to a resource written on the target server, given the location
+    of a transaction-response entry
+
+    >>> target_reference("Patient", "http://target/fhir/Patient/12/_history/1")
+    'Patient/12'
+    """
+    if not location:
+        return None
+    parts = location.split("?", 1)[0].split("/_history/", 1)[0].rstrip("/")
+    parts = parts.rsplit("/", 2)
+    if len(parts) < 2 or parts[-2] != resource_type:
+        return None
+    return f"{resource_type}/{parts[-1]}"
+
+
+class ResourceGraph:
+    """
+    Resources of a partner linked by their references, e.g. a Patient and
+    its Encounters, Conditions and MedicationRequests fetched at once with
+    `_include` / `_revinclude`, see SearchSet.fetch_graph. Resources are
+    keyed by `ResourceType/id`, references being matched on it or on the
+    `fullUrl` of the bundle entries.
+    """
+
+    def __init__(self, resources: Iterable = ()):
+        self._resources: Dict[str, Any] = {}
+        self._full_urls: Dict[str, str] = {}
+        for resource in resources:
+            self.add(resource)
+
+    def add(self, resource, full_url: str | None = None) -> bool:
+        """
+        Add a resource, unless already in the graph
+
+        Args:
+            resource: fhir resource
+            full_url: fullUrl of its bundle entry
+
+        Returns:
+            whether the resource was added
+        """
+        key = f"{resource.resource_type}/{resource.id}"
+        if full_url:
+            self._full_urls[full_url] = key
+        if key in self._resources:
+            return False
+        self._resources[key] = resource
+        return True
+
+    def __len__(self) -> int:
+        return len(self._resources)
+
+    def __iter__(self) -> Iterator:
+        return iter(self._resources.values())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._resources
+
+    def key_of(self, reference: str) -> str | None:
+        """key of the resource of the graph targeted by a reference"""
+        key = self._full_urls.get(reference)
+        if key is None:
+            target = split_reference(reference)
+            key = f"{target[0]}/{target[1]}" if target is not None else None
+        return key if key in self._resources else None
+
+    def dependencies(self, key: str) -> Set[str]:
+        """keys of the resources of the graph referenced by a resource"""
+        data = self._resources[key].serialize()
+        keys = {self.key_of(ref["reference"]) for ref in iter_references(data)}
+        keys.discard(None)
+        keys.discard(key)
+        return keys
+
+    def ordered(self) -> List:
+        """
+        Resources sorted so that referenced resources come before the ones
+        referencing them. Cycles are broken in insertion order.
+        """
+        dependencies = {key: self.dependencies(key) for key in self._resources}
+        dependents: Dict[str, List[str]] = {key: [] for key in self._resources}
+        for key, keys in dependencies.items():
+            for dependency in keys:
+                dependents[dependency].append(key)
+        waiting = {key: len(keys) for key, keys in dependencies.items()}
+        ready = deque(key for key, count in waiting.items() if count == 0)
+        ordered: List[str] = []
+        while len(ordered) < len(self._resources):
+            if not ready:
+                # cycle: take the first resource still waiting
+                ready.append(next(key for key in self._resources if key in waiting))
+            key = ready.popleft()
+            if waiting.pop(key, None) is None:
+                continue
+            ordered.append(key)
+            for dependent in dependents[key]:
+                if dependent in waiting:
+                    waiting[dependent] -= 1
+                    if waiting[dependent] == 0:
+                        ready.append(dependent)
+        return [self._resources[key] for key in ordered]
+
+    def build_transaction_entries(
+        self,
+        resources: List,
+        written: Dict[str, str],
+        target_identifier_url: str | None = None,
+        mode: ConditionalMode = ConditionalMode.UPDATE,
+    ) -> List[Dict[str, Any]]:
+        """
+        Entries of a transaction writing some resources of the graph. Each
+        entry gets a `urn:uuid` fullUrl, references to the resources of the
+        same transaction are rewritten to it, references to the resources
+        written by previous transactions to their target reference.
+        References outside the graph are left untouched.
+
+        Args:
+            resources: resources of the graph to write
+            written: target references of the resources already written,
+                by key
+            target_identifier_url: system of the identifier used for matching
+            mode: conditional update or conditional create
+
+        Returns:
+            the bundle entries
+        """
+        full_urls = {
+            f"{resource.resource_type}/{resource.id}": f"urn:uuid:{uuid.uuid4()}"
+            for resource in resources
+        }
+        entries = []
+        for resource in resources:
+            entry = build_entry(resource, target_identifier_url, mode)
+            for ref in iter_references(entry["resource"]):
+                key = self.key_of(ref["reference"])
+                if key in full_urls:
+                    ref["reference"] = full_urls[key]
+                elif key in written:
+                    ref["reference"] = written[key]
+            entry["fullUrl"] = full_urls[f"{resource.resource_type}/{resource.id}"]
+            entries.append(entry)
+        return entries
+
+
+def skipped_outcomes(resources: List) -> List[BundleEntryOutcome]:
+    """outcomes of resources not sent because a previous transaction
+    of their graph failed"""
+    return [
+        BundleEntryOutcome(
+            resource_type=resource.resource_type,
+            source_id=resource.id,
+            status="424",
+        )
+        for resource in resources
+    ]
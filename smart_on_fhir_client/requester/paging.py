@@ -0,0 +1,40 @@
+from typing import Iterator, Tuple
+
+from yarl import URL
+
+# offset parameters of the next links: HAPI paging of a cached search, and
+# plain offset searches
+OFFSET_PARAMS = ("_getpagesoffset", "_offset")
+
+OffsetPaging = Tuple[URL, str, int]
+
+
+def offset_paging(next_link: str | None) -> OffsetPaging | None:
+    """
+    How a server pages by offset, given the next link of the first page
+
+    >>> offset_paging("http://hapi/fhir?_getpages=abc&_getpagesoffset=20&_count=20")
+    (URL('http://hapi/fhir?_getpages=abc&_getpagesoffset=20&_count=20'), '_getpagesoffset', 20)
+
+    Args:
+        next_link: url of the second page
+
+    Returns:
+        the link, its offset parameter and the page size, None if the server
+        does not page by offset
+    """
+    if not next_link:
+        return None
+    url = URL(next_link)
+    for param in OFFSET_PARAMS:
+        value = url.query.get(param)
+        if value is not None and value.isdigit() and int(value) > 0:
+            return url, param, int(value)
+    return None
+
+
+def offset_links(paging: OffsetPaging, total: int) -> Iterator[str]:
+    """links of the pages following the first one"""
+    url, param, page_size = paging
+    for offset in range(page_size, total, page_size):
+        yield str(url.update_query({param: str(offset)}))
@@ -0,0 +1,205 @@
+import abc
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, AsyncIterable, Awaitable, Callable, Deque, Dict, List
+
+from loguru import logger
+from pydantic import BaseModel, Field
+
+
+class PipelineStats(BaseModel):
+    """Live statistics of a pipeline run"""
+
+    # resources skipped because processed by a previous run
+    resumed_from: int = 0
+    processed: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    started_at: float = 0.0
+    finished_at: float | None = None
+    # last errors, as messages
+    last_errors: Deque[str] = Field(default_factory=lambda: deque(maxlen=20))
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """processed resources per second"""
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+
+class Checkpoint(abc.ABC):
+    """Number of resources of a stream already processed, by pipeline name"""
+
+    @abc.abstractmethod
+    async def load(self, name: str) -> int:
+        ...
+
+    @abc.abstractmethod
+    async def save(self, name: str, offset: int) -> None:
+        ...
+
+
+class InMemoryCheckpoint(Checkpoint):
+    def __init__(self):
+        self._offsets: Dict[str, int] = {}
+
+    async def load(self, name: str) -> int:
+        return self._offsets.get(name, 0)
+
+    async def save(self, name: str, offset: int) -> None:
+        self._offsets[name] = offset
+
+
+class FileCheckpoint(Checkpoint):
+    """offsets stored in a json file, replaced atomically"""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+
+    def _read(self) -> Dict[str, int]:
+        try:
+            return json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+
+    async def load(self, name: str) -> int:
+        return self._read().get(name, 0)
+
+    async def save(self, name: str, offset: int) -> None:
+        offsets = self._read()
+        offsets[name] = offset
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(offsets))
+        os.replace(tmp, self.path)
+
+
+class _Progress:
+    """low watermark of the completed batches: batches complete out of
+    order, the checkpoint only moves over contiguous successful batches and
+    stops at the first failed one, so that it is replayed by the next run"""
+
+    def __init__(self, offset: int):
+        self.offset = offset
+        # size of the completed batches by start, None if failed
+        self._done: Dict[int, int | None] = {}
+
+    def complete(self, start: int, size: int, succeeded: bool = True) -> bool:
+        self._done[start] = size if succeeded else None
+        moved = False
+        while self._done.get(self.offset) is not None:
+            self.offset += self._done.pop(self.offset)
+            moved = True
+        return moved
+
+
+async def run_pipeline(
+    items: AsyncIterable[Any],
+    write_batch: Callable[[List[Any]], Awaitable[List[bool]]],
+    *,
+    name: str = "default",
+    concurrency: int = 4,
+    batch_size: int = 50,
+    checkpoint: Checkpoint | None = None,
+    stats: PipelineStats | None = None,
+    log_every: float = 30.0,
+) -> PipelineStats:
+    """
+    Write a stream of items by batches with a pool of workers. The stream is
+    only consumed as fast as the workers write (bounded queue), and the
+    number of items written is checkpointed so that an interrupted run
+    resumes where it stopped, provided the stream is replayed in the same
+    order. The checkpoint never moves past a failed batch, i.e. whose write
+    raised or with no item written (bundle rejected as a whole, server
+    down): the next run replays it, with the batches written after it, so
+    writes must be idempotent (e.g. conditional updates). Items rejected
+    individually are only counted as failed, they would be rejected again.
+
+    An error of the stream or of a worker (e.g. the checkpoint storage)
+    stops the pipeline and is raised.
+
+    Args:
+        items: stream of items
+        write_batch: coroutine writing a batch, returning the success of each item
+        name: name of the pipeline in the checkpoint
+        concurrency: number of workers
+        batch_size: number of items per batch
+        checkpoint: where to store the progress
+        stats: statistics to update, allowing to observe a running pipeline
+        log_every: seconds between two progress logs
+
+    Returns:
+        the statistics of the run
+    """
+    stats = stats or PipelineStats()
+    stats.started_at = time.monotonic()
+    offset = await checkpoint.load(name) if checkpoint is not None else 0
+    stats.resumed_from = offset
+    progress = _Progress(offset)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    last_log = time.monotonic()
+
+    async def worker():
+        nonlocal last_log
+        while (job := await queue.get()) is not None:
+            start, batch = job
+            try:
+                results = await write_batch(batch)
+            except Exception as e:
+                logger.error(e)
+                stats.last_errors.append(str(e))
+                results = [False] * len(batch)
+            succeeded = sum(1 for result in results if result)
+            stats.processed += len(batch)
+            stats.succeeded += succeeded
+            stats.failed += len(batch) - succeeded
+            completed = progress.complete(start, len(batch), succeeded > 0)
+            if completed and checkpoint is not None:
+                await checkpoint.save(name, progress.offset)
+            if time.monotonic() - last_log >= log_every:
+                last_log = time.monotonic()
+                logger.info(
+                    f"Pipeline {name}: {stats.processed} processed, {stats.failed} "
+                    f"failed, {stats.throughput:.1f} resources/s"
+                )
+
+    async def produce():
+        index, batch = 0, []
+        async for item in items:
+            index += 1
+            if index <= offset:
+                continue
+            batch.append(item)
+            if len(batch) >= batch_size:
+                await queue.put((index - len(batch), batch))
+                batch = []
+        if batch:
+            await queue.put((index - len(batch), batch))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    # supervised: a failing worker must not leave the producer blocked on
+    # the full queue
+    tasks = [asyncio.create_task(produce())]
+    tasks += [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        stats.finished_at = time.monotonic()
+    logger.info(
+        f"Pipeline {name} done: {stats.processed} processed, {stats.failed} "
+        f"failed in {stats.elapsed:.1f}s"
+    )
+    return stats
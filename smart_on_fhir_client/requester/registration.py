@@ -0,0 +1,22 @@
+import enum
+
+from pydantic import BaseModel
+
+
+class RegistrationStatus(enum.Enum):
+    # client registered with an access token
+    REGISTERED = "registered"
+    # client registered without access token, fetched at first request
+    LAZY = "lazy"
+    # client not registered, see FhirContextManager.retry_failed_registrations
+    FAILED = "failed"
+
+
+class TenantRegistration(BaseModel):
+    """Report of the registration of one tenant"""
+
+    client_name: str
+    status: RegistrationStatus
+    # seconds
+    duration: float
+    error: str | None = None
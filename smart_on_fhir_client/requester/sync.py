@@ -0,0 +1,176 @@
+import abc
+import asyncio
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable
+
+from loguru import logger
+
+
+_FRACTION = re.compile(r"\.(\d+)")
+
+
+def parse_instant(value: str) -> datetime | None:
+    """
+    Parse a fhir instant as a timezone aware datetime, naive values being
+    taken as UTC. datetime.fromisoformat of python 3.10 rejects the `Z`
+    suffix and fractions of other than 3 or 6 digits.
+
+    >>> parse_instant("2023-01-02T03:04:05.1234567Z")
+    datetime.datetime(2023, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc)
+    """
+    try:
+        value = value.strip()
+        if value[-1:] in ("Z", "z"):
+            value = value[:-1] + "+00:00"
+        value = _FRACTION.sub(
+            lambda match: "." + match.group(1)[:6].ljust(6, "0"), value, count=1
+        )
+        instant = datetime.fromisoformat(value)
+    except (AttributeError, TypeError, ValueError):
+        logger.warning(f"Invalid instant {value!r}")
+        return None
+    if instant.tzinfo is None:
+        instant = instant.replace(tzinfo=timezone.utc)
+    return instant
+
+
+def latest_update(resources: Iterable[Dict], since: str | None = None) -> str | None:
+    """
+    Greatest meta.lastUpdated of the given raw resources
+
+    Args:
+        resources: raw resources of a search page
+        since: current watermark, returned if no resource is more recent
+
+    Returns:
+        the instant as sent by the server
+    """
+    latest, latest_value = (parse_instant(since), since) if since else (None, None)
+    for resource in resources:
+        value = (resource.get("meta") or {}).get("lastUpdated")
+        instant = parse_instant(value) if value else None
+        if instant is None:
+            continue
+        if latest is None or instant > latest:
+            latest, latest_value = instant, value
+    return latest_value
+
+
+class WatermarkStore(abc.ABC):
+    """Last synchronized meta.lastUpdated, by client name and resource type"""
+
+    @abc.abstractmethod
+    async def get(self, client_name: str, resource_type: str) -> str | None:
+        ...
+
+    @abc.abstractmethod
+    async def set(self, client_name: str, resource_type: str, watermark: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, client_name: str, resource_type: str) -> None:
+        ...
+
+
+class InMemoryWatermarkStore(WatermarkStore):
+    def __init__(self):
+        self._watermarks: Dict[str, str] = {}
+
+    async def get(self, client_name: str, resource_type: str) -> str | None:
+        return self._watermarks.get(f"{client_name}/{resource_type}")
+
+    async def set(self, client_name: str, resource_type: str, watermark: str) -> None:
+        self._watermarks[f"{client_name}/{resource_type}"] = watermark
+
+    async def delete(self, client_name: str, resource_type: str) -> None:
+        self._watermarks.pop(f"{client_name}/{resource_type}", None)
+
+
+class FileWatermarkStore(WatermarkStore):
+    """watermarks stored in a json file, replaced atomically"""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._lock = asyncio.Lock()
+
+    def _read(self) -> Dict[str, str]:
+        try:
+            return json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, watermarks: Dict[str, str]):
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(watermarks, indent=2))
+        os.replace(tmp, self.path)
+
+    async def get(self, client_name: str, resource_type: str) -> str | None:
+        return self._read().get(f"{client_name}/{resource_type}")
+
+    async def set(self, client_name: str, resource_type: str, watermark: str) -> None:
+        # concurrent syncs of several resource types share the file
+        async with self._lock:
+            watermarks = self._read()
+            watermarks[f"{client_name}/{resource_type}"] = watermark
+            self._write(watermarks)
+
+    async def delete(self, client_name: str, resource_type: str) -> None:
+        async with self._lock:
+            watermarks = self._read()
+            if watermarks.pop(f"{client_name}/{resource_type}", None) is not None:
+                self._write(watermarks)
+
+
+class SqliteWatermarkStore(WatermarkStore):
+    """watermarks stored in a sqlite database, each update in a transaction"""
+
+    def __init__(self, path: str | Path, table: str = "fhir_sync_watermark"):
+        self.path = str(path)
+        self.table = table
+        self._execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "client_name TEXT NOT NULL, resource_type TEXT NOT NULL, "
+            "watermark TEXT NOT NULL, PRIMARY KEY (client_name, resource_type))"
+        )
+
+    def _execute(self, query: str, *params) -> list:
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                return connection.execute(query, params).fetchall()
+        finally:
+            connection.close()
+
+    async def get(self, client_name: str, resource_type: str) -> str | None:
+        rows = await asyncio.to_thread(
+            self._execute,
+            f"SELECT watermark FROM {self.table} "
+            "WHERE client_name = ? AND resource_type = ?",
+            client_name,
+            resource_type,
+        )
+        return rows[0][0] if rows else None
+
+    async def set(self, client_name: str, resource_type: str, watermark: str) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            f"INSERT INTO {self.table} (client_name, resource_type, watermark) "
+            "VALUES (?, ?, ?) ON CONFLICT (client_name, resource_type) "
+            "DO UPDATE SET watermark = excluded.watermark",
+            client_name,
+            resource_type,
+            watermark,
+        )
+
+    async def delete(self, client_name: str, resource_type: str) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            f"DELETE FROM {self.table} WHERE client_name = ? AND resource_type = ?",
+            client_name,
+            resource_type,
+        )
@@ -0,0 +1,116 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+
+def split_reference(reference: str) -> Tuple[str, str, str | None] | None:
+    """
+    Split a local reference into resource type, id and version, None if the
+    reference does not target a resource
+
+    >>> split_reference("Patient/123/_history/2")
+    ('Patient', '123', '2')
+    """
+    parts = reference.split("?", 1)[0].strip("/").split("/")
+    if not parts[0][:1].isupper():
+        return None
+    if len(parts) == 2:
+        return parts[0], parts[1], None
+    if len(parts) == 4 and parts[2] == "_history":
+        return parts[0], parts[1], parts[3]
+    return None
+
+
+class ResourceCache:
+    """
+    LRU cache of resources keyed by `ResourceType/id`, entries expiring
+    after `ttl` seconds. Versions read from the history of a resource are
+    kept under `ResourceType/id/_history/versionId`: versioned lookups
+    (`Patient/1/_history/2`) only return the matching versionId.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float | None = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[
+            str, Tuple[float | None, Dict[str, Any]]
+        ] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _version(data: Dict[str, Any]) -> str | None:
+        return (data.get("meta") or {}).get("versionId")
+
+    def _lookup(self, key: str, version_id: str | None) -> Dict[str, Any] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        if version_id is not None and self._version(data) != version_id:
+            return None
+        self._entries.move_to_end(key)
+        return data
+
+    def get(self, resource_type: str, id_: str, version_id: str | None = None):
+        key = f"{resource_type}/{id_}"
+        data = None
+        if version_id is not None:
+            data = self._lookup(f"{key}/_history/{version_id}", version_id)
+        if data is None:
+            # the current version may be the requested one
+            data = self._lookup(key, version_id)
+        if data is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return data
+
+    def put(self, data: Dict[str, Any], versioned: bool = False):
+        """
+        store a serialized resource
+
+        Args:
+            data: the resource
+            versioned: the resource was read from its history, and may not be
+                the current version
+        """
+        resource_type, id_ = data.get("resourceType"), data.get("id")
+        if not resource_type or not id_ or self.max_size <= 0:
+            return
+        key = f"{resource_type}/{id_}"
+        if versioned:
+            version_id = self._version(data)
+            if version_id is None:
+                return
+            key = f"{key}/_history/{version_id}"
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._entries[key] = (expires_at, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, resource_type: str, id_: str | None):
+        if id_:
+            self._entries.pop(f"{resource_type}/{id_}", None)
+
+    def invalidate_if_outdated(self, data: Dict[str, Any]):
+        """drop the cached version of a resource read with another versionId"""
+        key = f"{data.get('resourceType')}/{data.get('id')}"
+        entry = self._entries.get(key)
+        if entry is not None and self._version(entry[1]) != self._version(data):
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,182 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Set
+
+import aiohttp
+from fhirpy.base.exceptions import OperationOutcome
+from loguru import logger
+from pydantic import BaseModel
+from tenacity import AsyncRetrying, RetryCallState, stop_after_attempt
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+NETWORK_ERRORS = (
+    aiohttp.ClientConnectionError,
+    aiohttp.ClientPayloadError,
+    asyncio.TimeoutError,
+)
+
+try:
+    import httpx
+
+    NETWORK_ERRORS += (httpx.TransportError,)
+except ImportError:  # pragma: no cover
+    pass
+
+
+class RetryableOperationOutcome(OperationOutcome):
+    """Operation outcome of a response whose status may succeed later
+    e.g. 429 or 503"""
+
+    def __init__(
+        self, reason=None, *, status: int, retry_after: float | None = None, **kwargs
+    ):
+        super().__init__(reason, **kwargs)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> float | None:
+    """Retry-After header as a number of seconds, either given as seconds
+    or as an http date"""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_idempotent(method: str, path: str) -> bool:
+    """searches sent with POST do not modify the server"""
+    return method.upper() in IDEMPOTENT_METHODS or path.rstrip("/").endswith("_search")
+
+
+class RetryPolicy(BaseModel):
+    """
+    Retry policy of the requests failing because of throttling, server
+    errors or network errors. Waits follow an exponential backoff with
+    full jitter unless the server gives a Retry-After.
+    """
+
+    # attempts including the first one
+    max_attempts: int = 5
+    initial_backoff: float = 0.5
+    max_backoff: float = 30.0
+    multiplier: float = 2.0
+    retry_statuses: Set[int] = {429, 500, 502, 503, 504}
+    # statuses for which the server did not process the request, so that
+    # non idempotent requests (create, transaction...) can safely be retried
+    non_idempotent_retry_statuses: Set[int] = {429}
+    respect_retry_after: bool = True
+    # Retry-After above this value is not waited for, the error is raised
+    max_retry_after: float = 120.0
+    # retry budget: each failure costs one token, each success gives back
+    # `budget_token_ratio` tokens; retries stop while the budget is below
+    # half of `budget_max_tokens`
+    budget_max_tokens: float = 20.0
+    budget_token_ratio: float = 0.1
+
+    def retries_status(self, status: int) -> bool:
+        return status in self.retry_statuses
+
+    def is_retryable(self, method: str, path: str, exc: BaseException) -> bool:
+        idempotent = is_idempotent(method, path)
+        if isinstance(exc, RetryableOperationOutcome):
+            if exc.retry_after is not None and exc.retry_after > self.max_retry_after:
+                return False
+            return idempotent or exc.status in self.non_idempotent_retry_statuses
+        if isinstance(exc, NETWORK_ERRORS):
+            return idempotent
+        return False
+
+    def backoff(self, attempt_number: int) -> float:
+        """full jitter exponential backoff of the given attempt (from 1)"""
+        ceiling = min(
+            self.max_backoff,
+            self.initial_backoff * self.multiplier ** (attempt_number - 1),
+        )
+        return random.uniform(0, ceiling)
+
+    def wait(self, retry_state: RetryCallState) -> float:
+        exc = retry_state.outcome.exception()
+        retry_after = getattr(exc, "retry_after", None)
+        if self.respect_retry_after and retry_after is not None:
+            return retry_after
+        return self.backoff(retry_state.attempt_number)
+
+    def retrying(self, method: str, path: str, budget: "RetryBudget") -> AsyncRetrying:
+        """
+        Tenacity controller applying this policy to one request
+
+        Args:
+            method: http method
+            path: requested path
+            budget: retry budget of the client
+
+        Returns:
+            the async retrying controller
+        """
+
+        def should_retry(retry_state: RetryCallState) -> bool:
+            outcome = retry_state.outcome
+            if not outcome.failed:
+                budget.record_success()
+                return False
+            exc = outcome.exception()
+            if not self.is_retryable(method, path, exc):
+                return False
+            budget.record_failure()
+            if not budget.can_retry():
+                logger.warning(f"Retry budget exhausted, not retrying {method} {path}")
+                return False
+            return True
+
+        def log_retry(retry_state: RetryCallState):
+            exc = retry_state.outcome.exception()
+            reason = getattr(exc, "status", None) or type(exc).__name__
+            logger.warning(
+                f"Retrying {method} {path} in {retry_state.next_action.sleep:.2f}s "
+                f"(attempt {retry_state.attempt_number}, {reason=})"
+            )
+
+        return AsyncRetrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=self.wait,
+            retry=should_retry,
+            before_sleep=log_retry,
+            reraise=True,
+        )
+
+
+class RetryBudget:
+    """
+    Token based retry budget (as gRPC retry throttling) shared by all the
+    requests of a client, preventing retry storms against an unhealthy
+    server
+    """
+
+    def __init__(self, max_tokens: float, token_ratio: float):
+        self.max_tokens = max_tokens
+        self.token_ratio = token_ratio
+        self.tokens = max_tokens
+
+    @classmethod
+    def for_policy(cls, policy: RetryPolicy) -> "RetryBudget":
+        return cls(policy.budget_max_tokens, policy.budget_token_ratio)
+
+    def record_success(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.token_ratio)
+
+    def record_failure(self):
+        self.tokens = max(0.0, self.tokens - 1)
+
+    def can_retry(self) -> bool:
+        return self.tokens > self.max_tokens / 2
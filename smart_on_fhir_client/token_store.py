@@ -0,0 +1,203 @@
+import abc
+import asyncio
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Mapping, Tuple, Any
+
+import jwt
+from loguru import logger
+from pydantic import BaseModel
+
+TokenKey = Tuple[str, str, str]
+
+
+class AccessToken(BaseModel):
+    """An access token and its expiry (epoch seconds), None if unknown"""
+
+    access_token: str
+    expires_at: float | None = None
+
+    @classmethod
+    def from_response(
+        cls,
+        response: "str | Mapping | AccessToken",
+        default_lifetime: int | None = None,
+    ) -> "AccessToken":
+        """
+        Normalize what a partner returns when fetching a token
+
+        Args:
+            response: raw access token, token endpoint json response or
+                AccessToken
+            default_lifetime: lifetime in seconds used when the response
+                does not tell it
+
+        Returns:
+            the access token
+        """
+        if isinstance(response, AccessToken):
+            return response
+        if isinstance(response, Mapping):
+            token = response["access_token"]
+            expires_in = response.get("expires_in")
+        else:
+            token, expires_in = response, None
+        if not token:
+            raise ValueError("Empty access token")
+
+        now = time.time()
+        if expires_in is not None:
+            return cls(access_token=token, expires_at=now + float(expires_in))
+        expires_at = cls._jwt_expiry(token)
+        if expires_at is None and default_lifetime is not None:
+            expires_at = now + default_lifetime
+        return cls(access_token=token, expires_at=expires_at)
+
+    @staticmethod
+    def _jwt_expiry(token: str) -> float | None:
+        # opaque tokens are common, the exp claim is only a hint
+        try:
+            payload = jwt.decode(token, options={"verify_signature": False})
+        except jwt.PyJWTError:
+            return None
+        exp = payload.get("exp")
+        return float(exp) if exp is not None else None
+
+    def expires_within(self, seconds: float) -> bool:
+        if self.expires_at is None:
+            return False
+        return self.expires_at - time.time() <= seconds
+
+
+class TokenBackend(abc.ABC):
+    """Storage of the access tokens. Implement it to share tokens
+    across worker processes"""
+
+    @abc.abstractmethod
+    async def get(self, key: TokenKey) -> AccessToken | None:
+        ...
+
+    @abc.abstractmethod
+    async def set(self, key: TokenKey, token: AccessToken) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, key: TokenKey) -> None:
+        ...
+
+
+class InMemoryTokenBackend(TokenBackend):
+    def __init__(self):
+        self._tokens: Dict[TokenKey, AccessToken] = {}
+
+    async def get(self, key: TokenKey) -> AccessToken | None:
+        return self._tokens.get(key)
+
+    async def set(self, key: TokenKey, token: AccessToken) -> None:
+        self._tokens[key] = token
+
+    async def delete(self, key: TokenKey) -> None:
+        self._tokens.pop(key, None)
+
+
+class AiocacheTokenBackend(TokenBackend):
+    """
+    Backend on top of an aiocache cache (e.g. RedisCache, MemcachedCache)
+    allowing several processes to share the same tokens
+    """
+
+    def __init__(self, cache: Any, namespace: str = "smart-on-fhir-token"):
+        self._cache = cache
+        self._namespace = namespace
+
+    def _key(self, key: TokenKey) -> str:
+        return ":".join((self._namespace, *key))
+
+    async def get(self, key: TokenKey) -> AccessToken | None:
+        value = await self._cache.get(self._key(key))
+        return AccessToken.parse_obj(value) if value is not None else None
+
+    async def set(self, key: TokenKey, token: AccessToken) -> None:
+        ttl = (
+            max(int(token.expires_at - time.time()), 1)
+            if token.expires_at is not None
+            else None
+        )
+        await self._cache.set(self._key(key), token.dict(), ttl=ttl)
+
+    async def delete(self, key: TokenKey) -> None:
+        await self._cache.delete(self._key(key))
+
+
+class TokenStore:
+    """
+    Access tokens keyed by (partner, strategy, organization).
+
+    Tokens are refreshed `refresh_margin` seconds before their expiry and
+    concurrent refreshes of the same key collapse into a single call to
+    the token endpoint.
+    """
+
+    def __init__(self, backend: TokenBackend | None = None, refresh_margin: float = 60):
+        self._backend = backend or InMemoryTokenBackend()
+        self.refresh_margin = refresh_margin
+        self._locks: Dict[TokenKey, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    @property
+    def backend(self) -> TokenBackend:
+        return self._backend
+
+    @staticmethod
+    def key_for(partner, strategy, organization=None) -> TokenKey:
+        return (
+            partner.name,
+            strategy.name if strategy is not None else "",
+            organization.slug if organization is not None else "",
+        )
+
+    def _is_usable(self, token: AccessToken | None, stale: str | None) -> bool:
+        return (
+            token is not None
+            and token.access_token != stale
+            and not token.expires_within(self.refresh_margin)
+        )
+
+    async def get(
+        self,
+        key: TokenKey,
+        fetch: Callable[[], Awaitable[Any]],
+        *,
+        stale: str | None = None,
+        default_lifetime: int | None = None,
+    ) -> AccessToken:
+        """
+        Get a valid token for the key, fetching a new one if needed
+
+        Args:
+            key: token key
+            fetch: coroutine function requesting a new token
+            stale: token known as rejected by the server, it will not be
+                returned again
+            default_lifetime: lifetime of tokens without any expiry information
+
+        Returns:
+            the access token
+        """
+        token = await self._backend.get(key)
+        if self._is_usable(token, stale):
+            return token
+
+        async with self._locks[key]:
+            # another coroutine may have refreshed it while we were waiting
+            token = await self._backend.get(key)
+            if self._is_usable(token, stale):
+                return token
+            logger.debug(f"Refreshing access token for {key=}")
+            token = AccessToken.from_response(
+                await fetch(), default_lifetime=default_lifetime
+            )
+            await self._backend.set(key, token)
+            return token
+
+    async def invalidate(self, key: TokenKey) -> None:
+        await self._backend.delete(key)
@@ -0,0 +1,183 @@
+import abc
+from contextlib import asynccontextmanager
+from typing import Any, AsyncContextManager, AsyncIterator, Dict, Mapping
+
+from loguru import logger
+from yarl import URL
+
+from smart_on_fhir_client.connection import ConnectionPool
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+
+class TransportStream(abc.ABC):
+    """Body of a response, decompressed while downloaded"""
+
+    @abc.abstractmethod
+    def iter_chunked(self, n: int) -> AsyncIterator[bytes]:
+        ...
+
+
+class TransportResponse(abc.ABC):
+    """Response of a transport, the subset of the aiohttp response used by
+    the fhir client"""
+
+    status: int
+    headers: Mapping[str, str]
+    content: TransportStream
+
+    @abc.abstractmethod
+    async def read(self) -> bytes:
+        ...
+
+    async def text(self) -> str:
+        return (await self.read()).decode("utf-8", errors="replace")
+
+
+class Transport(abc.ABC):
+    """Sends the requests of the fhir clients"""
+
+    @abc.abstractmethod
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Dict[str, str],
+        data: Any = None,
+        json: Any = None,
+    ) -> AsyncContextManager[TransportResponse]:
+        """
+        Send a request
+
+        Args:
+            method: http method
+            url: absolute url
+            headers: request headers
+            data: form encoded body
+            json: json body
+
+        Returns:
+            a context manager of the response
+        """
+        ...
+
+    async def close(self):
+        ...
+
+
+class AiohttpTransport(Transport):
+    """HTTP/1.1 requests with the aiohttp sessions of a connection pool"""
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    def request(self, method, url, *, headers, data=None, json=None):
+        # aiohttp responses already have the expected interface
+        return self.pool.session_for(url).request(
+            method, url, headers=headers, data=data, json=json
+        )
+
+
+class _HttpxStream(TransportStream):
+    def __init__(self, response: "httpx.Response"):
+        self._response = response
+
+    def iter_chunked(self, n: int) -> AsyncIterator[bytes]:
+        return self._response.aiter_bytes(n)
+
+
+class _HttpxResponse(TransportResponse):
+    def __init__(self, response: "httpx.Response"):
+        self._response = response
+        self.status = response.status_code
+        self.headers = response.headers
+        self.content = _HttpxStream(response)
+
+    async def read(self) -> bytes:
+        return await self._response.aread()
+
+
+class HttpxTransport(Transport):
+    """
+    Requests sent with httpx, over HTTP/2 when the server supports it: the
+    concurrent requests to a server are multiplexed over a few connections
+    instead of opening one connection per request. Requires the httpx and h2
+    packages (`http2` extra).
+    """
+
+    def __init__(
+        self,
+        http2: bool = True,
+        max_connections: int = 10,
+        max_keepalive_connections: int | None = None,
+        keepalive_expiry: float = 30.0,
+        timeout: float | None = 300.0,
+        prior_knowledge: bool = False,
+        transport: "httpx.AsyncBaseTransport | None" = None,
+    ):
+        """
+
+        Args:
+            http2: negotiate HTTP/2 (with tls alpn)
+            max_connections: connections by fhir server, each one carrying
+                many concurrent HTTP/2 streams
+            max_keepalive_connections: idle connections kept alive, defaults
+                to max_connections
+            keepalive_expiry: seconds an idle connection is kept alive
+            timeout: request timeout in seconds
+            prior_knowledge: speak HTTP/2 over plain http connections (h2c),
+                for servers known to support it
+            transport: httpx transport of the clients, e.g. a mock transport
+                in tests
+        """
+        if httpx is None:
+            raise ImportError("httpx is required, install smart-on-fhir-client[http2]")
+        self._options = dict(
+            http1=not prior_knowledge,
+            http2=http2 or prior_knowledge,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections or max_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=timeout,
+            transport=transport,
+        )
+        self._clients: Dict[str, "httpx.AsyncClient"] = {}
+
+    def _client_for(self, url: str) -> "httpx.AsyncClient":
+        key = str(URL(url).origin())
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            logger.debug("Creating httpx client for {}", key)
+            client = self._clients[key] = httpx.AsyncClient(**self._options)
+        return client
+
+    @asynccontextmanager
+    async def request(self, method, url, *, headers, data=None, json=None):
+        client = self._client_for(url)
+        # httpx only takes forms as data, raw bodies (e.g. gzipped json) as
+        # content
+        body = (
+            dict(content=data)
+            if isinstance(data, (bytes, bytearray, str))
+            else dict(data=data)
+        )
+        request = client.build_request(method, url, headers=headers, json=json, **body)
+        response = await client.send(request, stream=True)
+        try:
+            yield _HttpxResponse(response)
+        finally:
+            await response.aclose()
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def __len__(self):
+        return len(self._clients)
@@ -1,25 +1,44 @@
-from typing import Dict, Any, Mapping
+import json
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Any, Mapping
 
 import jwt
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey, RSAPublicKey
 from jwt import DecodeError
 from jwt.algorithms import RSAAlgorithm
 
+if TYPE_CHECKING:
+    from smart_on_fhir_client.jwks import VerifiedTokenCache
+
 
 def mixin(cls):
     return cls
 
 
+@lru_cache(maxsize=128)
+def _public_key(jwk: str) -> RSAPublicKey:
+    # parsing a jwk is much slower than verifying a signature
+    return RSAAlgorithm.from_jwk(jwk)
+
+
 def check_id_token(
     id_token: str,
     *,
     key: str | Mapping | RSAPrivateKey | RSAPublicKey,
     issuer: str,
     audience: str,
+    cache: "VerifiedTokenCache | None" = None,
 ) -> Dict[str, Any]:
     # see google
-    if isinstance(key, (str, Mapping)):
-        public_key = RSAAlgorithm.from_jwk(key)
+    if cache is not None:
+        cache_key = cache.key_for(id_token, issuer, audience)
+        payload = cache.get(cache_key)
+        if payload is not None:
+            return payload
+    if isinstance(key, str):
+        public_key = _public_key(key)
+    elif isinstance(key, Mapping):
+        public_key = _public_key(json.dumps(key, sort_keys=True))
     else:
         public_key = key
     opts = dict(verify_exp=True, verify_aud=True)
@@ -35,4 +54,6 @@ def check_id_token(
     except:
         raise DecodeError("Error decoding jwt token")
     else:
+        if cache is not None:
+            cache.set(cache_key, payload)
         return payload
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from smart_on_fhir_client.client import SmartOnFhirBuilderFactory
+from smart_on_fhir_client.partner import Partner
+from smart_on_fhir_client.requester.fhir_requester import FhirContextManager
+from smart_on_fhir_client.strategy import Strategy
+
+
+class FakePartner(Partner):
+    name: str = "P"
+    supported_strategies: set = {Strategy.M2M}
+
+    async def get_access_token_for_m2m(self, session, **kwargs):
+        return "token"
+
+    async def get_key_as_json(self, session):
+        ...
+
+
+@pytest.fixture
+def make_partner():
+    """FakePartner with the given fields, e.g. a rate_limit"""
+
+    def make(**fields) -> FakePartner:
+        return FakePartner(**{"fhir_url": "http://fhir.example.org/fhir", **fields})
+
+    return make
+
+
+@pytest.fixture
+def with_requester(make_partner):
+    """
+    Run a coroutine function given the requester of a partner whose fhir
+    server is served by the given aiohttp handlers, by (method, path). The
+    target server of the partner is served under `/own`.
+    """
+
+    def run(routes, use, **partner_fields):
+        async def main():
+            app = web.Application()
+            for (method, path), handler in routes.items():
+                app.router.add_route(method, path, handler)
+            async with TestServer(app) as server:
+                manager = FhirContextManager(str(server.make_url("/own")))
+                factory = SmartOnFhirBuilderFactory()
+                async with factory:
+                    partner = make_partner(
+                        fhir_url=str(server.make_url("/fhir")), **partner_fields
+                    )
+                    await manager.register_partner_async(
+                        factory.builder()
+                        .for_partner(partner)
+                        .for_strategy(Strategy.M2M)
+                    )
+                    return await use(manager.P)
+
+        return asyncio.run(main())
+
+    return run
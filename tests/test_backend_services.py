@@ -0,0 +1,143 @@
+import asyncio
+import time
+from urllib.parse import parse_qs
+
+import jwt
+import pytest
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import (
+    Encoding,
+    NoEncryption,
+    PrivateFormat,
+)
+from jwt.algorithms import RSAAlgorithm
+
+from smart_on_fhir_client.backend_services import (
+    CLIENT_ASSERTION_TYPE,
+    BackendServicesPartner,
+    ClientAssertionPool,
+)
+
+TOKEN_URL = "https://auth.example.org/token"
+PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+PEM = PRIVATE_KEY.private_bytes(
+    Encoding.PEM, PrivateFormat.PKCS8, NoEncryption()
+).decode()
+
+
+def _decode(assertion, audience=TOKEN_URL):
+    return jwt.decode(
+        assertion, PRIVATE_KEY.public_key(), algorithms=["RS384"], audience=audience
+    )
+
+
+def test_assertion_claims_and_signature():
+    pool = ClientAssertionPool("client", TOKEN_URL, PEM, key_id="k1", lifetime=120)
+    assertion, expires_at = pool.sign()
+    claims = _decode(assertion)
+    assert claims["iss"] == claims["sub"] == "client"
+    assert claims["aud"] == TOKEN_URL
+    assert claims["exp"] == expires_at == claims["iat"] + 120
+    assert jwt.get_unverified_header(assertion)["kid"] == "k1"
+
+
+def test_public_jwk_verifies_the_assertions():
+    pool = ClientAssertionPool("client", TOKEN_URL, PRIVATE_KEY, key_id="k1")
+    jwk = pool.public_jwk()
+    assert jwk["kid"] == "k1" and jwk["alg"] == "RS384" and jwk["use"] == "sig"
+    assertion, _ = pool.sign()
+    jwt.decode(
+        assertion, RSAAlgorithm.from_jwk(jwk), algorithms=["RS384"], audience=TOKEN_URL
+    )
+
+
+def test_assertions_are_used_once():
+    async def run():
+        pool = ClientAssertionPool("client", TOKEN_URL, PRIVATE_KEY, size=4)
+        pool.refill()
+        await pool._refill
+        assert len(pool._assertions) == 4
+        # more concurrent requests than signed assertions
+        assertions = await asyncio.gather(*(pool.get() for _ in range(10)))
+        pool.refill()
+        await pool._refill
+        assertions += await asyncio.gather(*(pool.get() for _ in range(4)))
+        await pool.close()
+        return assertions
+
+    assertions = asyncio.run(run())
+    assert len({_decode(assertion)["jti"] for assertion in assertions}) == 14
+
+
+def test_refill_runs_in_the_background():
+    async def run():
+        pool = ClientAssertionPool("client", TOKEN_URL, PRIVATE_KEY, size=3)
+        pool.refill()
+        # not signed yet, get does not wait for the refill
+        assertion = await pool.get()
+        await pool._refill
+        filled = len(pool._assertions)
+        # a refill already running is not started twice
+        pool._assertions.clear()
+        pool.refill()
+        running = pool._refill
+        pool.refill()
+        assert pool._refill is running
+        await pool.close()
+        return assertion, filled
+
+    assertion, filled = asyncio.run(run())
+    assert _decode(assertion)["iss"] == "client"
+    assert filled == 3
+
+
+def test_assertions_near_expiry_are_discarded():
+    async def run():
+        pool = ClientAssertionPool("client", TOKEN_URL, PRIVATE_KEY, lifetime=100)
+        now = time.time()
+        pool._assertions.extend([("expired", now + 10), ("half", now + 49)])
+        fresh, expires_at = pool.sign()
+        pool._assertions.append((fresh, expires_at))
+        return await pool.get(), len(pool._assertions)
+
+    assertion, remaining = asyncio.run(run())
+    assert assertion != "expired" and assertion != "half"
+    assert _decode(assertion)["iss"] == "client"
+    assert remaining == 0
+
+
+@pytest.mark.parametrize("scope", [None, "system/Patient.read"])
+def test_token_request_form(scope):
+    forms = []
+
+    async def token(request):
+        forms.append(parse_qs(await request.text()))
+        return web.json_response({"access_token": "token", "expires_in": 300})
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/token", token)
+        async with TestServer(app) as server, ClientSession() as session:
+            url = str(server.make_url("/token"))
+            partner = BackendServicesPartner(
+                name="B",
+                client_id="client",
+                token_url=url,
+                fhir_url=str(server.make_url("/fhir")),
+                private_key=PEM,
+                scope="system/*.read",
+            )
+            response = await partner.get_access_token_for_m2m(session, scope=scope)
+            await partner.assertions.close()
+            return url, response
+
+    url, response = asyncio.run(run())
+    assert response["access_token"] == "token"
+    (form,) = forms
+    assert form["grant_type"] == ["client_credentials"]
+    assert form["scope"] == [scope or "system/*.read"]
+    assert form["client_assertion_type"] == [CLIENT_ASSERTION_TYPE]
+    (assertion,) = form["client_assertion"]
+    assert _decode(assertion, audience=url)["sub"] == "client"
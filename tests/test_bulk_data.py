@@ -0,0 +1,241 @@
+import asyncio
+import json
+import time
+
+import pytest
+from aiohttp import web
+from fhirpy.base.exceptions import OperationOutcome
+
+from smart_on_fhir_client.bulk_data import (
+    BulkDataError,
+    ExportLevel,
+    export_params,
+    export_path,
+    iter_lines,
+)
+
+PATIENTS = [{"resourceType": "Patient", "id": str(i)} for i in range(3)]
+OBSERVATIONS = [{"resourceType": "Observation", "id": str(i)} for i in range(2)]
+
+
+def _ndjson(resources):
+    return "".join(json.dumps(resource) + "\n" for resource in resources).encode()
+
+
+def _manifest(request, files):
+    base = request.url.with_path("/files").with_query(None)
+    return {
+        "transactionTime": "2024-01-01T00:00:00Z",
+        "request": "http://x/fhir/$export",
+        "requiresAccessToken": True,
+        "output": [
+            {"type": resource_type, "url": f"{base}/{name}"}
+            for resource_type, name in files
+        ],
+    }
+
+
+class _ExportServer:
+    """kick off, status and file endpoints of a bulk data export"""
+
+    def __init__(self, files, pending_polls=0, retry_after="0.05", failing=()):
+        self.files = files
+        self.pending_polls = pending_polls
+        self.retry_after = retry_after
+        self.failing = failing
+        self.kick_offs = []
+        self.polls = []
+        self.downloads = []
+
+    @property
+    def routes(self):
+        return {
+            ("GET", "/fhir/$export"): self.kick_off,
+            ("GET", "/status/1"): self.status,
+            ("GET", "/files/{name}"): self.file,
+        }
+
+    async def kick_off(self, request):
+        self.kick_offs.append(request)
+        location = str(request.url.with_path("/status/1").with_query(None))
+        return web.Response(status=202, headers={"Content-Location": location})
+
+    async def status(self, request):
+        self.polls.append(time.monotonic())
+        if len(self.polls) <= self.pending_polls:
+            return web.Response(
+                status=202,
+                headers={"Retry-After": self.retry_after, "X-Progress": "50%"},
+            )
+        return web.json_response(_manifest(request, self.files))
+
+    async def file(self, request):
+        name = request.match_info["name"]
+        self.downloads.append((name, request.headers.get("Authorization")))
+        if name in self.failing:
+            return web.Response(status=500, text="broken file")
+        body = _ndjson(PATIENTS if name.startswith("patient") else OBSERVATIONS)
+        response = web.StreamResponse()
+        await response.prepare(request)
+        # a line split over two chunks
+        middle = len(body) // 2 + 3
+        await response.write(body[:middle])
+        await asyncio.sleep(0.01)
+        await response.write(body[middle:])
+        await response.write_eof()
+        return response
+
+
+def test_kick_off_returns_the_status_url(with_requester):
+    server = _ExportServer([])
+
+    async def kick_off(requester):
+        return await requester._client.bulk_export(
+            types=["Patient", "Observation"], since="2024-01-01"
+        )
+
+    export = with_requester(server.routes, kick_off)
+    assert export.status_url.endswith("/status/1")
+    request = server.kick_offs[0]
+    assert request.headers["Prefer"] == "respond-async"
+    assert request.query["_type"] == "Patient,Observation"
+    assert request.query["_since"] == "2024-01-01"
+    assert request.query["_outputFormat"] == "application/fhir+ndjson"
+
+
+def test_rejected_kick_off(with_requester):
+    async def rejected(request):
+        return web.json_response(
+            {
+                "resourceType": "OperationOutcome",
+                "issue": [{"severity": "error", "code": "not-supported"}],
+            },
+            status=400,
+        )
+
+    async def kick_off(requester):
+        with pytest.raises(OperationOutcome):
+            await requester._client.bulk_export()
+
+    with_requester({("GET", "/fhir/$export"): rejected}, kick_off)
+
+
+def test_wait_honours_retry_after(with_requester):
+    server = _ExportServer([("Patient", "patient.ndjson")], pending_polls=2)
+
+    async def wait(requester):
+        export = await requester._client.bulk_export(poll_interval=10)
+        return await export.wait(timeout=5)
+
+    manifest = with_requester(server.routes, wait)
+    assert [file.type for file in manifest.output] == ["Patient"]
+    assert len(server.polls) == 3
+    # Retry-After of 50ms used instead of the poll interval of 10s
+    delays = [b - a for a, b in zip(server.polls, server.polls[1:])]
+    assert all(0.04 <= delay < 1 for delay in delays)
+
+
+def test_wait_stops_at_timeout(with_requester):
+    server = _ExportServer([], pending_polls=100, retry_after="1")
+
+    async def wait(requester):
+        export = await requester._client.bulk_export()
+        start = time.monotonic()
+        with pytest.raises(BulkDataError):
+            await export.wait(timeout=0.5)
+        return time.monotonic() - start
+
+    elapsed = with_requester(server.routes, wait)
+    # the second poll would happen after the timeout: not waited for
+    assert elapsed < 0.5
+    assert len(server.polls) == 1
+
+
+FILES = [
+    ("Patient", "patient-1.ndjson"),
+    ("Patient", "patient-2.ndjson"),
+    ("Observation", "observation.ndjson"),
+]
+
+
+def _key(resource):
+    return resource["resourceType"], resource["id"]
+
+
+def test_stream_raw_resources(with_requester):
+    server = _ExportServer(FILES)
+
+    async def stream(requester):
+        export = await requester._client.bulk_export()
+        return [resource async for resource in export.stream(raw=True)]
+
+    resources = with_requester(server.routes, stream)
+    assert sorted(resources, key=_key) == sorted(PATIENTS * 2 + OBSERVATIONS, key=_key)
+    # files requiring an access token are downloaded with it
+    assert all(authorization == "Bearer token" for _, authorization in server.downloads)
+
+
+def test_stream_resources_of_some_types(with_requester):
+    server = _ExportServer(FILES)
+
+    async def stream(requester):
+        export = await requester._client.bulk_export()
+        return [
+            resource
+            async for resource in export.stream(["Patient"], max_concurrent_downloads=1)
+        ]
+
+    resources = with_requester(server.routes, stream)
+    assert len(resources) == 6
+    assert {resource.resource_type for resource in resources} == {"Patient"}
+    assert sorted(name for name, _ in server.downloads) == [
+        "patient-1.ndjson",
+        "patient-2.ndjson",
+    ]
+
+
+def test_download_error_raised_to_the_consumer(with_requester):
+    server = _ExportServer(FILES, failing=("observation.ndjson",))
+
+    async def stream(requester):
+        export = await requester._client.bulk_export()
+        with pytest.raises(OperationOutcome, match="broken file"):
+            async for _ in export.stream(raw=True):
+                pass
+
+    with_requester(server.routes, stream)
+
+
+class _Content:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def iter_chunked(self, size):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def test_iter_lines_joins_split_lines():
+    async def lines():
+        content = _Content([b'{"a": 1}\n{"b"', b": 2}\n\n", b'{"c": 3}'])
+        return [line async for line in iter_lines(content)]
+
+    assert asyncio.run(lines()) == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+
+def test_export_path():
+    assert export_path(ExportLevel.SYSTEM) == "$export"
+    assert export_path(ExportLevel.PATIENT) == "Patient/$export"
+    assert export_path(ExportLevel.GROUP, "g1") == "Group/g1/$export"
+    with pytest.raises(ValueError):
+        export_path(ExportLevel.GROUP)
+
+
+def test_export_params():
+    assert export_params() == {"_outputFormat": "application/fhir+ndjson"}
+    assert export_params(["Patient"], "2024", ["Patient?active=true"]) == {
+        "_outputFormat": "application/fhir+ndjson",
+        "_type": "Patient",
+        "_since": "2024",
+        "_typeFilter": "Patient?active=true",
+    }
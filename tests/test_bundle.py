@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+from fhirpy.base.exceptions import OperationOutcome
+
+from smart_on_fhir_client.client import SmartOnFhirClient
+from smart_on_fhir_client.requester.bundle import failed_outcomes, parse_response
+
+
+def _resources(n):
+    return [SimpleNamespace(resource_type="Patient", id=str(i)) for i in range(n)]
+
+
+def test_parse_response_matches_entries_in_order():
+    response = {
+        "entry": [
+            {"response": {"status": "201 Created", "location": "Patient/a/_history/1"}},
+            {"response": {"status": "200 OK", "location": "Patient/b/_history/2"}},
+        ]
+    }
+    outcomes = parse_response(_resources(2), response)
+    assert [o.source_id for o in outcomes] == ["0", "1"]
+    assert [o.location for o in outcomes] == [
+        "Patient/a/_history/1",
+        "Patient/b/_history/2",
+    ]
+    assert all(o.ok for o in outcomes)
+
+
+def test_parse_response_fails_resources_without_entry():
+    response = {"entry": [{"response": {"status": "201 Created"}}]}
+    outcomes = parse_response(_resources(3), response)
+    assert len(outcomes) == 3
+    assert outcomes[0].ok
+    assert [o.source_id for o in outcomes[1:]] == ["1", "2"]
+    assert not any(o.ok for o in outcomes[1:])
+    assert outcomes[1].outcome["resourceType"] == "OperationOutcome"
+
+
+def test_failed_outcomes_of_network_error():
+    outcomes = failed_outcomes(_resources(2), ConnectionResetError("reset"))
+    assert [o.status for o in outcomes] == ["500", "500"]
+    assert "reset" in outcomes[0].outcome["issue"][0]["diagnostics"]
+
+
+def test_failed_outcomes_of_rejected_bundle():
+    error = OperationOutcome(resource={"resourceType": "OperationOutcome"})
+    outcomes = failed_outcomes(_resources(1), error)
+    assert outcomes[0].status == "400"
+    assert outcomes[0].outcome == {"resourceType": "OperationOutcome"}
+
+
+def test_system_interactions_posted_to_base_url():
+    client = SmartOnFhirClient("http://fhir.example.org/fhir/")
+    assert client._build_request_url("", None) == "http://fhir.example.org/fhir"
+    assert client._build_request_url("Patient", {"_count": 1}).startswith(
+        "http://fhir.example.org/fhir/Patient?"
+    )
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from smart_on_fhir_client.client import SmartOnFhirBuilderFactory, SmartOnFhirClient
+from smart_on_fhir_client.coalescing import RequestCoalescer
+
+KEY = ("GET", "Organization/1")
+
+
+def _request(calls, result=None, error=None):
+    async def request():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if error is not None:
+            raise error
+        return result if result is not None else {"resourceType": "Organization"}
+
+    return request
+
+
+def test_identical_requests_share_one_request():
+    calls = []
+    result = {"resourceType": "Organization", "name": "x"}
+
+    async def run():
+        coalescer = RequestCoalescer()
+        request = _request(calls, result)
+        results = await asyncio.gather(*(coalescer.run(KEY, request) for _ in range(5)))
+        return coalescer, results
+
+    coalescer, results = asyncio.run(run())
+    assert len(calls) == 1
+    assert (coalescer.metrics.sent, coalescer.metrics.coalesced) == (1, 4)
+    # the result of the request sent is not copied, the other ones are
+    assert results[0] is result
+    assert all(r == result and r is not result for r in results[1:])
+    assert len({id(r) for r in results}) == 5
+    assert len(coalescer) == 0
+
+
+def test_error_shared_by_waiting_requests():
+    calls = []
+
+    async def run():
+        coalescer = RequestCoalescer()
+        request = _request(calls, error=ValueError("bad"))
+        return await asyncio.gather(
+            *(coalescer.run(KEY, request) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_request_sent_again_when_sent_request_cancelled():
+    calls = []
+
+    async def run():
+        coalescer = RequestCoalescer()
+        request = _request(calls)
+        first = asyncio.create_task(coalescer.run(KEY, request))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(coalescer.run(KEY, request))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == {"resourceType": "Organization"}
+    assert len(calls) == 2
+
+
+def test_cancelled_waiting_request_does_not_cancel_others():
+    calls = []
+
+    async def run():
+        coalescer = RequestCoalescer()
+        request = _request(calls)
+        first = asyncio.create_task(coalescer.run(KEY, request))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(coalescer.run(KEY, request))
+        await asyncio.sleep(0)
+        second.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        return await first
+
+    assert asyncio.run(run()) == {"resourceType": "Organization"}
+    assert len(calls) == 1
+
+
+def test_not_coalesced_when_disabled():
+    assert RequestCoalescer(enabled=False).key_for("GET", "Patient/1") is None
+
+
+def test_coalescing_opt_in():
+    assert not SmartOnFhirClient("http://fhir.example.org").request_coalescer.enabled
+
+    async def run():
+        factory = SmartOnFhirBuilderFactory()
+        async with factory:
+            return (
+                factory.builder()._request_coalescing,
+                factory.builder().with_request_coalescing()._request_coalescing,
+            )
+
+    assert asyncio.run(run()) == (False, True)
+
+
+def test_client_keeps_empty_coalescer():
+    coalescer = RequestCoalescer()
+    client = SmartOnFhirClient("http://fhir.example.org", request_coalescer=coalescer)
+    assert client.request_coalescer is coalescer
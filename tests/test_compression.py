@@ -0,0 +1,52 @@
+import json
+
+import pytest
+from aiohttp import web
+
+from smart_on_fhir_client.compression import CompressionOptions
+
+BUNDLE = {"resourceType": "Bundle", "type": "searchset", "total": 0}
+
+
+def test_streams_large_responses_only():
+    options = CompressionOptions(stream_threshold=100)
+    assert options.streams("100")
+    assert not options.streams("99")
+    assert not options.streams(None)
+    assert CompressionOptions(stream_chunked=True).streams(None)
+    assert not CompressionOptions(stream_threshold=None).streams("1000000")
+
+
+async def _chunked(request):
+    response = web.StreamResponse()
+    response.enable_chunked_encoding()
+    response.content_type = "application/json"
+    await response.prepare(request)
+    body = json.dumps(BUNDLE).encode()
+    await response.write(body[:10])
+    await response.write(body[10:])
+    await response.write_eof()
+    return response
+
+
+@pytest.mark.parametrize("stream_chunked", [False, True])
+def test_chunked_response_streamed_on_opt_in(with_requester, stream_chunked):
+    streamed = []
+
+    async def search(requester):
+        client = requester._client
+        client.compression = client.compression.copy(
+            update={"stream_chunked": stream_chunked}
+        )
+        decode_stream = client._decode_stream
+
+        async def spy(r, attributes):
+            streamed.append(r.headers.get("Transfer-Encoding"))
+            return await decode_stream(r, attributes)
+
+        client._decode_stream = spy
+        return await client._do_request("GET", "Patient")
+
+    result = with_requester({("GET", "/fhir/Patient"): _chunked}, search)
+    assert result == BUNDLE
+    assert streamed == (["chunked"] if stream_chunked else [])
@@ -0,0 +1,38 @@
+import asyncio
+
+from smart_on_fhir_client.client import SmartOnFhirBuilderFactory, SmartOnFhirClient
+from smart_on_fhir_client.connection import ConnectionPool, ConnectionPoolOptions
+
+
+def test_dedicated_pool_closed_with_factory():
+    async def run():
+        factory = SmartOnFhirBuilderFactory()
+        async with factory:
+            builder = factory.builder().with_connection_pool(
+                ConnectionPoolOptions(limit=5)
+            )
+            session = builder.pool.session_for("http://fhir.example.org/fhir")
+            assert not session.closed
+        assert session.closed
+        assert len(builder.pool) == 0
+
+    asyncio.run(run())
+
+
+def test_given_pool_left_to_its_owner():
+    async def run():
+        pool = ConnectionPool()
+        factory = SmartOnFhirBuilderFactory()
+        async with factory:
+            factory.builder().with_connection_pool(pool)
+            session = pool.session_for("http://fhir.example.org/fhir")
+        assert not session.closed
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_client_uses_its_dedicated_pool():
+    pool = ConnectionPool()
+    client = SmartOnFhirClient("http://fhir.example.org/fhir", pool=pool)
+    assert client.pool is pool
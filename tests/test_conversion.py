@@ -0,0 +1,81 @@
+import json
+
+import pytest
+from aiohttp import web
+from fhir.resources.patient import Patient
+from pydantic import ValidationError
+
+from smart_on_fhir_client.requester.conversion import (
+    construct,
+    dump,
+    to_model,
+    validated,
+)
+
+PATIENT = {
+    "resourceType": "Patient",
+    "id": "p1",
+    "meta": {"lastUpdated": "2023-01-02T03:04:05+00:00"},
+    "identifier": [{"system": "urn:x", "value": "1"}],
+    "active": True,
+    "name": [{"family": "Doe", "given": ["John", "Jim"]}],
+    "gender": "male",
+    "birthDate": "1970-01-02",
+    "_birthDate": {
+        "extension": [{"url": "urn:time", "valueTime": "10:11:12"}],
+    },
+    "contained": [{"resourceType": "Organization", "id": "o1", "name": "Org"}],
+    "managingOrganization": {"reference": "#o1"},
+}
+
+
+def test_construct_builds_nested_models():
+    patient = construct(Patient, PATIENT)
+    assert patient.name[0].given == ["John", "Jim"]
+    assert type(patient.contained[0]).__name__ == "Organization"
+    # kept as sent
+    assert patient.birthDate == "1970-01-02"
+    assert patient.birthDate__ext.extension[0].valueTime == "10:11:12"
+
+
+def test_dump_round_trips():
+    model = Patient(**PATIENT)
+    assert dump(model) == model.dict()
+    assert dump(model, by_alias=False) == model.dict(by_alias=False)
+    # same json as the validated model
+    assert dump(construct(Patient, PATIENT)) == json.loads(model.json())
+
+
+def test_invalid_field_accepted_only_without_validation():
+    data = {**PATIENT, "birthDate": "someday"}
+    patient = to_model(Patient, data, validate=False)
+    assert patient.birthDate == "someday"
+    with pytest.raises(ValidationError):
+        to_model(Patient, data)
+    with pytest.raises(ValidationError):
+        validated(patient)
+    assert validated(to_model(Patient, PATIENT, validate=False)) == Patient(**PATIENT)
+
+
+@pytest.mark.parametrize("validate", [True, False])
+def test_search_returns_models_built_without_validation(with_requester, validate):
+    async def search(request):
+        return web.json_response(
+            {
+                "resourceType": "Bundle",
+                "type": "searchset",
+                "entry": [{"resource": {**PATIENT, "birthDate": "someday"}}],
+            }
+        )
+
+    async def use(requester):
+        requester._client.validate_models = validate
+        if validate:
+            with pytest.raises(ValidationError):
+                await requester.Patient.search().fetch(return_as=Patient)
+            return None
+        return await requester.Patient.search().fetch(return_as=Patient)
+
+    patients = with_requester({("GET", "/fhir/Patient"): search}, use)
+    if not validate:
+        assert [p.birthDate for p in patients] == ["someday"]
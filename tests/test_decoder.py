@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from smart_on_fhir_client.decoder import (
+    AttrDictJsonDecoder,
+    StreamingDecoder,
+    default_decoder,
+)
+
+BUNDLE = {
+    "resourceType": "Bundle",
+    "type": "searchset",
+    "link": [{"relation": "next", "url": "http://x/fhir/Patient?page=2"}],
+    "entry": [
+        {
+            "fullUrl": f"http://x/fhir/Patient/{i}",
+            "resource": {
+                "resourceType": "Patient",
+                "id": str(i),
+                # brackets and escaped quotes inside strings
+                "name": [{"text": 'a "quoted" [name] {with} brackets \\'}],
+            },
+        }
+        for i in range(20)
+    ],
+    "total": 20,
+}
+
+
+def _stream(document, chunk_size, decoder):
+    data = json.dumps(document).encode()
+    streaming = StreamingDecoder(decoder)
+    entries = []
+    for start in range(0, len(data), chunk_size):
+        entries += streaming.feed(data[start : start + chunk_size])
+    return streaming, entries, streaming.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+@pytest.mark.parametrize("decoder", [AttrDictJsonDecoder(), default_decoder()])
+def test_streamed_bundle_decoded_as_whole(chunk_size, decoder):
+    streaming, entries, document = _stream(BUNDLE, chunk_size, decoder)
+    assert json.loads(json.dumps(document)) == BUNDLE
+    assert document.link[0].url == "http://x/fhir/Patient?page=2"
+    assert document.entry[3].resource.id == "3"
+    assert streaming.size == len(json.dumps(BUNDLE).encode())
+    assert len(entries) <= len(BUNDLE["entry"])
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        {"resourceType": "Patient", "id": "1"},
+        {"resourceType": "Bundle", "entry": []},
+        {"resourceType": "Bundle", "meta": {"entry": [1]}, "total": 0},
+    ],
+)
+def test_documents_without_entries(document):
+    _, entries, decoded = _stream(document, 3, default_decoder())
+    assert json.loads(json.dumps(decoded)) == document
+    assert entries == []
+
+
+def test_truncated_document():
+    data = json.dumps(BUNDLE).encode()
+    streaming = StreamingDecoder(default_decoder())
+    streaming.feed(data[: len(data) // 2])
+    with pytest.raises(ValueError):
+        streaming.close()
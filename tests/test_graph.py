@@ -0,0 +1,193 @@
+from aiohttp import web
+from fhirpy import AsyncFHIRClient
+
+from smart_on_fhir_client.requester.graph import ResourceGraph, target_reference
+
+PATIENT = {"resourceType": "Patient", "id": "p1"}
+ENCOUNTER = {
+    "resourceType": "Encounter",
+    "id": "e1",
+    "subject": {"reference": "Patient/p1"},
+}
+OUTCOME = {
+    "resourceType": "OperationOutcome",
+    "issue": [{"severity": "warning", "code": "processing"}],
+}
+
+
+async def _search(request):
+    return web.json_response(
+        {
+            "resourceType": "Bundle",
+            "type": "searchset",
+            "entry": [
+                {"resource": PATIENT, "search": {"mode": "match"}},
+                {"resource": ENCOUNTER, "search": {"mode": "include"}},
+                {"resource": OUTCOME, "search": {"mode": "outcome"}},
+            ],
+        }
+    )
+
+
+def test_fetch_graph_skips_outcome_entries(with_requester):
+    async def fetch(requester):
+        return (
+            await requester.Patient.search(_id="p1")
+            .revinclude("Encounter", "subject")
+            .fetch_graph()
+        )
+
+    graph = with_requester({("GET", "/fhir/Patient"): _search}, fetch)
+    assert len(graph) == 2
+    assert "Patient/p1" in graph
+    assert "Encounter/e1" in graph
+    assert graph.dependencies("Encounter/e1") == {"Patient/p1"}
+
+
+def _resources():
+    client = AsyncFHIRClient("http://x/fhir")
+    return {
+        "patient": client.resource("Patient", id="p1"),
+        "practitioner": client.resource("Practitioner", id="dr"),
+        "encounter": client.resource(
+            "Encounter",
+            id="e1",
+            subject={"reference": "Patient/p1"},
+            participant=[
+                {"individual": {"reference": "http://x/fhir/Practitioner/dr"}}
+            ],
+        ),
+        "condition": client.resource(
+            "Condition",
+            id="c1",
+            subject={"reference": "Patient/p1"},
+            encounter={"reference": "Encounter/e1"},
+            evidence=[{"detail": [{"reference": "Observation/outside"}]}],
+        ),
+    }
+
+
+def _graph(resources):
+    graph = ResourceGraph(
+        [resources[name] for name in ("condition", "encounter", "patient")]
+    )
+    # referenced by its absolute url, matched on the fullUrl of its entry
+    graph.add(resources["practitioner"], "http://x/fhir/Practitioner/dr")
+    return graph
+
+
+def test_ordered_puts_references_first():
+    graph = _graph(_resources())
+    keys = [f"{r.resource_type}/{r.id}" for r in graph.ordered()]
+    assert len(keys) == 4
+    assert keys.index("Patient/p1") < keys.index("Encounter/e1")
+    assert keys.index("Practitioner/dr") < keys.index("Encounter/e1")
+    assert keys.index("Encounter/e1") < keys.index("Condition/c1")
+    assert graph.dependencies("Condition/c1") == {"Patient/p1", "Encounter/e1"}
+
+
+def test_ordered_breaks_cycles():
+    client = AsyncFHIRClient("http://x/fhir")
+    graph = ResourceGraph(
+        [
+            client.resource(
+                "Patient", id="a", link=[{"other": {"reference": "Patient/b"}}]
+            ),
+            client.resource(
+                "Patient", id="b", link=[{"other": {"reference": "Patient/a"}}]
+            ),
+        ]
+    )
+    assert [r.id for r in graph.ordered()] == ["a", "b"]
+
+
+def test_build_transaction_entries_rewrites_references():
+    resources = _resources()
+    graph = _graph(resources)
+    entries = graph.build_transaction_entries(
+        [resources["encounter"], resources["condition"]],
+        written={"Patient/p1": "Patient/T1", "Practitioner/dr": "Practitioner/T2"},
+    )
+    encounter, condition = (entry["resource"] for entry in entries)
+    assert all(entry["fullUrl"].startswith("urn:uuid:") for entry in entries)
+    assert encounter["subject"] == {"reference": "Patient/T1"}
+    assert encounter["participant"][0]["individual"] == {"reference": "Practitioner/T2"}
+    assert condition["encounter"] == {"reference": entries[0]["fullUrl"]}
+    # outside of the graph
+    assert condition["evidence"][0]["detail"][0] == {"reference": "Observation/outside"}
+    assert "id" not in encounter
+
+
+def test_target_reference():
+    assert target_reference("Patient", "http://t/fhir/Patient/12/_history/1") == (
+        "Patient/12"
+    )
+    assert target_reference("Patient", "Encounter/1") is None
+    assert target_reference("Patient", None) is None
+
+
+async def _search_records(request):
+    resources = [
+        PATIENT,
+        ENCOUNTER,
+        {
+            "resourceType": "Condition",
+            "id": "c1",
+            "encounter": {"reference": "Encounter/e1"},
+        },
+        {"resourceType": "Practitioner", "id": "dr"},
+    ]
+    return web.json_response(
+        {
+            "resourceType": "Bundle",
+            "type": "searchset",
+            "entry": [{"resource": resource} for resource in resources],
+        }
+    )
+
+
+def test_pipe_graph_skips_only_dependents_of_a_failed_transaction(with_requester):
+    sent = []
+
+    async def transaction(request):
+        body = await request.json()
+        (entry,) = body["entry"]
+        resource_type = entry["resource"]["resourceType"]
+        sent.append(resource_type)
+        if resource_type == "Patient":
+            # not an OperationOutcome
+            return web.Response(status=404, text="gone")
+        return web.json_response(
+            {
+                "resourceType": "Bundle",
+                "type": "transaction-response",
+                "entry": [
+                    {
+                        "response": {
+                            "status": "201 Created",
+                            "location": f"{resource_type}/T1/_history/1",
+                        }
+                    }
+                ],
+            }
+        )
+
+    async def pipe(requester):
+        graph = await requester.Patient.search().fetch_graph()
+        return await requester._fhir_manager.pipe_graph_to_target_fhir_server(
+            graph, bundle_size=1
+        )
+
+    outcomes = with_requester(
+        {("GET", "/fhir/Patient"): _search_records, ("POST", "/own/P"): transaction},
+        pipe,
+    )
+    statuses = {f"{o.resource_type}/{o.source_id}": o.status for o in outcomes}
+    assert statuses == {
+        "Patient/p1": "500",
+        "Practitioner/dr": "201 Created",
+        "Encounter/e1": "424",
+        "Condition/c1": "424",
+    }
+    # the independent resource is still written after the failure
+    assert sent == ["Patient", "Practitioner"]
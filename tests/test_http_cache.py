@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from smart_on_fhir_client.http_cache import (
+    CachedResponse,
+    DiskHttpCacheBackend,
+    HttpCache,
+    InMemoryHttpCacheBackend,
+)
+
+URL = "http://fhir.example.org/fhir/Patient/1"
+
+
+def test_entries_scoped_by_credentials():
+    async def run():
+        cache = HttpCache()
+        await cache.store(URL, {"ETag": 'W/"1"'}, b"{}", scope="P/M2M/org-a")
+        return (
+            await cache.lookup(URL, "P/M2M/org-a"),
+            await cache.lookup(URL, "P/M2M/org-b"),
+            await cache.lookup(URL),
+        )
+
+    own, other, unscoped = asyncio.run(run())
+    assert own.etag == 'W/"1"'
+    assert other is None
+    assert unscoped is None
+
+
+def test_response_without_validator_not_stored():
+    async def run():
+        cache = HttpCache()
+        await cache.store(URL, {}, b"{}")
+        return await cache.lookup(URL)
+
+    assert asyncio.run(run()) is None
+
+
+def test_in_memory_backend_bounded_by_bytes():
+    async def run():
+        backend = InMemoryHttpCacheBackend(max_bytes=10)
+        await backend.set("a", CachedResponse(body=b"12345678", stored_at=time.time()))
+        await backend.set("b", CachedResponse(body=b"1234", stored_at=time.time()))
+        return await backend.get("a"), await backend.get("b")
+
+    a, b = asyncio.run(run())
+    assert a is None
+    assert b.body == b"1234"
+
+
+def test_disk_backend(tmp_path):
+    async def run():
+        backend = DiskHttpCacheBackend(tmp_path)
+        await backend.set("a", CachedResponse(body=b"{}", etag="1"))
+        await backend.set("b", CachedResponse(body=b"[]", etag="2"))
+        found = await backend.get("a")
+        await backend.delete("a")
+        deleted = await backend.get("a")
+        await backend.clear()
+        return found, deleted, await backend.get("b")
+
+    found, deleted, cleared = asyncio.run(run())
+    assert (found.body, found.etag) == (b"{}", "1")
+    assert deleted is None
+    assert cleared is None
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,101 @@
+from contextlib import contextmanager
+
+import pytest
+from aiohttp import web
+
+from smart_on_fhir_client import instrumentation
+from smart_on_fhir_client.instrumentation import (
+    REQUEST_DURATION,
+    REQUEST_RETRIES,
+    Instrumentation,
+    OpenTelemetryInstrumentation,
+)
+
+
+class _Span:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = dict(attributes)
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class _Recording(Instrumentation):
+    def __init__(self):
+        self.spans = []
+        self.records = []
+        self.counts = []
+
+    @contextmanager
+    def span(self, name, attributes):
+        span = _Span(name, attributes)
+        self.spans.append(span)
+        try:
+            yield span
+        except Exception as e:
+            span.error = e
+            raise
+
+    def record(self, name, value, attributes):
+        self.records.append((name, value, dict(attributes)))
+
+    def count(self, name, attributes, value=1):
+        self.counts.append((name, value, dict(attributes)))
+
+
+def test_hooks_are_called_once_per_attempt(with_requester):
+    calls = []
+
+    async def read(request):
+        calls.append(1)
+        if len(calls) == 1:
+            return web.json_response(
+                {"resourceType": "OperationOutcome", "issue": []},
+                status=503,
+                headers={"Retry-After": "0"},
+            )
+        return web.json_response({"resourceType": "Patient", "id": "p1"})
+
+    async def use(requester):
+        recording = requester._client.instrumentation = _Recording()
+        await requester._client._do_request("GET", "Patient/p1", params={"x": "1"})
+        return recording, str(requester._client.url)
+
+    recording, base_url = with_requester({("GET", "/fhir/Patient/p1"): read}, use)
+    failed, succeeded = (s for s in recording.spans if s.name == "FHIR GET")
+    for span in (failed, succeeded):
+        assert span.attributes["http.method"] == "GET"
+        assert span.attributes["fhir.resource_type"] == "Patient"
+        assert span.attributes["fhir.partner"] == "P"
+        # without the search parameters
+        assert span.attributes["http.url"] == f"{base_url}/Patient/p1"
+    assert failed.attributes["http.status_code"] == 503
+    assert getattr(failed.error, "status", None) == 503
+    assert succeeded.attributes["http.status_code"] == 200
+    assert succeeded.error is None
+
+    durations = [r for r in recording.records if r[0] == REQUEST_DURATION]
+    assert [r[2]["http.status_code"] for r in durations] == [503, 200]
+    assert all(r[1] >= 0 for r in durations)
+    assert all("http.url" not in r[2] for r in durations)
+    assert [(name, value) for name, value, _ in recording.counts] == [
+        (REQUEST_RETRIES, 1)
+    ]
+
+
+def test_default_hooks_without_opentelemetry(monkeypatch, with_requester):
+    monkeypatch.setattr(instrumentation, "otel_trace", None)
+    monkeypatch.setattr(instrumentation, "otel_metrics", None)
+    with pytest.raises(ImportError, match="otel"):
+        OpenTelemetryInstrumentation()
+
+    async def read(request):
+        return web.json_response({"resourceType": "Patient", "id": "p1"})
+
+    async def use(requester):
+        assert type(requester._client.instrumentation) is Instrumentation
+        return await requester._client._do_request("GET", "Patient/p1")
+
+    assert with_requester({("GET", "/fhir/Patient/p1"): read}, use)["id"] == "p1"
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from aiohttp import ClientResponseError, ClientSession, web
+from aiohttp.test_utils import TestServer
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jwt import DecodeError
+from jwt.algorithms import ECAlgorithm, RSAAlgorithm
+
+from smart_on_fhir_client.jwks import JwksManager, parse_jwks, parse_max_age
+
+
+def _rsa_jwk(kid, **fields):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return {**RSAAlgorithm.to_jwk(key.public_key(), as_dict=True), "kid": kid, **fields}
+
+
+K1, K2 = _rsa_jwk("k1"), _rsa_jwk("k2")
+
+
+def test_parse_jwks_keeps_rsa_signing_keys():
+    ec_key = ec.generate_private_key(ec.SECP256R1()).public_key()
+    keys = parse_jwks(
+        {
+            "keys": [
+                K1,
+                _rsa_jwk("enc", use="enc"),
+                {**ECAlgorithm.to_jwk(ec_key, as_dict=True), "kid": "ec"},
+            ]
+        }
+    )
+    assert list(keys) == ["k1"]
+    assert keys["k1"].public_numbers().n == RSAAlgorithm.from_jwk(K1).public_numbers().n
+
+
+def test_parse_jwks_single_jwk():
+    assert list(parse_jwks(K2)) == ["k2"]
+
+
+def test_parse_max_age():
+    assert parse_max_age({"Cache-Control": "public, max-age=60"}) == 60.0
+    assert parse_max_age({"Cache-Control": "no-cache"}) == 0.0
+    assert parse_max_age({"Cache-Control": "max-age=60, no-store"}) == 0.0
+    assert parse_max_age({"Cache-Control": "public"}) is None
+    assert parse_max_age({}) is None
+
+
+class _Issuer:
+    """openid configuration and JWK set of an issuer"""
+
+    def __init__(self, cache_control="max-age=3600"):
+        self.keys = [K1]
+        self.cache_control = cache_control
+        self.failing = False
+        self.fetches = []
+
+    def routes(self, app: web.Application):
+        app.router.add_get("/.well-known/openid-configuration", self.configuration)
+        app.router.add_get("/jwks", self.jwks)
+
+    async def configuration(self, request):
+        self.fetches.append("configuration")
+        return web.json_response({"jwks_uri": str(request.url.with_path("/jwks"))})
+
+    async def jwks(self, request):
+        self.fetches.append("jwks")
+        if self.failing:
+            return web.Response(status=500)
+        return web.json_response(
+            {"keys": self.keys}, headers={"Cache-Control": self.cache_control}
+        )
+
+
+def _run(issuer: _Issuer, use, **options):
+    async def main():
+        app = web.Application()
+        issuer.routes(app)
+        async with TestServer(app) as server, ClientSession() as session:
+            manager = JwksManager(session, **options)
+            return await use(manager, str(server.make_url("")).rstrip("/"))
+
+    return asyncio.run(main())
+
+
+def test_keys_discovered_from_the_openid_configuration():
+    issuer = _Issuer()
+
+    async def use(manager, url):
+        first = await manager.get_key(url, "k1")
+        assert await manager.get_key(url, "k1") is first
+        return first
+
+    key = _run(issuer, use)
+    assert key.public_numbers().e == 65537
+    assert issuer.fetches == ["configuration", "jwks"]
+
+
+def test_unknown_kid_refetch_is_throttled():
+    issuer = _Issuer()
+
+    async def use(manager, url):
+        await manager.get_key(url, "k1")
+        issuer.keys = [K1, K2]
+        # rotated within the throttle window: not refetched
+        with pytest.raises(DecodeError):
+            await manager.get_key(url, "k2")
+        assert issuer.fetches.count("jwks") == 1
+        manager.min_refresh_interval = 0
+        return await manager.get_key(url, "k2")
+
+    assert _run(issuer, use) is not None
+    assert issuer.fetches.count("jwks") == 2
+
+
+def test_no_cache_keys_are_kept_for_the_refresh_interval():
+    issuer = _Issuer(cache_control="no-cache")
+
+    async def use(manager, url):
+        for _ in range(5):
+            await manager.get_key(url, "k1")
+
+    _run(issuer, use, min_refresh_interval=30)
+    assert issuer.fetches.count("jwks") == 1
+
+
+def test_stale_keys_are_kept_when_a_refresh_fails():
+    issuer = _Issuer(cache_control="max-age=0")
+
+    async def use(manager, url):
+        first = await manager.get_key(url, "k1")
+        issuer.failing = True
+        return first, await manager.get_key(url, "k1")
+
+    first, stale = _run(issuer, use, min_refresh_interval=0)
+    assert stale is first
+    assert issuer.fetches.count("jwks") == 2
+
+
+def test_unknown_issuer_fetch_error_is_raised():
+    issuer = _Issuer()
+    issuer.failing = True
+
+    async def use(manager, url):
+        with pytest.raises(ClientResponseError):
+            await manager.get_key(url, "k1")
+
+    _run(issuer, use)
@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+import pytest
+from fhir.resources.patient import Patient
+
+from smart_on_fhir_client import offload as offload_module
+from smart_on_fhir_client.offload import Offload
+
+PATIENTS = [{"resourceType": "Patient", "id": str(i), "active": True} for i in range(3)]
+
+
+@pytest.fixture
+def conversion_threads(monkeypatch):
+    threads = []
+    to_models = offload_module.to_models
+
+    def recording(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return to_models(*args, **kwargs)
+
+    monkeypatch.setattr(offload_module, "to_models", recording)
+    return threads
+
+
+@pytest.mark.parametrize("validate", [True, False])
+def test_process_pool_builds_models_out_of_the_loop(conversion_threads, validate):
+    offload = Offload.process_pool(max_workers=1)
+    try:
+        patients = asyncio.run(offload.to_models(Patient, PATIENTS, validate=validate))
+    finally:
+        offload.shutdown()
+    assert [patient.id for patient in patients] == ["0", "1", "2"]
+    assert all(isinstance(patient, Patient) for patient in patients)
+    assert conversion_threads
+    assert threading.main_thread() not in conversion_threads
+
+
+def test_thread_pool_converts_in_executor(conversion_threads):
+    offload = Offload.thread_pool(max_workers=1)
+    try:
+        patients = asyncio.run(offload.to_models(Patient, PATIENTS))
+    finally:
+        offload.shutdown()
+    assert len(patients) == 3
+    assert threading.main_thread() not in conversion_threads
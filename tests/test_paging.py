@@ -0,0 +1,28 @@
+from yarl import URL
+
+from smart_on_fhir_client.requester.paging import offset_links, offset_paging
+
+
+def test_hapi_paging():
+    url = "http://hapi/fhir?_getpages=abc&_getpagesoffset=20&_count=20"
+    assert offset_paging(url) == (URL(url), "_getpagesoffset", 20)
+
+
+def test_offset_paging():
+    url = "http://x/fhir/Patient?name=a&_offset=50&_count=50"
+    assert offset_paging(url) == (URL(url), "_offset", 50)
+
+
+def test_not_paging_by_offset():
+    assert offset_paging(None) is None
+    assert offset_paging("http://x/fhir/Patient?page=2") is None
+    assert offset_paging("http://x/fhir/Patient?_offset=0") is None
+    assert offset_paging("http://x/fhir/Patient?_offset=abc") is None
+
+
+def test_offset_links():
+    paging = offset_paging("http://x/fhir/Patient?_offset=10&_count=10")
+    links = list(offset_links(paging, total=35))
+    assert [URL(link).query["_offset"] for link in links] == ["10", "20", "30"]
+    assert all(URL(link).query["_count"] == "10" for link in links)
+    assert list(offset_links(paging, total=10)) == []
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from smart_on_fhir_client.requester.pipeline import (
+    InMemoryCheckpoint,
+    _Progress,
+    run_pipeline,
+)
+
+
+async def _stream(n):
+    for i in range(n):
+        yield i
+
+
+def test_progress_moves_over_contiguous_batches():
+    progress = _Progress(0)
+    assert not progress.complete(10, 10)
+    assert progress.offset == 0
+    assert progress.complete(0, 10)
+    assert progress.offset == 20
+
+
+def test_progress_stops_at_failed_batch():
+    progress = _Progress(0)
+    assert progress.complete(0, 10)
+    assert not progress.complete(10, 10, succeeded=False)
+    assert not progress.complete(20, 10)
+    assert progress.offset == 10
+
+
+def test_checkpoint_not_moved_past_failed_batch():
+    async def write_batch(batch):
+        if 20 in batch:
+            raise ConnectionError("down")
+        return [True] * len(batch)
+
+    checkpoint = InMemoryCheckpoint()
+    stats = asyncio.run(
+        run_pipeline(
+            _stream(50),
+            write_batch,
+            batch_size=10,
+            concurrency=2,
+            checkpoint=checkpoint,
+        )
+    )
+    assert (stats.succeeded, stats.failed) == (40, 10)
+    assert asyncio.run(checkpoint.load("default")) == 20
+
+
+def test_items_rejected_individually_do_not_stop_checkpoint():
+    async def write_batch(batch):
+        return [item % 2 == 0 for item in batch]
+
+    checkpoint = InMemoryCheckpoint()
+    stats = asyncio.run(
+        run_pipeline(_stream(30), write_batch, batch_size=10, checkpoint=checkpoint)
+    )
+    assert stats.failed == 15
+    assert asyncio.run(checkpoint.load("default")) == 30
+
+
+def test_resumes_from_checkpoint():
+    written = []
+
+    async def write_batch(batch):
+        written.extend(batch)
+        return [True] * len(batch)
+
+    checkpoint = InMemoryCheckpoint()
+    asyncio.run(checkpoint.save("default", 20))
+    stats = asyncio.run(
+        run_pipeline(_stream(30), write_batch, batch_size=10, checkpoint=checkpoint)
+    )
+    assert stats.resumed_from == 20
+    assert sorted(written) == list(range(20, 30))
+
+
+def test_failing_worker_stops_the_pipeline():
+    class BrokenCheckpoint(InMemoryCheckpoint):
+        async def save(self, name, offset):
+            raise OSError("disk full")
+
+    async def write_batch(batch):
+        return [True] * len(batch)
+
+    async def run():
+        # the stream is much longer than the queue: the producer would block
+        # forever without workers
+        return await asyncio.wait_for(
+            run_pipeline(
+                _stream(10_000),
+                write_batch,
+                batch_size=1,
+                concurrency=2,
+                checkpoint=BrokenCheckpoint(),
+            ),
+            timeout=5,
+        )
+
+    with pytest.raises(OSError, match="disk full"):
+        asyncio.run(run())
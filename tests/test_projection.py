@@ -0,0 +1,40 @@
+import pytest
+
+from smart_on_fhir_client.client import SmartOnFhirClient
+from smart_on_fhir_client.requester.fhir_requester import SearchSet
+
+
+@pytest.fixture
+def search_set():
+    client = SmartOnFhirClient("http://fhir.example.org/fhir")
+    return SearchSet(client.resources("Patient"), None, client)
+
+
+def test_full_search_validated(search_set):
+    assert not search_set._partial
+    assert search_set._validate
+    assert not search_set.summary("false")._partial
+
+
+def test_elements_partial(search_set):
+    projected = search_set.elements("identifier")
+    assert projected._partial
+    assert not projected._validate
+    # _summary=false does not bring the other elements back
+    assert projected.summary("false")._partial
+
+
+@pytest.mark.parametrize("value", ["true", "text", "data"])
+def test_summary_partial(search_set, value):
+    assert search_set.summary(value)._partial
+    assert not search_set.summary(value).summary("false")._partial
+
+
+def test_elements_given_as_search_param(search_set):
+    search = search_set._search.search(_elements="identifier")
+    assert SearchSet(search, None, search_set._client)._partial
+
+
+def test_invalid_summary(search_set):
+    with pytest.raises(ValueError):
+        search_set.summary("count")
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from smart_on_fhir_client.partner import Organization
+from smart_on_fhir_client.rate_limit import RateLimit, RateLimiter, RateLimiterRegistry
+
+
+def test_max_in_flight():
+    in_flight, peak = 0, 0
+
+    async def request(limiter):
+        nonlocal in_flight, peak
+        async with limiter.acquire():
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    async def run():
+        limiter = RateLimiter(RateLimit(max_in_flight=2))
+        await asyncio.gather(*(request(limiter) for _ in range(6)))
+        return limiter.metrics
+
+    metrics = asyncio.run(run())
+    assert peak == 2
+    assert (metrics.requests, metrics.in_flight, metrics.queue_depth) == (6, 0, 0)
+
+
+def test_requests_per_second():
+    async def run():
+        limiter = RateLimiter(RateLimit(requests_per_second=50, burst=1))
+        start = time.monotonic()
+        for _ in range(5):
+            async with limiter.acquire():
+                pass
+        return time.monotonic() - start
+
+    # the first request uses the burst, the next ones wait 20ms each
+    assert asyncio.run(run()) >= 0.07
+
+
+def test_no_limit():
+    limiter = RateLimiter(RateLimit())
+    assert limiter.tokens_available is None
+
+
+def test_registry_shares_partner_limiter(make_partner):
+    registry = RateLimiterRegistry()
+    partner = make_partner(rate_limit=RateLimit(requests_per_second=10))
+    own_limit = RateLimit(requests_per_second=1)
+    shared = registry.for_client(partner)
+    assert registry.for_client(partner, Organization("a")) is shared
+    own = registry.for_client(partner, Organization("b", rate_limit=own_limit))
+    assert own is not shared
+    assert own.rate_limit == own_limit
+    assert registry.for_client(make_partner()) is None
+
+
+@pytest.mark.parametrize("rate_limit", [None, RateLimit(max_in_flight=1)])
+def test_registered_client_limited_by_its_partner(with_requester, rate_limit):
+    in_flight, peak = 0, 0
+
+    async def read(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return web.json_response({"resourceType": "Patient", "id": "p1"})
+
+    async def use(requester):
+        client = requester._client
+        await asyncio.gather(
+            *(client._do_request("GET", f"Patient/p1?n={i}") for i in range(4))
+        )
+        return client.rate_limiter
+
+    limiter = with_requester(
+        {("GET", "/fhir/Patient/p1"): read}, use, rate_limit=rate_limit
+    )
+    if rate_limit is None:
+        assert limiter is None
+        assert peak > 1
+    else:
+        assert limiter.rate_limit == rate_limit
+        assert limiter.metrics.requests == 4
+        assert peak == 1
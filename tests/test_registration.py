@@ -0,0 +1,26 @@
+import asyncio
+
+from smart_on_fhir_client.client import SmartOnFhirBuilderFactory
+from smart_on_fhir_client.requester.fhir_requester import FhirContextManager
+from smart_on_fhir_client.requester.registration import RegistrationStatus
+from smart_on_fhir_client.strategy import Strategy
+
+
+def test_builder_without_partner_reported_as_failed(make_partner):
+    async def run():
+        manager = FhirContextManager()
+        factory = SmartOnFhirBuilderFactory()
+        async with factory:
+            builders = [
+                factory.builder(),
+                factory.builder()
+                .for_partner(make_partner())
+                .for_strategy(Strategy.M2M),
+            ]
+            return await manager.register_partners_async(builders)
+
+    missing, registered = asyncio.run(run())
+    assert missing.status == RegistrationStatus.FAILED
+    assert "No partner" in missing.error
+    assert registered.client_name == "P"
+    assert registered.status == RegistrationStatus.REGISTERED
@@ -0,0 +1,82 @@
+import copy
+
+import pytest
+from aiohttp import web
+
+from smart_on_fhir_client.requester.fhir_requester import ClientProxy
+from smart_on_fhir_client.requester.sync import InMemoryWatermarkStore
+
+
+def test_proxies_are_created_once(with_requester):
+    async def use(requester):
+        first = requester.Patient
+        assert "Patient" in vars(requester)
+        assert requester.Patient is first
+        # any fhir resource, not only the most used ones
+        assert "AllergyIntolerance" not in requester.RESOURCES
+        return first, requester.AllergyIntolerance, dir(requester)
+
+    patient, allergy, names = with_requester({}, use)
+    assert isinstance(patient, ClientProxy) and patient._id == "Patient"
+    assert allergy._id == "AllergyIntolerance"
+    assert "Encounter" in names
+
+
+@pytest.mark.parametrize(
+    "name", ["unknown", "NotAResource", "_private", "__setstate__", "__deepcopy__"]
+)
+def test_unknown_or_private_names_raise_attribute_error(with_requester, name):
+    async def use(requester):
+        with pytest.raises(AttributeError, match=name):
+            getattr(requester, name)
+        return hasattr(requester, name), vars(requester)
+
+    found, attributes = with_requester({}, use)
+    assert not found
+    assert name not in attributes
+
+
+def test_requester_can_be_copied(with_requester):
+    async def use(requester):
+        copied = copy.copy(requester)
+        return copied._client is requester._client, copied.Patient
+
+    same_client, proxy = with_requester({}, use)
+    assert same_client
+    assert proxy._id == "Patient"
+
+
+def test_proxy_sync_saves_the_watermark(with_requester):
+    queries = []
+
+    async def search(request):
+        queries.append(dict(request.query))
+        return web.json_response(
+            {
+                "resourceType": "Bundle",
+                "type": "searchset",
+                "entry": [
+                    {
+                        "resource": {
+                            "resourceType": "Patient",
+                            "id": str(i),
+                            "meta": {"lastUpdated": f"2023-01-0{i}T00:00:00Z"},
+                        }
+                    }
+                    for i in (1, 2)
+                ],
+            }
+        )
+
+    async def use(requester):
+        store = InMemoryWatermarkStore()
+        for _ in range(2):
+            pages = [page async for page in requester.Patient.sync(store)]
+        return pages, await store.get("P", "Patient")
+
+    pages, watermark = with_requester({("GET", "/fhir/Patient"): search}, use)
+    assert [[p.id for p in page] for page in pages] == [["1", "2"]]
+    assert watermark == "2023-01-02T00:00:00Z"
+    first, second = queries
+    assert first == {"_sort": "_lastUpdated", "_count": "100"}
+    assert second["_lastUpdated"] == "ge2023-01-02T00:00:00Z"
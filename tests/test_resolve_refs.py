@@ -0,0 +1,131 @@
+from aiohttp import web
+from fhir.resources.encounter import Encounter
+
+from smart_on_fhir_client.client import SmartOnFhirClient
+from smart_on_fhir_client.resource_cache import ResourceCache
+
+ENCOUNTER = {
+    "resourceType": "Encounter",
+    "id": "e1",
+    "status": "finished",
+    "class": {"code": "AMB"},
+    "subject": {"reference": "Patient/p1"},
+}
+
+
+async def _search(request):
+    entries = (
+        [{"resource": ENCOUNTER}] if "e1" in request.query["_id"].split(",") else []
+    )
+    return web.json_response(
+        {"resourceType": "Bundle", "type": "searchset", "entry": entries}
+    )
+
+
+async def _read(request):
+    return web.json_response(ENCOUNTER)
+
+
+ROUTES = {("GET", "/fhir/Encounter"): _search, ("GET", "/fhir/Encounter/e1"): _read}
+
+
+def test_resolve_refs_return_as(with_requester):
+    async def resolve(requester):
+        fetched = await requester.resolve_refs(["Encounter/e1"], return_as=Encounter)
+        # the second time from the resource cache
+        cached = await requester.resolve_refs(["Encounter/e1"], return_as=Encounter)
+        return fetched + cached
+
+    for encounter in with_requester(ROUTES, resolve):
+        assert isinstance(encounter, Encounter)
+        assert encounter.subject.reference == "Patient/p1"
+
+
+def test_resolve_ref_return_as(with_requester):
+    async def resolve(requester):
+        return await requester.resolve_ref("Encounter/e1", return_as=Encounter)
+
+    encounter = with_requester(ROUTES, resolve)
+    assert isinstance(encounter, Encounter)
+    assert encounter.subject.reference == "Patient/p1"
+
+
+def test_resolve_refs_raw(with_requester):
+    async def resolve(requester):
+        return await requester.resolve_refs(["Encounter/e1", "Encounter/e2"])
+
+    encounter, missing = with_requester(ROUTES, resolve)
+    assert encounter.resource_type == "Encounter"
+    assert encounter.serialize()["subject"] == {"reference": "Patient/p1"}
+    assert missing is None
+
+
+def test_client_keeps_resource_cache_options():
+    cache = ResourceCache(max_size=3, ttl=None)
+    client = SmartOnFhirClient("http://fhir.example.org/fhir", resource_cache=cache)
+    assert client.resource_cache is cache
+
+
+def _patient(version_id):
+    return {
+        "resourceType": "Patient",
+        "id": "p1",
+        "meta": {"versionId": version_id},
+        "gender": "male" if version_id == "2" else "female",
+    }
+
+
+def test_resolve_refs_versioned(with_requester):
+    requested = []
+
+    async def search(request):
+        requested.append(dict(request.query))
+        return web.json_response(
+            {
+                "resourceType": "Bundle",
+                "type": "searchset",
+                "entry": [{"resource": _patient("3")}],
+            }
+        )
+
+    async def history(request):
+        requested.append(request.match_info["vid"])
+        if request.match_info["vid"] != "2":
+            return web.Response(status=404)
+        return web.json_response(_patient("2"))
+
+    async def resolve(requester):
+        references = ["Patient/p1/_history/2", "Patient/p1", "Patient/p1/_history/9"]
+        first = await requester.resolve_refs(references)
+        # the second time from the resource cache, but the unknown version
+        second = await requester.resolve_refs(references)
+        return first, second, requester._client.resource_cache
+
+    routes = {
+        ("GET", "/fhir/Patient"): search,
+        ("GET", "/fhir/Patient/p1/_history/{vid}"): history,
+    }
+    first, second, cache = with_requester(routes, resolve)
+    for version_2, current, unknown in (first, second):
+        assert version_2.serialize()["meta"] == {"versionId": "2"}
+        assert current.serialize()["meta"] == {"versionId": "3"}
+        assert unknown is None
+    searches = [query for query in requested if isinstance(query, dict)]
+    assert searches == [{"_id": "p1", "_count": "1"}]
+    assert sorted(vid for vid in requested if isinstance(vid, str)) == ["2", "9", "9"]
+    assert cache.get("Patient", "p1")["meta"]["versionId"] == "3"
+    assert cache.get("Patient", "p1", "2")["gender"] == "male"
+
+
+def test_resource_cache_keeps_versions_apart():
+    cache = ResourceCache()
+    cache.put(_patient("3"))
+    cache.put(_patient("2"), versioned=True)
+    assert cache.get("Patient", "p1")["meta"]["versionId"] == "3"
+    assert cache.get("Patient", "p1", "3")["meta"]["versionId"] == "3"
+    assert cache.get("Patient", "p1", "2")["meta"]["versionId"] == "2"
+    assert cache.get("Patient", "p1", "1") is None
+    # history versions do not change when the resource is written
+    cache.invalidate("Patient", "p1")
+    assert cache.get("Patient", "p1") is None
+    assert cache.get("Patient", "p1", "2") is not None
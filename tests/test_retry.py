@@ -0,0 +1,133 @@
+import asyncio
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+from aiohttp import web
+from fhirpy.base.exceptions import OperationOutcome
+
+from smart_on_fhir_client.retry import (
+    RetryableOperationOutcome,
+    RetryBudget,
+    RetryPolicy,
+    parse_retry_after,
+)
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after({"Retry-After": "12"}) == 12.0
+    assert parse_retry_after({"Retry-After": "-3"}) == 0.0
+    assert parse_retry_after({}) is None
+
+
+def test_parse_retry_after_http_date():
+    value = parse_retry_after({"Retry-After": formatdate(time.time() + 60)})
+    assert 55 < value <= 60
+    # in the past
+    assert parse_retry_after({"Retry-After": formatdate(time.time() - 60)}) == 0.0
+
+
+def test_parse_retry_after_garbage():
+    assert parse_retry_after({"Retry-After": "soon"}) is None
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(initial_backoff=1.0, multiplier=2.0, max_backoff=5.0)
+    first = [policy.backoff(1) for _ in range(200)]
+    assert all(0 <= wait <= 1.0 for wait in first)
+    assert len(set(first)) > 1
+    assert all(0 <= policy.backoff(10) <= 5.0 for _ in range(200))
+    assert max(policy.backoff(10) for _ in range(200)) > 1.0
+
+
+def _retry_state(exc, attempt_number=1):
+    return SimpleNamespace(
+        outcome=SimpleNamespace(exception=lambda: exc),
+        attempt_number=attempt_number,
+    )
+
+
+def test_retry_after_takes_precedence_over_backoff():
+    policy = RetryPolicy(initial_backoff=100.0, max_backoff=100.0)
+    exc = RetryableOperationOutcome("busy", status=429, retry_after=0.5)
+    assert policy.wait(_retry_state(exc, attempt_number=3)) == 0.5
+    ignored = policy.copy(update={"respect_retry_after": False})
+    assert ignored.wait(_retry_state(exc, attempt_number=1)) <= 100.0
+
+
+def test_non_idempotent_requests_are_not_retried_on_server_errors():
+    policy = RetryPolicy()
+    unavailable = RetryableOperationOutcome("down", status=503)
+    throttled = RetryableOperationOutcome("busy", status=429)
+    assert policy.is_retryable("GET", "Patient", unavailable)
+    assert policy.is_retryable("POST", "Patient/_search", unavailable)
+    assert not policy.is_retryable("POST", "", unavailable)
+    assert policy.is_retryable("POST", "", throttled)
+    assert not policy.is_retryable("POST", "", asyncio.TimeoutError())
+    assert not policy.is_retryable("GET", "Patient", OperationOutcome("invalid"))
+    too_long = RetryableOperationOutcome("busy", status=429, retry_after=1000)
+    assert not policy.is_retryable("GET", "Patient", too_long)
+
+
+def test_exhausted_budget_stops_retries():
+    policy = RetryPolicy(max_attempts=10, initial_backoff=0.0)
+    budget = RetryBudget(max_tokens=4, token_ratio=0.1)
+    calls = []
+
+    async def run():
+        async for attempt in policy.retrying("GET", "Patient", budget):
+            with attempt:
+                calls.append(1)
+                raise RetryableOperationOutcome("down", status=503)
+
+    with pytest.raises(RetryableOperationOutcome):
+        asyncio.run(run())
+    # 4 -> 3 tokens: retried, 3 -> 2: at half of the budget, not retried
+    assert len(calls) == 2
+    assert not budget.can_retry()
+    for _ in range(11):
+        budget.record_success()
+    assert budget.can_retry()
+
+
+def test_throttled_request_is_retried_after_retry_after(with_requester):
+    calls = []
+
+    async def patients(request):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return web.json_response(
+                {"resourceType": "OperationOutcome", "issue": []},
+                status=429,
+                headers={"Retry-After": "0"},
+            )
+        return web.json_response({"resourceType": "Patient", "id": "p1"})
+
+    async def read(requester):
+        return await requester._client._do_request("GET", "Patient/p1")
+
+    result = with_requester({("GET", "/fhir/Patient/p1"): patients}, read)
+    assert result["id"] == "p1"
+    assert len(calls) == 2
+
+
+def test_transaction_is_not_retried_on_unavailable(with_requester):
+    calls = []
+
+    async def transaction(request):
+        calls.append(1)
+        return web.json_response(
+            {"resourceType": "OperationOutcome", "issue": []}, status=503
+        )
+
+    async def post(requester):
+        with pytest.raises(RetryableOperationOutcome) as info:
+            await requester._client._do_request(
+                "POST", "", data={"resourceType": "Bundle", "type": "transaction"}
+            )
+        return info.value
+
+    error = with_requester({("POST", "/fhir"): transaction}, post)
+    assert error.status == 503
+    assert len(calls) == 1
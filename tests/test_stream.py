@@ -0,0 +1,115 @@
+import asyncio
+from contextlib import aclosing
+
+import pytest
+from aiohttp import web
+from fhirpy.base.exceptions import OperationOutcome
+
+PAGES = 4
+PAGE_SIZE = 2
+
+
+class _PagedServer:
+    """Patient search of PAGES pages linked by next links"""
+
+    def __init__(self, failing_page: int | None = None):
+        self.failing_page = failing_page
+        self.requested = []
+
+    async def search(self, request):
+        page = int(request.query.get("page", 1))
+        self.requested.append(page)
+        if page == self.failing_page:
+            return web.json_response(
+                {"resourceType": "OperationOutcome", "issue": []}, status=400
+            )
+        bundle = {
+            "resourceType": "Bundle",
+            "type": "searchset",
+            "entry": [
+                {"resource": {"resourceType": "Patient", "id": f"{page}-{i}"}}
+                for i in range(PAGE_SIZE)
+            ],
+        }
+        if page < PAGES:
+            url = request.url.with_query(page=page + 1)
+            bundle["link"] = [{"relation": "next", "url": str(url)}]
+        return web.json_response(bundle)
+
+    @property
+    def routes(self):
+        return {("GET", "/fhir/Patient"): self.search}
+
+
+def _producers():
+    """producer tasks still fetching pages"""
+    return [
+        task
+        for task in asyncio.all_tasks()
+        if task.get_coro().__qualname__.endswith("_fetch_bundles") and not task.done()
+    ]
+
+
+def test_stream_follows_the_next_links(with_requester):
+    server = _PagedServer()
+
+    async def use(requester):
+        return [p.id async for p in requester.Patient.search().stream(prefetch=2)]
+
+    ids = with_requester(server.routes, use)
+    assert ids == [f"{page}-{i}" for page in range(1, PAGES + 1) for i in (0, 1)]
+    assert server.requested == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("prefetch", [1, 2])
+def test_breaking_early_cancels_the_producer(with_requester, prefetch):
+    server = _PagedServer()
+
+    async def use(requester):
+        pages = requester.Patient.search().stream_pages(prefetch=prefetch)
+        async with aclosing(pages):
+            async for page in pages:
+                # let the producer fetch as much as it may
+                await asyncio.sleep(0.05)
+                break
+        await asyncio.sleep(0.05)
+        return page, _producers()
+
+    page, running = with_requester(server.routes, use)
+    assert [p.id for p in page] == ["1-0", "1-1"]
+    # the consumed page and at most `prefetch` pages in advance
+    assert server.requested == list(range(1, prefetch + 2))
+    assert running == []
+
+
+def test_resources_stream_closes_its_pages(with_requester):
+    server = _PagedServer()
+
+    async def use(requester):
+        async with aclosing(requester.Patient.search().stream()) as patients:
+            async for patient in patients:
+                break
+        await asyncio.sleep(0.05)
+        return patient, _producers()
+
+    patient, running = with_requester(server.routes, use)
+    assert patient.id == "1-0"
+    assert running == []
+    assert len(server.requested) <= 2
+
+
+def test_producer_error_is_raised_to_the_consumer(with_requester):
+    server = _PagedServer(failing_page=3)
+
+    async def use(requester):
+        ids = []
+        with pytest.raises(OperationOutcome):
+            async for patient in requester.Patient.search().stream():
+                ids.append(patient.id)
+        return ids, _producers()
+
+    ids, running = with_requester(server.routes, use)
+    # the pages before the failing one are consumed first
+    assert ids == ["1-0", "1-1", "2-0", "2-1"]
+    assert server.requested == [1, 2, 3]
+    assert running == []
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from smart_on_fhir_client.requester.sync import latest_update, parse_instant
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2023-01-02T03:04:05Z", datetime(2023, 1, 2, 3, 4, 5, tzinfo=timezone.utc)),
+        (
+            "2023-01-02T03:04:05.1Z",
+            datetime(2023, 1, 2, 3, 4, 5, 100000, tzinfo=timezone.utc),
+        ),
+        (
+            "2023-01-02T03:04:05.1234567Z",
+            datetime(2023, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc),
+        ),
+        (
+            "2023-01-02T03:04:05.12+02:00",
+            datetime(2023, 1, 2, 3, 4, 5, 120000, tzinfo=timezone(timedelta(hours=2))),
+        ),
+        ("2023-01-02T03:04:05", datetime(2023, 1, 2, 3, 4, 5, tzinfo=timezone.utc)),
+        ("2023-01-02", datetime(2023, 1, 2, tzinfo=timezone.utc)),
+    ],
+)
+def test_parse_instant(value, expected):
+    assert parse_instant(value) == expected
+
+
+def test_parse_invalid_instant():
+    assert parse_instant("yesterday") is None
+
+
+def test_latest_update_mixes_naive_and_aware_instants():
+    resources = [
+        {"meta": {"lastUpdated": "2023-01-02T03:04:05"}},
+        {"meta": {"lastUpdated": "2023-01-02T03:04:06.5Z"}},
+        {"meta": {"lastUpdated": "invalid"}},
+        {},
+    ]
+    assert latest_update(resources, since="2023-01-01T00:00:00+00:00") == (
+        "2023-01-02T03:04:06.5Z"
+    )
@@ -0,0 +1,58 @@
+import asyncio
+
+from smart_on_fhir_client.token_store import AccessToken, TokenStore
+
+KEY = ("P", "M2M", "")
+
+
+def test_concurrent_gets_fetch_a_single_token():
+    fetched = []
+
+    async def fetch():
+        fetched.append(1)
+        await asyncio.sleep(0.01)
+        return {"access_token": f"token{len(fetched)}", "expires_in": 3600}
+
+    async def run():
+        store = TokenStore()
+        return await asyncio.gather(*(store.get(KEY, fetch) for _ in range(10)))
+
+    tokens = asyncio.run(run())
+    assert len(fetched) == 1
+    assert {token.access_token for token in tokens} == {"token1"}
+
+
+def test_stale_token_fetched_again():
+    async def run():
+        store = TokenStore()
+        first = await store.get(KEY, _fetch("token1"))
+        cached = await store.get(KEY, _fetch("token2"))
+        renewed = await store.get(KEY, _fetch("token2"), stale="token1")
+        return first, cached, renewed
+
+    first, cached, renewed = asyncio.run(run())
+    assert first.access_token == cached.access_token == "token1"
+    assert renewed.access_token == "token2"
+
+
+def test_token_expiring_soon_fetched_again():
+    async def run():
+        store = TokenStore(refresh_margin=60)
+        await store.get(KEY, _fetch("token1", expires_in=30))
+        return await store.get(KEY, _fetch("token2"))
+
+    assert asyncio.run(run()).access_token == "token2"
+
+
+def test_default_lifetime_of_opaque_tokens():
+    token = AccessToken.from_response("opaque", default_lifetime=10)
+    assert token.expires_within(10)
+    assert not token.expires_within(5)
+    assert AccessToken.from_response("opaque").expires_at is None
+
+
+def _fetch(access_token, expires_in=3600):
+    async def fetch():
+        return {"access_token": access_token, "expires_in": expires_in}
+
+    return fetch
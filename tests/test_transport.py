@@ -0,0 +1,104 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from smart_on_fhir_client.transport import HttpxTransport
+
+httpx = pytest.importorskip("httpx")
+
+URL = "https://fhir.example.org/fhir/Patient"
+HEADERS = {"Authorization": "Bearer token", "Content-Type": "application/json"}
+
+
+def _mock(requests):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(
+            201,
+            headers={"Location": "Patient/1"},
+            json={"resourceType": "Patient", "id": "1"},
+        )
+
+    return httpx.MockTransport(handler)
+
+
+def _send(transport: HttpxTransport, read, **body):
+    async def run():
+        try:
+            async with transport.request("POST", URL, headers=HEADERS, **body) as r:
+                return r.status, r.headers, await read(r)
+        finally:
+            await transport.close()
+
+    return asyncio.run(run())
+
+
+async def _read(r):
+    return await r.read()
+
+
+def test_bytes_body_is_sent_as_content():
+    requests = []
+    payload = gzip.compress(b'{"resourceType": "Patient"}')
+    status, headers, content = _send(
+        HttpxTransport(transport=_mock(requests)), _read, data=payload
+    )
+    (request,) = requests
+    assert request.method == "POST"
+    assert str(request.url) == URL
+    assert request.headers["Authorization"] == "Bearer token"
+    assert request.content == payload
+    assert status == 201
+    assert headers["Location"] == "Patient/1"
+    assert json.loads(content) == {"resourceType": "Patient", "id": "1"}
+
+
+def test_json_and_form_bodies():
+    requests = []
+    transport = HttpxTransport(transport=_mock(requests))
+    _send(transport, _read, json={"resourceType": "Patient"})
+    _send(transport, _read, data={"grant_type": "client_credentials"})
+    sent_json, sent_form = requests
+    assert json.loads(sent_json.content) == {"resourceType": "Patient"}
+    assert sent_form.content == b"grant_type=client_credentials"
+
+
+def test_response_adapter_streams_and_decodes():
+    async def stream(r):
+        chunks = [chunk async for chunk in r.content.iter_chunked(4)]
+        assert all(len(chunk) <= 4 for chunk in chunks)
+        return b"".join(chunks)
+
+    _, _, streamed = _send(HttpxTransport(transport=_mock([])), stream)
+
+    async def text(r):
+        return await r.text()
+
+    _, _, decoded = _send(HttpxTransport(transport=_mock([])), text)
+    assert (
+        json.loads(streamed)
+        == json.loads(decoded)
+        == {
+            "resourceType": "Patient",
+            "id": "1",
+        }
+    )
+
+
+def test_clients_negotiate_http2_when_requested():
+    async def run():
+        transports = [
+            HttpxTransport(),
+            HttpxTransport(http2=False),
+            HttpxTransport(http2=False, prior_knowledge=True),
+        ]
+        pools = [t._client_for(URL)._transport._pool for t in transports]
+        # one client by origin
+        assert transports[0]._client_for(f"{URL}/1") is transports[0]._client_for(URL)
+        for transport in transports:
+            await transport.close()
+        return [(pool._http1, pool._http2) for pool in pools]
+
+    assert asyncio.run(run()) == [(True, True), (True, False), (False, True)]